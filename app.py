@@ -1,14 +1,26 @@
 # trip_planner_app.py
-from flask import Flask, render_template, request, url_for, send_from_directory
+from flask import Flask, render_template, request, url_for, send_from_directory, abort, jsonify, Response, g
 import os
-import math
-import folium
+import io
+import sys
+import json
+import time
+import logging
 import pandas as pd
-import geopandas as gpd
-from datetime import datetime, timedelta
-import requests
-from folium.plugins import AntPath
-from geopy.distance import geodesic
+from places_store import PlacesStore
+from planner import (calculate_trip_plan, form_list, parse_plan_params, replan_trip, route_points,
+                     unknown_categories)
+from route_cache import SegmentCache
+from ors_client import ORS_BASE_URL as DEFAULT_ORS_BASE_URL, OrsClient
+from plan_cache import PlanCache, CachedPlan, PLAN_KEY_PRECISION
+from jobs import JobManager, QueueFull
+from batch import DEFAULT_WORKERS as DEFAULT_BATCH_WORKERS, read_requests, run_batch
+from artifact_store import ArtifactStore, ARTIFACT_NAMES, ROUTE_RECORD, is_plan_id, normalize_plan_inputs, plan_id
+from map_data import build_map_data, to_geojson
+from marker_fragments import MarkerFragments, build_fragments
+from geometry import POLYLINE_PRECISION, as_coords, decode_polyline, encode_polyline, join_legs, simplify_for_zoom
+from routing import make_backend
+from metrics import REGISTRY, configure_logging, log_event, new_request_id, request_id_var, stage_timer
 # ===============================
 # OpenRouteService API Key
 # ===============================
@@ -19,13 +31,58 @@ load_dotenv()
 # OpenRouteService API Key
 # ===============================
 ORS_API_KEY = os.getenv("ORS_API_KEY")
-
-# PDF imports
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+# Point at a self-hosted ORS or the local stand-in (python mock_ors.py)
+ORS_BASE_URL = os.getenv("ORS_BASE_URL", DEFAULT_ORS_BASE_URL)
+
+# Segment route cache: in-memory LRU in front of a SQLite file with TTL
+ROUTE_CACHE_PATH = os.getenv("ROUTE_CACHE_PATH", "")
+ROUTE_CACHE_TTL_S = float(os.getenv("ROUTE_CACHE_TTL_S", str(7 * 24 * 3600)))
+ROUTE_CACHE_MAX_MB = float(os.getenv("ROUTE_CACHE_MAX_MB", "32"))
+
+# Map routing: legs are fetched concurrently over one pooled session
+ORS_MAX_WORKERS = int(os.getenv("ORS_MAX_WORKERS", "6"))
+ORS_RATE_PER_S = float(os.getenv("ORS_RATE_PER_S", "5"))
+ORS_TIMEOUT_S = float(os.getenv("ORS_TIMEOUT_S", "20"))
+ROUTE_DEADLINE_S = float(os.getenv("ROUTE_DEADLINE_S", "30"))
+# Routing backend for map routes (and road costs in the planner):
+# "ors" (remote, default), "osrm" (self-hosted osrm-routed) or "graph"
+# (in-process road graph built with road_graph.py)
+ROUTING_BACKEND = os.getenv("ROUTING_BACKEND", "ors")
+OSRM_URL = os.getenv("OSRM_URL", "http://localhost:5000")
+OSRM_PROFILE = os.getenv("OSRM_PROFILE", "driving")
+ROAD_GRAPH_PATH = os.getenv("ROAD_GRAPH_PATH", "")
+# Plan with road distances from the backend (backends with a distance table)
+PLAN_WITH_ROAD_COSTS = os.getenv("PLAN_WITH_ROAD_COSTS", "1") not in ("0", "false", "no")
+
+# Route simplification: drop vertices that move the line by less than
+# ROUTE_SIMPLIFY_PX pixels at this zoom level (0 keeps full resolution)
+ROUTE_SIMPLIFY_ZOOM = int(os.getenv("ROUTE_SIMPLIFY_ZOOM", "16"))
+ROUTE_SIMPLIFY_PX = float(os.getenv("ROUTE_SIMPLIFY_PX", "1"))
+
+# Rendered maps / PDFs, one directory per plan ID
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "")
+ARTIFACT_MAX_AGE_H = float(os.getenv("ARTIFACT_MAX_AGE_H", "72"))
+ARTIFACT_MAX_MB = float(os.getenv("ARTIFACT_MAX_MB", "512"))
+# Browser cache lifetime for per-plan files and the static map page (seconds)
+ARTIFACT_CACHE_MAX_AGE_S = int(os.getenv("ARTIFACT_CACHE_MAX_AGE_S", "86400"))
+
+# Whole-plan LRU cache (entries)
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "512"))
+
+# Async planning jobs (/plan_trip?async=1): worker threads and queue depth
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "2"))
+PLAN_JOB_MAX_PENDING = int(os.getenv("PLAN_JOB_MAX_PENDING", "32"))
+
+# Batch planning (/api/plan_batch): worker processes and request limit
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(DEFAULT_BATCH_WORKERS)))
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "1000"))
+
+# Upper bound on local-search time per plan (seconds)
+SOLVER_TIME_BUDGET_S = float(os.getenv("SOLVER_TIME_BUDGET_S", "0.2"))
+
+# Structured JSON logs on stderr (DEBUG also logs every ORS request)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+configure_logging(LOG_LEVEL)
 
 # ===============================================================
 # 1️⃣ PROJECT PATHS & APP CONFIG
@@ -40,160 +97,123 @@ app = Flask(
     static_folder=static_dir
 )
 
+# Places catalogue is parsed once here and reloaded only when the CSV changes;
+# each load also pre-renders the static part of every map popup
+def attach_marker_fragments(catalogue):
+    catalogue.marker_fragments = build_fragments(catalogue)
 
-# ===============================================================
-# 2️⃣ OSRM ROUTING FUNCTION (REAL ROAD ROUTES) - single segment helper
-# ===============================================================
-def osrm_route(lat1, lon1, lat2, lon2):
-
-    # 🚫 Prevent impossible routes (too far)
-    if geodesic((lat1, lon1), (lat2, lon2)).km > 3000:
-        print("❌ Too far for OSRM routing, skipping...")
-        return None, None
-
-# ===============================================================
-# ORS MULTI-STOP ROUTING (MAP ONLY)
-# ===============================================================
-def ors_segment(start, end, profile="driving-car"):
-    url = f"https://api.openrouteservice.org/v2/directions/{profile}/geojson"
-
-    headers = {
-        "Authorization": ORS_API_KEY,
-        "Content-Type": "application/json"
-    }
-
-    body = {
-        "coordinates": [
-            [start["lng"], start["lat"]],
-            [end["lng"], end["lat"]]
-        ],
-        "instructions": False
-    }
 
-    try:
-        r = requests.post(url, json=body, headers=headers, timeout=20)
-        r.raise_for_status()
-        return r.json()
-    except:
-        return None
+def catalogue_fragments():
+    catalogue = places_store.current()
+    return catalogue.marker_fragments if catalogue is not None else None
 
 
-def ors_multistop_route(start, points):
-    url = "https://api.openrouteservice.org/v2/directions/driving-car/geojson"
+places_csv_path = os.path.join(project_root, "tirupati_places_final_updated.csv")
+places_store = PlacesStore(places_csv_path, on_load=attach_marker_fragments)
+places_store.current()
 
-    headers = {
-        "Authorization": ORS_API_KEY,
-        "Content-Type": "application/json"
-    }
+segment_cache = SegmentCache(
+    db_path=ROUTE_CACHE_PATH or os.path.join(project_root, "route_cache.sqlite3"),
+    max_bytes=int(ROUTE_CACHE_MAX_MB * 1024 * 1024),
+    ttl_s=ROUTE_CACHE_TTL_S,
+)
 
-    coords = [[start[1], start[0]]]  # [lon, lat]
-    for p in points:
-        coords.append([p['lng'], p['lat']])
+plan_cache = PlanCache(max_entries=PLAN_CACHE_SIZE)
 
-    body = {
-        "coordinates": coords,
-        "instructions": False
-    }
+plan_jobs = JobManager(workers=PLAN_JOB_WORKERS, max_pending=PLAN_JOB_MAX_PENDING)
 
-    try:
-        r = requests.post(url, json=body, headers=headers, timeout=20)
-        r.raise_for_status()
-        return r.json()
-    except Exception as e:
-        print("ORS ERROR:", e)
-        return None
+artifact_store = ArtifactStore(
+    ARTIFACT_DIR or os.path.join(project_root, "artifacts"),
+    max_age_s=ARTIFACT_MAX_AGE_H * 3600,
+    max_bytes=int(ARTIFACT_MAX_MB * 1024 * 1024),
+)
 
+ors_client = OrsClient(
+    ORS_API_KEY,
+    base_url=ORS_BASE_URL,
+    cache=segment_cache,
+    timeout=ORS_TIMEOUT_S,
+    max_workers=ORS_MAX_WORKERS,
+    rate_per_s=ORS_RATE_PER_S,
+)
 
+routing_backend = make_backend(
+    ROUTING_BACKEND,
+    ors_client=ors_client,
+    osrm_url=OSRM_URL,
+    osrm_profile=OSRM_PROFILE,
+    graph_path=ROAD_GRAPH_PATH or os.path.join(project_root, "tirupati_graph.npz"),
+)
+# Planner cost function: road table when the backend has one, else None
+# (straight-line estimates / precomputed travel matrix)
+plan_table = routing_backend.table if routing_backend.has_table and PLAN_WITH_ROAD_COSTS else None
 
 
 # ===============================================================
-# 3️⃣ PDF GENERATION (NO CHANGE)
+# REQUEST IDS, HTTP METRICS, /metrics
 # ===============================================================
-def generate_trip_pdf(selected_df, total_trip_days, total_trip_hours, trip_date, output_path):
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    doc = SimpleDocTemplate(output_path, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    title_style = ParagraphStyle(
-        'CustomTitle', parent=styles['Heading1'],
-        fontSize=24, textColor=colors.HexColor('#4c1d95'),
-        alignment=1, spaceAfter=20
-    )
-
-    subtitle_style = ParagraphStyle(
-        'Subtitle', parent=styles['Heading2'],
-        fontSize=14, textColor=colors.HexColor('#6b21a8'),
-        alignment=1, spaceAfter=16
-    )
-
-    heading_style = ParagraphStyle(
-        'SectionHeading', parent=styles['Heading2'],
-        fontSize=16, textColor=colors.HexColor('#1d4ed8'),
-        spaceBefore=12, spaceAfter=8
-    )
-
-    elements.append(Paragraph("Trip Itinerary", title_style))
-    elements.append(Paragraph("Powered by Geo Intel Lab", subtitle_style))
-    elements.append(Spacer(1, 0.2 * inch))
-
-    summary_data = [
-        ["Total Days", str(total_trip_days)],
-        ["Total Hour", f"{total_trip_hours:.2f}"],
-        ["Trip Start Date", trip_date or "Not provided"],
-        ["Total Places", str(len(selected_df))]
-    ]
-
-    summary_table = Table(summary_data, colWidths=[2 * inch, 4 * inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e5e7eb')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#111827')),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('BOX', (0, 0), (-1, -1), 0.8, colors.HexColor('#4b5563')),
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 0.3 * inch))
-
-    elements.append(Paragraph("Selected Places", heading_style))
-
-    for idx, row in selected_df.iterrows():
-        name = str(row.get('name of the place', 'Unknown'))
-        category = row.get('category', 'N/A')
-        vstart, vend = row.get('visit_start', ''), row.get('visit_end', '')
-        time_str = f"{vstart} - {vend}" if vstart and vend else "N/A"
-        spend = str(row.get('spend_time_minutes', "N/A"))
-        try:
-            dist = float(row.get('distance_from_previous_km', 0.0))
-        except:
-            dist = 0.0
-        desc = str(row.get('description', 'No description')).replace('\n', ' ')
-
-        place_title = Paragraph(f"{idx+1}. {name}",
-                                ParagraphStyle('PlaceTitle',
-                                               parent=styles['Heading3'],
-                                               fontSize=13,
-                                               textColor=colors.HexColor('#7c2d12')))
-        elements.append(place_title)
-
-        place_table = Table([
-            ["Name", name],
-            ["Category", category],
-            ["Time", time_str],
-            ["Spend", f"{spend} minutes"],
-            ["Distance", f"{dist:.2f} km"],
-            ["Description", desc],
-        ], colWidths=[2.5 * inch, 3.8 * inch])
-
-        place_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#fee2e2')),
-            ('BACKGROUND', (1, 0), (1, -1), colors.HexColor('#f9fafb')),
-            ('BOX', (0, 0), (-1, -1), 0.8, colors.HexColor('#f97316')),
-        ]))
-
-        elements.append(place_table)
-        elements.append(Spacer(1, 0.18 * inch))
-
-    doc.build(elements)
+HTTP_SECONDS = REGISTRY.histogram(
+    "travelplan_http_request_duration_seconds", "HTTP request latency",
+    ("endpoint", "method", "status"))
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "travelplan_http_requests_in_flight", "HTTP requests being handled", ("endpoint",))
+ROUTE_LEGS = REGISTRY.counter(
+    "travelplan_route_legs_total", "Map route legs by geometry source", ("source",))
+
+
+def collect_cache_stats():
+    # Existing stats dicts, read at scrape time
+    yield ("travelplan_plan_cache_events_total", "counter", "Plan cache lookups and evictions",
+           "event", dict(plan_cache.stats))
+    yield ("travelplan_segment_cache_events_total", "counter", "Route segment cache lookups",
+           "event", dict(segment_cache.stats))
+    yield ("travelplan_ors_route_events_total", "counter", "Multi-stop routing and leg sources",
+           "event", dict(ors_client.stats))
+    yield ("travelplan_plan_cache_entries", "gauge", "Plans in the plan cache",
+           None, {"": len(plan_cache)})
+    yield ("travelplan_plan_jobs_in_flight", "gauge", "Queued and running planning jobs",
+           None, {"": plan_jobs.pending})
+
+
+REGISTRY.add_collector(collect_cache_stats)
+
+
+@app.before_request
+def start_request():
+    # Reuse the caller's ID (e.g. from a proxy) so logs can be joined up
+    g.request_id = request.headers.get("X-Request-ID", "")[:64] or new_request_id()
+    g.request_token = request_id_var.set(g.request_id)
+    g.request_start = time.perf_counter()
+    g.endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    HTTP_IN_FLIGHT.inc(endpoint=g.endpoint)
+
+
+@app.after_request
+def tag_response(response):
+    response.headers["X-Request-ID"] = g.get("request_id", "")
+    g.status = response.status_code
+    return response
+
+
+@app.teardown_request
+def finish_request(exc):
+    if "request_start" not in g:
+        return
+    elapsed = time.perf_counter() - g.request_start
+    status = g.get("status", 500)
+    HTTP_IN_FLIGHT.dec(endpoint=g.endpoint)
+    HTTP_SECONDS.observe(elapsed, endpoint=g.endpoint, method=request.method, status=status)
+    if g.endpoint != "/metrics":
+        log_event("request", logging.ERROR if exc is not None else logging.INFO,
+                  method=request.method, path=request.path, endpoint=g.endpoint,
+                  status=status, ms=round(elapsed * 1000, 1),
+                  error=str(exc) if exc is not None else None)
+    request_id_var.reset(g.request_token)
+
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
 
 # ===============================================================
@@ -209,126 +229,465 @@ def info():
 def plan_home():
     return render_template('plan.html')
 
-# NEW ROUTE TO SERVE MAP FROM ROOT
-@app.route('/trip_plan_map.html')
-def serve_map():
-    return send_from_directory(project_root, 'trip_plan_map.html')
+# Static map page: renders /plan/<pid>/map.json in the browser
+@app.route('/map_view.html')
+def serve_map_view():
+    return send_from_directory(project_root, 'map_view.html', max_age=ARTIFACT_CACHE_MAX_AGE_S)
+
+# PER-PLAN MAP / PDF (content-addressed, safe with several workers).
+# Rendered from the stored plan on first access, served from disk after.
+@app.route('/plans/<pid>/<name>')
+@app.route('/plan/<pid>/<name>')
+def serve_plan_artifact(pid, name):
+    if not is_plan_id(pid) or name not in ARTIFACT_NAMES:
+        abort(404)
+
+    if not artifact_store.exists(pid, name):
+        record = artifact_store.load_plan(pid)
+        if record is None:
+            abort(404)
+
+        plan, params = plan_from_record(record)
+        if name == "itinerary.pdf":
+            # Built in memory and written to the store, then served from
+            # there below so the first response has the same caching headers
+            from trip_pdf import trip_pdf_bytes
+            with stage_timer("pdf"):
+                data = trip_pdf_bytes(plan.selected_df, params["num_days"],
+                                      plan.total_trip_hours, params["trip_date"])
+            artifact_store.ensure(pid, name, lambda path: write_bytes(path, data))
+        else:
+            try:
+                if name == "map.json":
+                    render_plan_map_data(plan, pid, params)
+                else:
+                    render_plan_map(plan, pid, params)
+            except Exception as e:
+                log_event("render_failed", logging.ERROR, plan_id=pid, artifact=name, error=str(e))
+                return "Could not render " + name, 503
+
+    # Plan IDs are content hashes, so a given URL never changes
+    return send_from_directory(artifact_store.root, f"{pid}/{name}",
+                               max_age=ARTIFACT_CACHE_MAX_AGE_S)
+
+# Same map data as GeoJSON (start point, numbered places, route line)
+@app.route('/plan/<pid>/map.geojson')
+def serve_plan_geojson(pid):
+    if not is_plan_id(pid):
+        abort(404)
+
+    data = load_map_data(pid)
+    if data is None:
+        record = artifact_store.load_plan(pid)
+        if record is None:
+            abort(404)
+        plan, params = plan_from_record(record)
+        try:
+            render_plan_map_data(plan, pid, params)
+        except Exception as e:
+            log_event("render_failed", logging.ERROR, plan_id=pid, artifact="map.json", error=str(e))
+            return "Could not render map.geojson", 503
+        data = load_map_data(pid)
+
+    response = Response(json.dumps(to_geojson(data), separators=(",", ":")),
+                        mimetype="application/geo+json")
+    response.cache_control.max_age = ARTIFACT_CACHE_MAX_AGE_S
+    return response
+
+# CACHE / ROUTING COUNTERS
+def marker_fragment_stats():
+    fragments = catalogue_fragments()
+    if fragments is None:
+        return None
+    return dict(fragments.stats, size=len(fragments))
+
+
+@app.route('/api/stats')
+def cache_stats():
+    return jsonify({
+        "plan_cache": dict(plan_cache.stats, size=len(plan_cache)),
+        "segment_cache": dict(segment_cache.stats),
+        "ors": dict(ors_client.stats),
+        "routing": routing_backend.describe(),
+        "marker_fragments": marker_fragment_stats(),
+    })
+
+# CATEGORY TAGS FOR THE /plan_trip FILTERS
+@app.route('/api/categories')
+def list_categories():
+    catalogue = places_store.current()
+    if catalogue is None:
+        return jsonify({"error": "Places database missing."}), 503
+    return jsonify({"tags": catalogue.category_index.counts()})
 
 # ===============================================================
-# 5️⃣ TRIP PLANNING LOGIC (NO CHANGES EXCEPT USING OSRM)
+# MAP RENDERING (FOLIUM)
 # ===============================================================
-def calculate_trip_plan(df, start_lat, start_lon, start_time, end_time, num_days):
-    try:
-        user_start = datetime.strptime(start_time, "%H:%M")
-        user_end = datetime.strptime(end_time, "%H:%M")
-    except:
-        return pd.DataFrame(), 0, 0, []
+def build_trip_map(selected_df, start_lat, start_lon, output_path, all_route_coords,
+                   fragments=None):
+    # all_route_coords: the (simplified) road geometry from plan_route_coords
+    # folium (and branca / jinja2 under it) loads on the first map, not at startup
+    import folium
+    from folium.plugins import AntPath
 
-    if user_end <= user_start:
-        user_end += timedelta(days=1)
+    from map_markers import MarkerLayer
 
-    hours_per_day = (user_end - user_start).total_seconds() / 3600.0
-    total_trip_hours = hours_per_day * max(1, int(num_days))
+    map_obj = folium.Map(location=[start_lat, start_lon], zoom_start=13)
 
-    if hours_per_day < 0.5:
-        return pd.DataFrame(), total_trip_hours, hours_per_day, []
+    # HOME MARKER (exact original design)
+    home_popup = folium.Popup(
+        "<b>Your Location</b><br>Trip Starting Point",
+        max_width=300
+    )
 
-    def parse_hhmm(val):
-        try:
-            return datetime.strptime(str(val), "%H:%M").time()
-        except:
-            return None
+    folium.Marker(
+        [start_lat, start_lon],
+        popup=home_popup,
+        icon=folium.Icon(color="blue", icon="home")
+    ).add_to(map_obj)
+
+    # Place markers: popups come from the fragment cache (static parts
+    # rendered once per place), all stops go out as one marker layer
+    if fragments is None:
+        fragments = MarkerFragments()
+    places = [(row["latitude"], row["longitude"], fragments.popup(row))
+              for row in selected_df.to_dict("records")]
+    MarkerLayer(places, color="pink", icon="info-sign").add_to(map_obj)
+
+    # Draw route (PURE ROAD / PATH ONLY); nothing to draw if no leg routed
+    route = as_coords(all_route_coords)
+    if len(route) >= 2:
+        AntPath(
+            locations=route.tolist(),
+            color="#2563eb",
+            pulseColor="#ec4899",
+            weight=6,
+            opacity=0.9,
+            delay=800
+        ).add_to(map_obj)
 
-    def to_min(t):
-        return t.hour * 60 + t.minute
 
-    start_time_obj = user_start.time()
 
-    # FILTER BY OPEN HOURS
-    def is_open(row):
-        open_t = parse_hhmm(row.get("visit_start"))
-        close_t = parse_hhmm(row.get("visit_end"))
-        if open_t is None or close_t is None:
-            return True
+    # ---------------------------------------------------------------
+    # INJECT CUSTOM HTML/CSS/JS FOR BACK BUTTON ONLY
+    # ---------------------------------------------------------------
+    custom_map_code = """
+    <style>
+        /* Back Button Styling */
+        .back-btn-map {
+            position: fixed;
+            bottom: 20px;
+            left: 20px;
+            z-index: 9999;
+            background: linear-gradient(135deg, #6366f1, #4f46e5);
+            color: white;
+            border: none;
+            padding: 12px 24px;
+            font-size: 16px;
+            font-family: 'Segoe UI', sans-serif;
+            font-weight: 600;
+            cursor: pointer;
+            border-radius: 50px;
+            box-shadow: 0 4px 15px rgba(0,0,0,0.3);
+            transition: transform 0.2s, box-shadow 0.2s;
+        }
+        .back-btn-map:hover {
+            transform: translateY(-2px);
+            box-shadow: 0 6px 20px rgba(0,0,0,0.4);
+        }
+    </style>
+
+    <!-- Back Button -->
+    <button class="back-btn-map" onclick="history.back()">&#8592; Back</button>
+
+    <script>
+        document.addEventListener("DOMContentLoaded", function() {
+            var attempt = 0;
+            var maxAttempts = 20; // Try for 10 seconds
+            
+            var checkMap = setInterval(function() {
+                attempt++;
+                
+                // Locate the Leaflet map object globally
+                var mapName = Object.keys(window).find(k => k.startsWith("map_"));
+                var map = window[mapName];
+
+                if (map && map.eachLayer) {
+                    clearInterval(checkMap);
+                    console.log("Map object found:", mapName);
+
+                    map.eachLayer(function(layer) {
+                        if (layer instanceof L.Marker) {
+                            if (layer.options && layer.options.icon && layer.options.icon.options) {
+                                var opts = layer.options.icon.options;
+                                
+                                // Target info-sign markers
+                                if (opts.icon === 'info-sign') {
+                                    layer.on('click', function(e) {
+                                        var currentIcon = this.getIcon();
+                                        var curColor = currentIcon.options.markerColor;
+                                        var newColor = (curColor === 'pink') ? 'blue' : 'pink';
+
+                                        var newIcon = L.AwesomeMarkers.icon({
+                                            icon: 'info-sign',
+                                            markerColor: newColor,
+                                            prefix: 'glyphicon',
+                                            iconColor: 'white'
+                                        });
+                                        this.setIcon(newIcon);
+                                        this.openPopup();
+                                    });
+                                }
+                            }
+                        }
+                    });
+                } else {
+                    if (attempt >= maxAttempts) {
+                        clearInterval(checkMap);
+                        console.error("Leaflet map object not found after retries.");
+                    }
+                }
+            }, 500); // Check every 500ms
+        });
+    </script>
+    """
+    map_obj.get_root().html.add_child(folium.Element(custom_map_code))
 
-        user_start_min = to_min(start_time_obj)
-        user_end_min = user_start_min + int(hours_per_day * 60)
+    # SAVE MAP
+    map_obj.save(output_path)
 
-        place_open_min = to_min(open_t)
-        place_close_min = to_min(close_t)
-        if place_close_min <= place_open_min:
-            place_close_min += 24 * 60
-        if user_end_min <= user_start_min:
-            user_end_min += 24 * 60
 
-        return max(user_start_min, place_open_min) < min(user_end_min, place_close_min)
+# ===============================================================
+# PLAN PIPELINE (SHARED BY THE FORM ROUTE AND BACKGROUND JOBS)
+# ===============================================================
+def get_plan(params, catalogue):
+    # Same hub (~100 m), times, days and catalogue -> same cached plan
+    plan_inputs = normalize_plan_inputs(
+        params["start_lat"], params["start_lon"], params["start_time"], params["end_time"],
+        params["num_days"], strategy=params["strategy"],
+        catalogue_fingerprint=catalogue.fingerprint, precision=PLAN_KEY_PRECISION,
+        routing=routing_backend.name if plan_table is not None else "",
+        return_to_start=params.get("return_to_start", False),
+        categories=params.get("categories"), exclude_categories=params.get("exclude_categories")
+    )
+    plan_key = plan_id(plan_inputs)
+
+    plan = plan_cache.get(plan_key, catalogue.fingerprint)
+    report = {}
+    if plan is None:
+        t0 = time.perf_counter()
+        selected_df, total_trip_hours, hours_per_day, geoms = calculate_trip_plan(
+            catalogue, params["start_lat"], params["start_lon"], params["start_time"],
+            params["end_time"], params["num_days"], strategy=params["strategy"],
+            time_budget_s=SOLVER_TIME_BUDGET_S, table=plan_table,
+            return_to_start=params.get("return_to_start", False),
+            categories=params.get("categories"), exclude_categories=params.get("exclude_categories"),
+            report=report
+        )
+        plan = CachedPlan(selected_df, total_trip_hours, hours_per_day)
+        # Empty plans and plans made without the road costs they were asked
+        # for are not worth keeping: the next request may do better
+        if len(selected_df) and not report.get("cost_fallback"):
+            plan_cache.put(plan_key, catalogue.fingerprint, plan)
+        log_event("plan_computed", plan_key=plan_key, strategy=params["strategy"],
+                  places=len(selected_df), cost_fallback=bool(report.get("cost_fallback")),
+                  ms=round((time.perf_counter() - t0) * 1000, 1))
+
+    # Rendered files also depend on the trip date (printed in the PDF);
+    # identical plans share them instead of rebuilding or overwriting.
+    # A fallback plan gets its own id so its files never stand in for the
+    # road-cost plan of the same inputs.
+    pid_inputs = dict(plan_inputs, date=str(params["trip_date"] or "").strip())
+    if report.get("cost_fallback"):
+        pid_inputs["costs"] = "haversine"
+    pid = plan_id(pid_inputs)
+    return plan, pid
+
+
+def store_plan(plan, pid, params, **extra):
+    # Everything the map / PDF endpoints need to render this plan later,
+    # possibly in another worker process
+    artifact_store.save_plan(pid, dict({
+        "params": params,
+        "total_trip_hours": plan.total_trip_hours,
+        "hours_per_day": plan.hours_per_day,
+        "places": json.loads(plan.selected_df.to_json(orient="records")),
+    }, **extra))
+
+
+def plan_from_record(record):
+    plan = CachedPlan(pd.DataFrame(record["places"]),
+                      record["total_trip_hours"], record["hours_per_day"])
+    return plan, record["params"]
+
+
+def write_bytes(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def artifact_url(pid, name, script_root=""):
+    # Built by hand so background workers (no request context) can use it
+    return f"{script_root}/plan/{pid}/{name}"
+
+
+def render_plan_pdf(plan, pid, params):
+    def render_pdf(path):
+        # ReportLab loads on the first PDF; trip_pdf builds its styles once
+        from trip_pdf import generate_trip_pdf
+        with stage_timer("pdf"):
+            generate_trip_pdf(plan.selected_df, params["num_days"], plan.total_trip_hours,
+                              params["trip_date"], path)
+
+    artifact_store.ensure(pid, "itinerary.pdf", render_pdf)
+
+
+def plan_route_coords(plan, pid, params):
+    # Road geometry is fetched and simplified once per plan; map.html and
+    # map.json share it
+    if plan.route_coords is None:
+        data = load_map_data(pid)
+        if data is not None:
+            plan.route_coords = decode_polyline(data["route"], data["precision"])
+        else:
+            plan.route_coords = join_legs(plan_route_legs(plan, pid, params))
+    return plan.route_coords
 
-    try:
-        open_places = df[df.apply(is_open, axis=1)].copy()
-    except:
-        open_places = df.copy()
 
-    if open_places.empty:
-        return pd.DataFrame(), total_trip_hours, hours_per_day, []
+# ===============================================================
+# PER-LEG ROUTE GEOMETRY (REUSED ACROSS EDITED PLANS)
+# ===============================================================
+def leg_key(src, dst):
+    return (round(src["lat"], 6), round(src["lng"], 6), round(dst["lat"], 6), round(dst["lng"], 6))
+
+
+def fetch_route_legs(points, known=None):
+    # One simplified (lat, lon) array (or None) per consecutive pair of
+    # points. Legs found in `known` ({leg_key: coords}) are reused; each run
+    # of missing legs is one routing backend call.
+    legs = [None] * max(len(points) - 1, 0)
+    runs = []
+    for i in range(len(legs)):
+        key = leg_key(points[i], points[i + 1])
+        if known and key in known:
+            legs[i] = known[key]
+        elif runs and runs[-1][1] == i - 1:
+            runs[-1] = (runs[-1][0], i)
+        else:
+            runs.append((i, i))
+
+    missing = sum(last - first + 1 for first, last in runs)
+    ROUTE_LEGS.inc(len(legs) - missing, source="reused")
+    ROUTE_LEGS.inc(missing, source="fetched")
+
+    deadline = time.monotonic() + ROUTE_DEADLINE_S
+    for first, last in runs:
+        with stage_timer("route_fetch"):
+            fetched = routing_backend.route_path(points[first:last + 2],
+                                                 deadline_s=max(deadline - time.monotonic(), 0.001))
+        with stage_timer("simplify"):
+            for i, coords in zip(range(first, last + 1), fetched):
+                if coords is not None:
+                    legs[i] = simplify_for_zoom(coords, ROUTE_SIMPLIFY_ZOOM, ROUTE_SIMPLIFY_PX)
+    return legs
+
+
+def stored_route_legs(pid):
+    # {leg_key: coords} from a plan's route record, or {} if it has none
+    record = artifact_store.load_record(pid, ROUTE_RECORD) if is_plan_id(pid or "") else None
+    if record is None:
+        return {}
+    known = {}
+    points = record["points"]
+    for i, encoded in enumerate(record["legs"]):
+        if encoded is not None:
+            key = leg_key(points[i], points[i + 1])
+            known[key] = decode_polyline(encoded, record["precision"])
+    return known
+
+
+def plan_route_legs(plan, pid, params):
+    # Edited plans start from their base plan's legs, so only new legs
+    # go to the routing backend
+    if plan.route_legs is None:
+        points = route_points(plan.selected_df, params["start_lat"], params["start_lon"],
+                              params.get("return_to_start", False))
+        known = stored_route_legs(pid) or stored_route_legs(params.get("base_plan"))
+        legs = fetch_route_legs(points, known)
+        artifact_store.save_record(pid, ROUTE_RECORD, {
+            "points": points,
+            "legs": [None if leg is None else encode_polyline(leg) for leg in legs],
+            "precision": POLYLINE_PRECISION,
+        })
+        plan.route_legs = legs
+    return plan.route_legs
+
+
+def load_map_data(pid):
+    if not artifact_store.exists(pid, "map.json"):
+        return None
+    try:
+        with open(artifact_store.path(pid, "map.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    # SORT BY APPROX DISTANCE
-    def quick_dist(a, b, c, d):
-        try:
-            return ((a - c) ** 2 + (b - d) ** 2) ** 0.5
-        except:
-            return 999999
 
-    open_places["approx_dist"] = open_places.apply(
-        lambda r: quick_dist(start_lat, start_lon, r["latitude"], r["longitude"]), axis=1
-    )
-    open_places = open_places.sort_values("approx_dist")
+def render_plan_map(plan, pid, params):
+    start_lat, start_lon = params["start_lat"], params["start_lon"]
 
-    remaining_minutes = total_trip_hours * 60
-    avg_speed = 25
+    def render_map(path):
+        coords = plan_route_coords(plan, pid, params)
+        with stage_timer("map_html"):
+            build_trip_map(plan.selected_df, start_lat, start_lon, path, coords,
+                           fragments=catalogue_fragments())
 
-    current_lat, current_lon = start_lat, start_lon
+    artifact_store.ensure(pid, "map.html", render_map)
 
-    selected = []
-    geoms = []
-    dists = []
 
-    for _, row in open_places.iterrows():
-        lat2 = float(row["latitude"])
-        lon2 = float(row["longitude"])
+def render_plan_map_data(plan, pid, params):
+    def render_data(path):
+        coords = plan_route_coords(plan, pid, params)
+        with stage_timer("map_json"):
+            data = build_map_data(plan.selected_df, params["start_lat"], params["start_lon"], coords)
+            with open(path, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
 
-        result = osrm_route(current_lat, current_lon, lat2, lon2)
+    artifact_store.ensure(pid, "map.json", render_data)
 
-        if result:
-            dist_km, geom = result
-        else:
-            approx = quick_dist(current_lat, current_lon, lat2, lon2)
-            dist_km = approx * 111
-            geom = None
 
+def map_view_url(pid, script_root=""):
+    return f"{script_root}/map_view.html?plan={pid}"
 
-        # Adjust speed for highway travel if distance is far
-        speed = 70 if dist_km > 50 else 25
-        travel_min = (dist_km / speed) * 60
-        spend_min = float(row.get("spend_time_minutes", 30))
 
-        if remaining_minutes < (travel_min + spend_min):
-            continue
+def replan_url(pid, script_root=""):
+    return f"{script_root}/plan/{pid}/replan"
 
-        selected.append(row.to_dict())
-        geoms.append(geom)
-        dists.append(round(dist_km, 2))
 
-        remaining_minutes -= (travel_min + spend_min)
-        current_lat, current_lon = lat2, lon2
+def google_maps_link(selected_df, start_lat, start_lon):
+    # GOOGLE MAPS MULTISTOP URL
+    try:
+        if len(selected_df) == 0:
+            return ""
 
-    if not selected:
-        return pd.DataFrame(), total_trip_hours, hours_per_day, []
+        origin = f"{start_lat},{start_lon}"
+        dest_lat = selected_df.iloc[-1]["latitude"]
+        dest_lon = selected_df.iloc[-1]["longitude"]
 
-    df_sel = pd.DataFrame(selected)
-    df_sel["distance_from_previous_km"] = dists
-    df_sel.reset_index(drop=True, inplace=True)
+        waypoints = "|".join(
+            f"{selected_df.iloc[i]['latitude']},{selected_df.iloc[i]['longitude']}"
+            for i in range(len(selected_df) - 1)
+        )
 
-    return df_sel, total_trip_hours, hours_per_day, geoms
+        return (
+            f"https://www.google.com/maps/dir/?api=1"
+            f"&origin={origin}"
+            f"&destination={dest_lat},{dest_lon}"
+            f"{'&waypoints=' + waypoints if waypoints else ''}"
+            f"&travelmode=driving"
+        )
+    except:
+        return ""
 
 
 # ===============================================================
@@ -339,298 +698,239 @@ def plan_trip():
     if request.method == "GET":
         return render_template("index.html")
 
-    try:
-        start_lat = float(request.form.get('start_lat', 0.0))
-        start_lon = float(request.form.get('start_lon', 0.0))
-    except:
-        return render_template("result.html", # CORRECTED: File is in root
-                               message="Invalid location data. Check GPS or manual location.")
+    params, error = parse_plan_params(request.form)
+    if error:
+        return render_template("result.html", message=error), 400 # CORRECTED: File is in root
 
-    start_time = request.form.get('start_time', '')
-    end_time = request.form.get('end_time', '')
-    num_days = int(request.form.get('num_days', 1))
-    trip_date = request.form.get('trip_date', '')
+    # Optional async mode: hand the pipeline to a worker, answer with a job ID
+    if request.values.get('async') in ("1", "true", "yes"):
+        return submit_plan_job(params)
 
-    if not start_time or not end_time:
-        return render_template("result.html", message="Start & End times required.") # CORRECTED
-
-    csv_path = os.path.join(project_root, "tirupati_places_final_updated.csv")
-    if not os.path.exists(csv_path):
+    catalogue = places_store.current()
+    if catalogue is None:
         return render_template("result.html", message="Places database missing.") # CORRECTED
 
-    df = pd.read_csv(csv_path)
-    if df.empty:
+    if catalogue.empty:
         return render_template("result.html", message="Places CSV empty.") # CORRECTED
 
-    selected_df, total_trip_hours, hours_per_day, geoms = calculate_trip_plan(
-        df, start_lat, start_lon, start_time, end_time, num_days
-    )
+    unknown = unknown_categories(catalogue, params)
+    if unknown:
+        return render_template("result.html", message="Unknown category: " + ", ".join(unknown)), 400
+
+    plan, pid = get_plan(params, catalogue)
+    selected_df = plan.selected_df
 
     if selected_df.empty:
         return render_template("result.html", # CORRECTED
                                message="No places found. Increase time or choose nearer locations.",
                                places=[])
 
-    # GENERATE PDF
-    pdf_path = os.path.join(static_dir, "trip_itinerary.pdf")
-    generate_trip_pdf(selected_df, num_days, total_trip_hours, trip_date, pdf_path)
-    pdf_url = url_for("static", filename="trip_itinerary.pdf")
+    # Map and PDF are rendered lazily by their endpoints on first access
+    store_plan(plan, pid, params)
+    pdf_url = url_for("serve_plan_artifact", pid=pid, name="itinerary.pdf")
+    map_url = url_for("serve_plan_artifact", pid=pid, name="map.html")
+    map_data_url = url_for("serve_plan_artifact", pid=pid, name="map.json")
 
-    # ===============================================================
-    # F. LEAFLET MAP — ONLY OSRM ROAD ROUTES (NO STRAIGHT LINES)
-    # ===============================================================
-    try:
-        map_obj = folium.Map(location=[start_lat, start_lon], zoom_start=13)
+    return render_template(
+        "result.html", # CORRECTED: File is in root
+        map_url=map_url,
+        map_data_url=map_data_url,
+        map_view_url=map_view_url(pid, request.script_root),
+        replan_url=replan_url(pid, request.script_root),
+        pdf_url=pdf_url,
+        google_maps_url=google_maps_link(selected_df, params["start_lat"], params["start_lon"]),
+        places_selected=len(selected_df),
+        places=selected_df.to_dict("records"),
+        total_trip_days=params["num_days"],
+        total_trip_hours=round(plan.total_trip_hours, 2),
+        hours_per_day=round(plan.hours_per_day, 2),
+        trip_date=params["trip_date"]
+    )
 
-        # HOME MARKER (exact original design)
-        home_popup = folium.Popup(
-            "<b>Your Location</b><br>Trip Starting Point",
-            max_width=300
-        )
 
-        folium.Marker(
-            [start_lat, start_lon],
-            popup=home_popup,
-            icon=folium.Icon(color="blue", icon="home")
-        ).add_to(map_obj)
+# ===============================================================
+# ASYNC PLAN JOBS
+# ===============================================================
+def run_plan_job(job, params, script_root=""):
+    # The expensive part is planning; map / PDF URLs point at the lazy
+    # endpoints and render when first opened
+    catalogue = places_store.current()
+    if catalogue is None or catalogue.empty:
+        raise RuntimeError("Places database missing or empty.")
+    unknown = unknown_categories(catalogue, params)
+    if unknown:
+        raise ValueError("Unknown category: " + ", ".join(unknown))
+
+    plan, pid = get_plan(params, catalogue)
+    selected_df = plan.selected_df
+    job.update(
+        plan_id=pid,
+        places_selected=len(selected_df),
+        places=json.loads(selected_df.to_json(orient="records")),
+        total_trip_days=params["num_days"],
+        total_trip_hours=round(plan.total_trip_hours, 2),
+        hours_per_day=round(plan.hours_per_day, 2),
+        trip_date=params["trip_date"],
+        google_maps_url=google_maps_link(selected_df, params["start_lat"], params["start_lon"]),
+        pdf_url=None,
+        map_url=None,
+        map_data_url=None,
+        map_view_url=None,
+    )
+    if selected_df.empty:
+        job.update(message="No places found. Increase time or choose nearer locations.")
+        return
+
+    store_plan(plan, pid, params)
+    job.update(
+        pdf_url=artifact_url(pid, "itinerary.pdf", script_root),
+        map_url=artifact_url(pid, "map.html", script_root),
+        map_data_url=artifact_url(pid, "map.json", script_root),
+        map_view_url=map_view_url(pid, script_root),
+        replan_url=replan_url(pid, script_root),
+    )
 
-        # We'll collect the places into a list for a combined OSRM call
-        places_list = []
-
-        # Add markers (exact original popup design) and build places_list
-        for idx, row in selected_df.iterrows():
-            place_lat = row["latitude"]
-            place_lon = row["longitude"]
-            name = row["name of the place"]
-            cat = row.get("category", "")
-            vst = row.get("visit_start", "")
-            ven = row.get("visit_end", "")
-            spend = row.get("spend_time_minutes", "")
-            dist_prev = row.get("distance_from_previous_km", 0.0)
-            desc = row.get("description", "")
-
-            popup_html = f"""
-                <div style='width:320px; font-family:"Segoe UI", sans-serif; padding:5px;'>
-                    <div style='border-bottom: 2px solid #ec4899; margin-bottom: 10px; padding-bottom: 5px;'>
-                        <h3 style='margin:0; color:#831843; font-size:16px;'>{name}</h3>
-                    </div>
-
-                    <table style='width:100%; border-collapse:collapse; font-size:13px;'>
-                        <tr style='border-bottom: 1px solid #fce7f3;'>
-                            <td style='padding:6px 0; color:#9d174d; font-weight:600; vertical-align:top; width:90px;'>Category</td>
-                            <td style='padding:6px 0; color:#374151;'>{cat}</td>
-                        </tr>
-                        <tr style='border-bottom: 1px solid #fce7f3;'>
-                            <td style='padding:6px 0; color:#9d174d; font-weight:600; vertical-align:top;'>Visit</td>
-                            <td style='padding:6px 0; color:#374151;'>{vst} - {ven}</td>
-                        </tr>
-                        <tr style='border-bottom: 1px solid #fce7f3;'>
-                            <td style='padding:6px 0; color:#9d174d; font-weight:600; vertical-align:top;'>Spend</td>
-                            <td style='padding:6px 0; color:#374151;'>{spend} mins</td>
-                        </tr>
-                        <tr style='border-bottom: 1px solid #fce7f3;'>
-                            <td style='padding:6px 0; color:#9d174d; font-weight:600; vertical-align:top;'>Distance</td>
-                            <td style='padding:6px 0; color:#374151;'>{dist_prev:.2f} km</td>
-                        </tr>
-                        <tr>
-                            <td style='padding:8px 0; color:#9d174d; font-weight:600; vertical-align:top;'>Description</td>
-                            <td style='padding:8px 0; color:#4b5563; line-height:1.4;'>{desc}</td>
-                        </tr>
-                    </table>
-                </div>
-            """
-
-            folium.Marker(
-                [place_lat, place_lon],
-                popup=popup_html,
-                icon=folium.Icon(color="pink", icon="info-sign")
-            ).add_to(map_obj)
-
-            # append to places_list in the format needed
-            places_list.append({"lat": float(place_lat), "lng": float(place_lon)})
-
-        # Use the order from the itinerary (selected_df) directly
-        sorted_places = places_list
-
-
-        # =========================================================
-        # ROBUST SEGMENT-BASED ROUTING (NEVER BREAKS ROUTE)
-        # =========================================================
-
-        # =========================
-        # ROUTING WITH PROFILE FALLBACK
-        # =========================
-
-        all_route_coords = []
-
-        points = [{"lat": start_lat, "lng": start_lon}] + sorted_places
-
-        for i in range(len(points) - 1):
-            src = points[i]
-            dst = points[i + 1]
-
-            # Try DRIVING first
-            seg = ors_segment(src, dst, profile="driving-car")
-
-            # If driving fails, try WALKING
-            if not seg or "features" not in seg:
-                print("Driving failed, switching to walking:", dst)
-                seg = ors_segment(src, dst, profile="foot-walking")
-
-            # If walking also fails → SKIP (no straight line)
-            if not seg or "features" not in seg:
-                print("Unroutable even for walking:", dst)
-                continue
-
-            coords = [(c[1], c[0]) for c in seg["features"][0]["geometry"]["coordinates"]]
-
-            if all_route_coords:
-                coords = coords[1:]
-
-            all_route_coords.extend(coords)
-
-
-        # Draw route (PURE ROAD / PATH ONLY)
-        AntPath(
-            locations=all_route_coords,
-            color="#2563eb",
-            pulseColor="#ec4899",
-            weight=6,
-            opacity=0.9,
-            delay=800
-        ).add_to(map_obj)
 
+def submit_plan_job(params):
+    try:
+        job = plan_jobs.submit(run_plan_job, params, script_root=request.script_root)
+    except QueueFull as e:
+        return jsonify({"error": str(e)}), 503
 
+    status_url = url_for("plan_job_status", job_id=job.id)
+    return jsonify({"job_id": job.id, "status": job.status, "status_url": status_url}), 202, {
+        "Location": status_url
+    }
 
-        # ---------------------------------------------------------------
-        # INJECT CUSTOM HTML/CSS/JS FOR BACK BUTTON ONLY
-        # ---------------------------------------------------------------
-        custom_map_code = """
-        <style>
-            /* Back Button Styling */
-            .back-btn-map {
-                position: fixed;
-                bottom: 20px;
-                left: 20px;
-                z-index: 9999;
-                background: linear-gradient(135deg, #6366f1, #4f46e5);
-                color: white;
-                border: none;
-                padding: 12px 24px;
-                font-size: 16px;
-                font-family: 'Segoe UI', sans-serif;
-                font-weight: 600;
-                cursor: pointer;
-                border-radius: 50px;
-                box-shadow: 0 4px 15px rgba(0,0,0,0.3);
-                transition: transform 0.2s, box-shadow 0.2s;
-            }
-            .back-btn-map:hover {
-                transform: translateY(-2px);
-                box-shadow: 0 6px 20px rgba(0,0,0,0.4);
-            }
-        </style>
-
-        <!-- Back Button -->
-        <button class="back-btn-map" onclick="history.back()">&#8592; Back</button>
-
-        <script>
-            document.addEventListener("DOMContentLoaded", function() {
-                var attempt = 0;
-                var maxAttempts = 20; // Try for 10 seconds
-                
-                var checkMap = setInterval(function() {
-                    attempt++;
-                    
-                    // Locate the Leaflet map object globally
-                    var mapName = Object.keys(window).find(k => k.startsWith("map_"));
-                    var map = window[mapName];
-
-                    if (map && map.eachLayer) {
-                        clearInterval(checkMap);
-                        console.log("Map object found:", mapName);
-
-                        map.eachLayer(function(layer) {
-                            if (layer instanceof L.Marker) {
-                                if (layer.options && layer.options.icon && layer.options.icon.options) {
-                                    var opts = layer.options.icon.options;
-                                    
-                                    // Target info-sign markers
-                                    if (opts.icon === 'info-sign') {
-                                        layer.on('click', function(e) {
-                                            var currentIcon = this.getIcon();
-                                            var curColor = currentIcon.options.markerColor;
-                                            var newColor = (curColor === 'pink') ? 'blue' : 'pink';
-
-                                            var newIcon = L.AwesomeMarkers.icon({
-                                                icon: 'info-sign',
-                                                markerColor: newColor,
-                                                prefix: 'glyphicon',
-                                                iconColor: 'white'
-                                            });
-                                            this.setIcon(newIcon);
-                                            this.openPopup();
-                                        });
-                                    }
-                                }
-                            }
-                        });
-                    } else {
-                        if (attempt >= maxAttempts) {
-                            clearInterval(checkMap);
-                            console.error("Leaflet map object not found after retries.");
-                        }
-                    }
-                }, 500); // Check every 500ms
-            });
-        </script>
-        """
-        map_obj.get_root().html.add_child(folium.Element(custom_map_code))
 
-        # SAVE MAP
-        html_path = os.path.join(project_root, "trip_plan_map.html") # CHANGED: Save to root
-        map_obj.save(html_path)
-        map_url = "/trip_plan_map.html" # CHANGED: Point to new route
+@app.route('/plan_trip/<job_id>')
+def plan_job_status(job_id):
+    job = plan_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.snapshot())
 
-    except Exception as e:
-        print("MAP ERROR:", e)
-        map_url = ""
 
-    # GOOGLE MAPS MULTISTOP URL
-    google_maps_url = ""
+# ===============================================================
+# RE-PLAN API: EDIT A STORED PLAN (REMOVE / PIN STOPS, NEW END TIME)
+# ===============================================================
+@app.route('/plan/<pid>/replan', methods=['POST'])
+def replan(pid):
+    # Body (JSON or form): {"remove": [names], "pin": [names], "end_time": "HH:MM"}.
+    # Answers with a new plan ID; its map reuses the base plan's route legs
+    if not is_plan_id(pid):
+        abort(404)
+    record = artifact_store.load_plan(pid)
+    if record is None:
+        return jsonify({"error": "unknown plan"}), 404
+
+    catalogue = places_store.current()
+    if catalogue is None or catalogue.empty:
+        return jsonify({"error": "Places database missing or empty."}), 503
+
+    edits = request.get_json(silent=True) or request.form
+    if not isinstance(edits, dict):
+        return jsonify({"error": "Expected a JSON object of edits."}), 400
     try:
-        if len(selected_df) > 0:
-            origin = f"{start_lat},{start_lon}"
-            dest_lat = selected_df.iloc[-1]["latitude"]
-            dest_lon = selected_df.iloc[-1]["longitude"]
-
-            waypoints = "|".join(
-                f"{selected_df.iloc[i]['latitude']},{selected_df.iloc[i]['longitude']}"
-                for i in range(len(selected_df) - 1)
-            )
-
-            google_maps_url = (
-                f"https://www.google.com/maps/dir/?api=1"
-                f"&origin={origin}"
-                f"&destination={dest_lat},{dest_lon}"
-                f"{'&waypoints=' + waypoints if waypoints else ''}"
-                f"&travelmode=driving"
-            )
-    except:
-        google_maps_url = ""
+        remove = form_list(edits, "remove")
+        pin = form_list(edits, "pin")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    end_time = edits.get("end_time")
+    if end_time is not None and not isinstance(end_time, str):
+        return jsonify({"error": "'end_time' must be a string like \"18:00\"."}), 400
+    end_time = (end_time or "").strip() or None
+
+    params = record["params"]
+    new_pid = plan_id({
+        "base": pid,
+        "remove": sorted(remove),
+        "pin": sorted(pin),
+        "end": end_time or params["end_time"],
+        "catalogue": catalogue.fingerprint,
+    })
+
+    new_record = artifact_store.load_plan(new_pid)
+    if new_record is None:
+        base, _ = plan_from_record(record)
+        t0 = time.perf_counter()
+        result, error = replan_trip(catalogue, base.selected_df, params, remove=remove, pin=pin,
+                                    end_time=end_time, time_budget_s=SOLVER_TIME_BUDGET_S,
+                                    table=plan_table)
+        if error:
+            return jsonify({"error": error}), 400
+
+        new_params = dict(params, end_time=result["end_time"], pinned=result["pinned"],
+                          removed=result["removed"], base_plan=pid)
+        plan = CachedPlan(result["selected_df"], result["total_trip_hours"], result["hours_per_day"])
+        store_plan(plan, new_pid, new_params, changes=result["changes"])
+        new_record = artifact_store.load_plan(new_pid)
+        log_event("plan_replanned", plan_id=new_pid, base_plan=pid, places=len(plan.selected_df),
+                  ms=round((time.perf_counter() - t0) * 1000, 1), **result["changes"])
+
+    new_params = new_record["params"]
+    places = new_record["places"]
+    script_root = request.script_root
+    response = {
+        "plan_id": new_pid,
+        "base_plan_id": pid,
+        "changes": new_record.get("changes", {}),
+        "pinned": new_params.get("pinned", []),
+        "places_selected": len(places),
+        "places": places,
+        "total_trip_days": new_params["num_days"],
+        "total_trip_hours": round(new_record["total_trip_hours"], 2),
+        "hours_per_day": round(new_record["hours_per_day"], 2),
+        "end_time": new_params["end_time"],
+        "replan_url": replan_url(new_pid, script_root),
+        "pdf_url": None,
+        "map_url": None,
+        "map_data_url": None,
+        "map_view_url": None,
+    }
+    if places:
+        response.update(
+            pdf_url=artifact_url(new_pid, "itinerary.pdf", script_root),
+            map_url=artifact_url(new_pid, "map.html", script_root),
+            map_data_url=artifact_url(new_pid, "map.json", script_root),
+            map_view_url=map_view_url(new_pid, script_root),
+        )
+    else:
+        response["message"] = "No places left in this plan."
+    return jsonify(response)
 
-    return render_template(
-        "result.html", # CORRECTED: File is in root
-        map_url=map_url,
-        pdf_url=pdf_url,
-        google_maps_url=google_maps_url,
-        places_selected=len(selected_df),
-        places=selected_df.to_dict("records"),
-        total_trip_days=num_days,
-        total_trip_hours=round(total_trip_hours, 2),
-        hours_per_day=round(hours_per_day, 2),
-        trip_date=trip_date
-    )
+
+# ===============================================================
+# BATCH PLANNING API
+# ===============================================================
+@app.route('/api/plan_batch', methods=['POST'])
+def plan_batch():
+    # Body: JSON list of requests, {"requests": [...]}, or JSONL.
+    # Response: one JSON result per line, streamed in input order.
+    catalogue = places_store.current()
+    if catalogue is None or catalogue.empty:
+        return jsonify({"error": "Places database missing or empty."}), 503
+
+    body = request.get_data(as_text=True)
+    try:
+        if body.lstrip().startswith("["):
+            items = json.loads(body)
+        elif body.lstrip().startswith("{") and '"requests"' in body.split("\n", 1)[0]:
+            items = json.loads(body)["requests"]
+        else:
+            items = list(read_requests(io.StringIO(body), "jsonl"))
+    except (ValueError, KeyError, TypeError):
+        return jsonify({"error": "Expected a JSON list, {\"requests\": [...]} or JSONL."}), 400
+    if not isinstance(items, list):
+        return jsonify({"error": "Expected a JSON list, {\"requests\": [...]} or JSONL."}), 400
+
+    if len(items) > BATCH_MAX_REQUESTS:
+        return jsonify({"error": f"At most {BATCH_MAX_REQUESTS} requests per batch."}), 413
+
+    render = request.args.get('render') in ("1", "true", "yes")
+    records = run_batch(items, catalogue=catalogue, csv_path=places_csv_path, workers=BATCH_WORKERS,
+                        render=render, app_module=sys.modules[__name__])
+    return Response((json.dumps(r) + "\n" for r in records), mimetype="application/x-ndjson")
 
 
 # ===============================================================
@@ -0,0 +1,191 @@
+# artifact_store.py
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from catalogue_columns import normalize_tag
+
+# Files a plan may have; anything else is rejected when serving
+ARTIFACT_NAMES = ("map.html", "map.json", "itinerary.pdf")
+
+# Stored itinerary that the artifacts are rendered from on first access
+PLAN_RECORD = "plan.json"
+# Per-leg route geometry, reused when an edited plan shares legs
+ROUTE_RECORD = "route.json"
+RECORD_NAMES = (PLAN_RECORD, ROUTE_RECORD)
+
+DEFAULT_MAX_AGE_S = 3 * 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+GC_INTERVAL_S = 300
+
+_PLAN_ID_RE = re.compile(r"^[0-9a-f]{20}$")
+
+
+# ===============================================================
+# CONTENT-ADDRESSED PLAN ID
+# ===============================================================
+def normalize_plan_inputs(start_lat, start_lon, start_time, end_time, num_days,
+                          trip_date="", strategy=None, catalogue_fingerprint="",
+                          precision=5, routing="", return_to_start=False,
+                          categories=(), exclude_categories=()):
+    inputs = {
+        "lat": round(float(start_lat), precision),
+        "lon": round(float(start_lon), precision),
+        "start": str(start_time).strip(),
+        "end": str(end_time).strip(),
+        "days": int(num_days),
+        "date": str(trip_date or "").strip(),
+        "strategy": strategy or "",
+        "catalogue": catalogue_fingerprint or "",
+    }
+    # Only present when plans use road costs, so existing IDs stay valid
+    if routing:
+        inputs["routing"] = routing
+    if return_to_start:
+        inputs["return"] = True
+    if categories:
+        inputs["categories"] = sorted({normalize_tag(c) for c in categories})
+    if exclude_categories:
+        inputs["exclude"] = sorted({normalize_tag(c) for c in exclude_categories})
+    return inputs
+
+
+def plan_id(inputs):
+    blob = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:20]
+
+
+def is_plan_id(value):
+    return bool(_PLAN_ID_RE.match(value or ""))
+
+
+# ===============================================================
+# ARTIFACT STORE: ONE DIRECTORY PER PLAN, ATOMIC WRITES, AGE/SIZE GC
+# ===============================================================
+class ArtifactStore:
+
+    def __init__(self, root, max_age_s=DEFAULT_MAX_AGE_S, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_age_s = max_age_s
+        self.max_bytes = max_bytes
+        self._gc_lock = threading.Lock()
+        self._render_locks = {}
+        self._render_locks_lock = threading.Lock()
+        self._last_gc = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, pid, name):
+        if not is_plan_id(pid) or (name not in ARTIFACT_NAMES and name not in RECORD_NAMES):
+            raise ValueError(f"bad artifact reference: {pid}/{name}")
+        return os.path.join(self.root, pid, name)
+
+    def exists(self, pid, name):
+        path = self.path(pid, name)
+        if not os.path.exists(path):
+            return False
+        # Bump mtime so size-based GC evicts least recently used plans first
+        try:
+            os.utime(os.path.dirname(path))
+        except OSError:
+            pass
+        return True
+
+    def write(self, pid, name, render):
+        # render(path) writes the artifact; it lands under its final name
+        # only when complete, so concurrent workers never serve partial files
+        final = self.path(pid, name)
+        plan_dir = os.path.dirname(final)
+        os.makedirs(plan_dir, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=plan_dir, prefix=".tmp-", suffix="-" + name)
+        os.close(fd)
+        try:
+            render(tmp)
+            os.replace(tmp, final)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+        self.maybe_gc()
+        return final
+
+    def ensure(self, pid, name, render):
+        # Dedup: identical plans share one rendered artifact, and concurrent
+        # first requests in this process render it only once
+        if self.exists(pid, name):
+            return self.path(pid, name)
+
+        key = (pid, name)
+        with self._render_locks_lock:
+            lock = self._render_locks.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                if self.exists(pid, name):
+                    return self.path(pid, name)
+                return self.write(pid, name, render)
+        finally:
+            with self._render_locks_lock:
+                self._render_locks.pop(key, None)
+
+    # -----------------------------------------------------------
+    # STORED JSON RECORDS (PLAN, ROUTE LEGS)
+    # -----------------------------------------------------------
+    def save_record(self, pid, name, record):
+        def dump(path):
+            with open(path, "w") as f:
+                json.dump(record, f, separators=(",", ":"))
+        return self.ensure(pid, name, dump)
+
+    def load_record(self, pid, name):
+        try:
+            with open(self.path(pid, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_plan(self, pid, record):
+        return self.save_record(pid, PLAN_RECORD, record)
+
+    def load_plan(self, pid):
+        return self.load_record(pid, PLAN_RECORD)
+
+    # -----------------------------------------------------------
+    # GARBAGE COLLECTION
+    # -----------------------------------------------------------
+    def maybe_gc(self):
+        now = time.time()
+        if now - self._last_gc < GC_INTERVAL_S or not self._gc_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_gc = now
+            self.gc(now)
+        finally:
+            self._gc_lock.release()
+
+    def gc(self, now=None):
+        now = now or time.time()
+        plans = []
+        for pid in os.listdir(self.root):
+            plan_dir = os.path.join(self.root, pid)
+            if not is_plan_id(pid) or not os.path.isdir(plan_dir):
+                continue
+            try:
+                mtime = os.stat(plan_dir).st_mtime
+                size = sum(e.stat().st_size for e in os.scandir(plan_dir) if e.is_file())
+            except OSError:
+                continue
+            plans.append((mtime, size, plan_dir))
+
+        removed = 0
+        total = sum(size for _, size, _ in plans)
+        for mtime, size, plan_dir in sorted(plans):
+            if now - mtime > self.max_age_s or total > self.max_bytes:
+                shutil.rmtree(plan_dir, ignore_errors=True)
+                total -= size
+                removed += 1
+        return removed
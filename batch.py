@@ -0,0 +1,189 @@
+# batch.py
+import argparse
+import csv
+import importlib
+import io
+import json
+import multiprocessing as mp
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from places_store import PlacesStore
+from planner import calculate_trip_plan, parse_plan_params, unknown_categories
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "tirupati_places_final_updated.csv")
+
+# Worker processes per batch; kept small because every worker loads its
+# own catalogue (and, when rendering, its own copy of the app)
+DEFAULT_WORKERS = 2
+
+# Worker-process state, set by _init_worker in each child only
+_catalogue = None
+_render = False
+
+
+# ===============================================================
+# INPUT: CSV OR JSONL PLANNING REQUESTS
+# ===============================================================
+class InvalidRequest(ValueError):
+    # Stands in for an input line that couldn't be read, so it still gets
+    # its own error record in the output
+    pass
+
+
+def read_requests(stream, fmt=None):
+    # Yields one dict per request (or an InvalidRequest for a line that
+    # isn't JSON); fmt is "csv" or "jsonl" (sniffed if None)
+    if fmt is None:
+        first = stream.readline()
+        fmt = "jsonl" if first.lstrip().startswith("{") else "csv"
+        stream = io.StringIO(first + stream.read())
+
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield row
+    else:
+        for n, line in enumerate(stream, 1):
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield InvalidRequest(f"Line {n}: invalid JSON ({e})")
+
+
+# ===============================================================
+# WORKER SIDE
+# ===============================================================
+def _init_worker(csv_path, render):
+    # Runs in each freshly spawned worker: nothing is inherited from the
+    # parent (no threads, locks, sockets or SQLite handles), so the worker
+    # loads the catalogue itself; the compiled columns make this quick
+    global _catalogue, _render
+    _catalogue = PlacesStore(csv_path).current()
+    _render = render
+
+
+def plan_one(item):
+    return plan_item(item, _catalogue, _render)
+
+
+def plan_item(item, catalogue, render=False, app=None):
+    # One request -> result record. Rendering needs the ORS client, caches
+    # and artifact store: the web app passes itself in, workers import it.
+    n, raw = item
+    if isinstance(raw, InvalidRequest):
+        return {"id": n, "ok": False, "error": str(raw)}
+    if not isinstance(raw, dict):
+        return {"id": n, "ok": False, "error": "Each request must be a JSON object."}
+    request_id = raw.get("id", n)
+    params, error = parse_plan_params(raw)
+    if error:
+        return {"id": request_id, "ok": False, "error": error}
+    if catalogue is None:
+        return {"id": request_id, "ok": False, "error": "Places database missing."}
+    unknown = unknown_categories(catalogue, params)
+    if unknown:
+        return {"id": request_id, "ok": False, "error": "Unknown category: " + ", ".join(unknown)}
+
+    try:
+        if render:
+            app = app or importlib.import_module("app")
+            plan, pid = app.get_plan(params, catalogue)
+            selected_df = plan.selected_df
+            total_trip_hours, hours_per_day = plan.total_trip_hours, plan.hours_per_day
+        else:
+            selected_df, total_trip_hours, hours_per_day, _ = calculate_trip_plan(
+                catalogue, params["start_lat"], params["start_lon"], params["start_time"],
+                params["end_time"], params["num_days"], strategy=params["strategy"],
+                return_to_start=params["return_to_start"],
+                categories=params["categories"], exclude_categories=params["exclude_categories"]
+            )
+    except Exception as e:
+        return {"id": request_id, "ok": False, "error": str(e)}
+
+    record = {
+        "id": request_id,
+        "ok": True,
+        "places_selected": len(selected_df),
+        "total_trip_hours": round(total_trip_hours, 2),
+        "hours_per_day": round(hours_per_day, 2),
+        "places": json.loads(selected_df.to_json(orient="records")) if len(selected_df) else [],
+    }
+
+    # A failed render is reported on the record; the plan itself still stands
+    if render and len(selected_df):
+        record["plan_id"] = pid
+        try:
+            app.render_plan_pdf(plan, pid, params)
+            record["pdf_url"] = app.artifact_url(pid, "itinerary.pdf")
+        except Exception as e:
+            record["pdf_url"] = ""
+            record["pdf_error"] = str(e)
+        try:
+            app.render_plan_map(plan, pid, params)
+            record["map_url"] = app.artifact_url(pid, "map.html")
+        except Exception as e:
+            record["map_url"] = ""
+            record["map_error"] = str(e)
+
+    return record
+
+
+# ===============================================================
+# DRIVER
+# ===============================================================
+def run_batch(requests, catalogue=None, csv_path=DEFAULT_CSV, workers=DEFAULT_WORKERS,
+              render=False, chunksize=8, app_module=None):
+    # Yields one result record per request, in input order. With one
+    # worker everything runs in this process on `catalogue`; otherwise
+    # spawned worker processes each load csv_path themselves.
+    workers = max(1, int(workers or DEFAULT_WORKERS))
+
+    if workers == 1:
+        if catalogue is None:
+            catalogue = PlacesStore(csv_path).current()
+        for item in enumerate(requests):
+            yield plan_item(item, catalogue, render, app_module)
+        return
+
+    # Never fork: the parent may be the multithreaded web app
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(csv_path, render)) as pool:
+        for record in pool.map(plan_one, enumerate(requests), chunksize=chunksize):
+            yield record
+
+
+# ===============================================================
+# CLI: python batch.py requests.jsonl -o plans.jsonl
+# ===============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan many trips at once.")
+    parser.add_argument("input", help="CSV or JSONL file of planning requests ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="input format (default: sniff)")
+    parser.add_argument("--places", default=DEFAULT_CSV, help="places catalogue CSV")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"worker processes (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--render", action="store_true", help="also render map and PDF artifacts")
+    args = parser.parse_args(argv)
+
+    src = sys.stdin if args.input == "-" else open(args.input, newline="")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for record in run_batch(read_requests(src, args.format), csv_path=args.places,
+                                workers=args.workers, render=args.render):
+            dst.write(json.dumps(record) + "\n")
+            dst.flush()
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+
+if __name__ == "__main__":
+    main()
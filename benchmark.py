@@ -0,0 +1,308 @@
+# benchmark.py
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from geometry import join_legs, simplify_for_zoom
+from map_data import build_map_data
+from mock_ors import synthetic_route
+from ors_client import OrsClient
+from places_store import PlacesStore
+from planner import calculate_trip_plan, route_points
+from trip_pdf import trip_pdf_bytes
+
+DEFAULT_SIZES = (30, 1000, 10000, 100000)
+DEFAULT_DAYS = (1, 3)
+DEFAULT_WINDOWS = ("09:00-13:00", "09:00-18:00")
+DEFAULT_STRATEGIES = ("greedy", "nn_2opt")
+STAGES = ("catalogue_load", "spatial_index", "plan", "route", "simplify",
+          "map_json", "map_html", "pdf")
+
+# Synthetic places are scattered around Tirupati, denser catalogues
+# covering a wider area (about 2.5 km radius per sqrt(1000) places)
+CENTER = (13.6288, 79.4192)
+CATEGORIES = ("Temple", "Food", "Waterfall / Nature", "Zoo / Park", "Museum",
+              "Religious site", "Natural Arch / Sight", "Shopping", "Viewpoint")
+
+
+# ===============================================================
+# SYNTHETIC CATALOGUE (SAME SCHEMA AS tirupati_places_final_updated.csv)
+# ===============================================================
+def synthetic_catalogue(n, seed=0):
+    rng = np.random.default_rng(seed)
+    radius_km = max(10.0, 0.5 * np.sqrt(n))
+    r = radius_km * np.sqrt(rng.random(n))
+    theta = 2 * np.pi * rng.random(n)
+    lat = CENTER[0] + (r * np.sin(theta)) / 111.32
+    lon = CENTER[1] + (r * np.cos(theta)) / (111.32 * np.cos(np.radians(CENTER[0])))
+
+    open_min = rng.integers(5 * 60, 11 * 60, n) // 15 * 15
+    close_min = rng.integers(16 * 60, 22 * 60, n) // 15 * 15
+    visit_start = np.char.add(np.char.zfill((open_min // 60).astype(str), 2),
+                              np.char.add(":", np.char.zfill((open_min % 60).astype(str), 2)))
+    visit_end = np.char.add(np.char.zfill((close_min // 60).astype(str), 2),
+                            np.char.add(":", np.char.zfill((close_min % 60).astype(str), 2)))
+
+    df = pd.DataFrame({
+        "name of the place": [f"Place {i}" for i in range(n)],
+        "category": np.array(CATEGORIES)[rng.integers(0, len(CATEGORIES), n)],
+        "latitude": lat.round(6),
+        "longitude": lon.round(6),
+        "visit_start": visit_start.astype(object),
+        "visit_end": visit_end.astype(object),
+        "description": [f"Popular place {i} located in Tirupati region" for i in range(n)],
+        "spend_time_minutes": rng.integers(15, 121, n),
+    })
+
+    # Like the real data: some places open all day, some without hours
+    all_day = rng.random(n) < 0.1
+    df.loc[all_day, "visit_start"] = "00:00"
+    df.loc[all_day, "visit_end"] = "23:59"
+    missing = rng.random(n) < 0.05
+    df.loc[missing, ["visit_start", "visit_end"]] = None
+    return df
+
+
+# ===============================================================
+# DETERMINISTIC FAKE ORS (NO NETWORK, NO API KEY)
+# ===============================================================
+class FakeResponse:
+
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class FakeOrsSession:
+    # Stands in for OrsClient.session with mock_ors's synthetic routes, in
+    # process (mock_ors.py serves the same routes over HTTP)
+
+    def __init__(self, vertices_per_km=20, latency_s=0.0):
+        self.vertices_per_km = vertices_per_km
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return FakeResponse(200, synthetic_route(json["coordinates"], self.vertices_per_km))
+
+
+def fake_ors_client(latency_s=0.0):
+    client = OrsClient("benchmark", cache=None, rate_per_s=0)
+    client.session = FakeOrsSession(latency_s=latency_s)
+    return client
+
+
+# ===============================================================
+# TIMING
+# ===============================================================
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def _summary(samples):
+    return {
+        "runs": len(samples),
+        "min_s": round(min(samples), 6),
+        "median_s": round(statistics.median(samples), 6),
+        "mean_s": round(statistics.fmean(samples), 6),
+        "max_s": round(max(samples), 6),
+    }
+
+
+def _load_app(workdir):
+    # The folium map builder lives in the web app; keep its caches and
+    # artifact directory out of the project tree
+    os.environ.setdefault("ARTIFACT_DIR", os.path.join(workdir, "artifacts"))
+    os.environ.setdefault("ROUTE_CACHE_PATH", os.path.join(workdir, "route_cache.sqlite3"))
+    import app
+    return app
+
+
+def bench_case(csv_path, rows, days, window, strategy, repeat, ors, app=None,
+               render=True, simplify_zoom=16):
+    start_time, end_time = window.split("-")
+    start_lat, start_lon = CENTER
+    times = {stage: [] for stage in STAGES}
+    info = {}
+
+    for _ in range(repeat):
+        catalogue, t = _timed(PlacesStore(csv_path, load_matrix=False).current)
+        times["catalogue_load"].append(t)
+        _, t = _timed(lambda: catalogue.spatial_index)
+        times["spatial_index"].append(t)
+
+        (selected_df, total_hours, _, _), t = _timed(
+            calculate_trip_plan, catalogue, start_lat, start_lon, start_time, end_time,
+            days, strategy=strategy)
+        times["plan"].append(t)
+        info["stops"] = len(selected_df)
+        if selected_df.empty:
+            continue
+
+        points = route_points(selected_df, start_lat, start_lon)
+        coords, t = _timed(lambda: join_legs(ors.route_path(points)))
+        times["route"].append(t)
+        info["route_vertices"] = len(coords)
+
+        coords, t = _timed(simplify_for_zoom, coords, simplify_zoom)
+        times["simplify"].append(t)
+        info["simplified_vertices"] = len(coords)
+
+        data, t = _timed(lambda: json.dumps(build_map_data(selected_df, start_lat, start_lon, coords)))
+        times["map_json"].append(t)
+        info["map_json_bytes"] = len(data)
+
+        if not render:
+            continue
+
+        if app is not None:
+            with tempfile.NamedTemporaryFile(suffix=".html") as f:
+                _, t = _timed(app.build_trip_map, selected_df, start_lat, start_lon, f.name, coords)
+                times["map_html"].append(t)
+                info["map_html_bytes"] = os.path.getsize(f.name)
+
+        pdf, t = _timed(trip_pdf_bytes, selected_df, days, total_hours, "")
+        times["pdf"].append(t)
+        info["pdf_bytes"] = len(pdf)
+
+    return {
+        "catalogue_rows": rows,
+        "days": days,
+        "window": window,
+        "strategy": strategy,
+        **info,
+        "stages": {stage: _summary(s) for stage, s in times.items() if s},
+    }
+
+
+def run(sizes=DEFAULT_SIZES, days_list=DEFAULT_DAYS, windows=DEFAULT_WINDOWS,
+        strategies=DEFAULT_STRATEGIES, repeat=3, render=True, ors_latency_s=0.0,
+        seed=0, progress=None):
+    ors = fake_ors_client(ors_latency_s)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="tripbench-") as workdir:
+        app = _load_app(workdir) if render else None
+        for rows in sizes:
+            csv_path = os.path.join(workdir, f"places_{rows}.csv")
+            synthetic_catalogue(rows, seed).to_csv(csv_path, index=False)
+            for days in days_list:
+                for window in windows:
+                    for strategy in strategies:
+                        case = bench_case(csv_path, rows, days, window, strategy, repeat,
+                                          ors, app=app, render=render)
+                        results.append(case)
+                        if progress:
+                            progress(case)
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "seed": seed,
+            "ors_latency_s": ors_latency_s,
+        },
+        "results": results,
+    }
+
+
+# ===============================================================
+# COMPARISON AGAINST A SAVED RUN
+# ===============================================================
+def _case_key(case):
+    return (case["catalogue_rows"], case["days"], case["window"], case["strategy"])
+
+
+def compare(baseline, current, threshold=1.2):
+    # Yields (case key, stage, old median, new median, ratio, regressed)
+    old = {_case_key(c): c for c in baseline["results"]}
+    for case in current["results"]:
+        base = old.get(_case_key(case))
+        if base is None:
+            continue
+        for stage, stats in case["stages"].items():
+            if stage not in base["stages"]:
+                continue
+            before = base["stages"][stage]["median_s"]
+            after = stats["median_s"]
+            ratio = after / before if before > 0 else float("inf")
+            yield _case_key(case), stage, before, after, ratio, ratio > threshold
+
+
+# ===============================================================
+# CLI: python benchmark.py -o bench.json [--compare old.json]
+# ===============================================================
+def _csv_list(value, cast=str):
+    return [cast(v) for v in value.split(",") if v]
+
+
+def _print_case(case):
+    stages = "  ".join(f"{k}={v['median_s'] * 1000:.1f}ms" for k, v in case["stages"].items())
+    print(f"rows={case['catalogue_rows']:>6} days={case['days']} {case['window']} "
+          f"{case['strategy']:<8} stops={case.get('stops', 0):>3}  {stages}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each planning pipeline stage on synthetic catalogues.")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file (default stdout)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="catalogue sizes")
+    parser.add_argument("--days", default=",".join(map(str, DEFAULT_DAYS)), help="trip lengths in days")
+    parser.add_argument("--windows", default=",".join(DEFAULT_WINDOWS), help="daily HH:MM-HH:MM windows")
+    parser.add_argument("--strategies", default=",".join(DEFAULT_STRATEGIES), help="route solvers")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (default 3)")
+    parser.add_argument("--no-render", action="store_true", help="skip folium map and PDF stages")
+    parser.add_argument("--ors-latency", type=float, default=0.0, help="simulated ORS latency per call (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", help="earlier results JSON; report stages that got slower")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    report = run(sizes=_csv_list(args.sizes, int), days_list=_csv_list(args.days, int),
+                 windows=_csv_list(args.windows), strategies=_csv_list(args.strategies),
+                 repeat=args.repeat, render=not args.no_render,
+                 ors_latency_s=args.ors_latency, seed=args.seed, progress=_print_case)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = 0
+        for key, stage, before, after, ratio, regressed in compare(baseline, report, args.threshold):
+            if regressed:
+                regressions += 1
+                print(f"SLOWER {key} {stage}: {before * 1000:.1f}ms -> {after * 1000:.1f}ms ({ratio:.2f}x)",
+                      file=sys.stderr)
+        print(f"{regressions} stage(s) slower than {args.threshold:.2f}x baseline", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+# catalogue_columns.py
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+
+# Compound categories ("Waterfall / Pilgrimage spot") carry several tags
+TAG_SEPARATOR = "/"
+CATEGORY_COLUMN = "category"
+
+# Planner arrays stored alongside the original columns
+PLANNER_ARRAYS = ("lat", "lon", "open_min", "close_min", "spend_min")
+
+
+# ===============================================================
+# FILE LAYOUT: <prefix>_<part>.npy + <prefix>.json
+# ===============================================================
+def default_columns_prefix(csv_path):
+    return os.path.splitext(csv_path)[0] + "_columns"
+
+
+def meta_path(prefix):
+    return prefix + ".json"
+
+
+def part_path(prefix, part):
+    return f"{prefix}_{part}.npy"
+
+
+# ===============================================================
+# CATEGORY INTERNING + PER-TAG BITMAPS
+# ===============================================================
+def normalize_tag(value):
+    return " ".join(str(value).split()).lower()
+
+
+def split_tags(value):
+    # "Waterfall / Pilgrimage spot" -> ["waterfall", "pilgrimage spot"]
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+    return [t for t in (normalize_tag(p) for p in str(value).split(TAG_SEPARATOR)) if t]
+
+
+class CategoryIndex:
+    # codes: int32 row -> index into `categories` (distinct category strings)
+    # bits:  uint8 (n_tags, ceil(n / 8)), bit r of row t set when row r
+    #        carries tags[t]; filters combine whole bitmaps, never strings
+
+    def __init__(self, codes, categories, tags, bits, size):
+        self.codes = codes
+        self.categories = list(categories)
+        self.tags = list(tags)
+        self.bits = bits
+        self.size = int(size)
+        self._tag_row = {t: i for i, t in enumerate(self.tags)}
+
+    @classmethod
+    def build(cls, values):
+        values = ["" if v is None or (isinstance(v, float) and np.isnan(v)) else str(v)
+                  for v in values]
+        categories, codes = np.unique(np.array(values, dtype=object), return_inverse=True)
+        category_tags = [split_tags(c) for c in categories]
+        tags = sorted({t for ts in category_tags for t in ts})
+        tag_row = {t: i for i, t in enumerate(tags)}
+
+        # Tags of each distinct category, then fanned out to rows by code
+        has = np.zeros((len(tags), len(categories)), dtype=bool)
+        for c, ts in enumerate(category_tags):
+            for t in ts:
+                has[tag_row[t], c] = True
+        bits = np.packbits(has[:, codes], axis=1) if len(tags) else np.zeros((0, 0), dtype=np.uint8)
+        return cls(codes.astype(np.int32), categories.tolist(), tags, bits, len(values))
+
+    def tag_rows(self, values):
+        # Filter values (tags or whole categories) -> bitmap rows; unknown tags are skipped
+        return sorted({self._tag_row[t] for v in values for t in split_tags(v) if t in self._tag_row})
+
+    def unknown(self, values):
+        return [v for v in values if not self.tag_rows([v])]
+
+    def _union(self, rows):
+        if not rows:
+            return np.zeros(self.bits.shape[1] if self.bits.ndim == 2 else 0, dtype=np.uint8)
+        return np.bitwise_or.reduce(np.asarray(self.bits[rows]), axis=0)
+
+    def mask(self, include=(), exclude=()):
+        # Rows carrying any `include` tag (all rows if none given) and no
+        # `exclude` tag, as a bool array
+        include, exclude = list(include or ()), list(exclude or ())
+        if include:
+            packed = self._union(self.tag_rows(include))
+        else:
+            packed = np.full(self.bits.shape[1] if self.bits.ndim == 2 else 0, 0xFF, dtype=np.uint8)
+        if exclude:
+            packed = packed & ~self._union(self.tag_rows(exclude))
+        return np.unpackbits(packed, count=self.size).astype(bool)
+
+    def counts(self):
+        # Tag -> number of rows carrying it
+        if not self.tags:
+            return {}
+        per_tag = np.unpackbits(np.asarray(self.bits), axis=1, count=self.size).sum(axis=1)
+        return {t: int(c) for t, c in zip(self.tags, per_tag)}
+
+
+# ===============================================================
+# TEXT COLUMNS: UTF-8 BLOB + OFFSETS (+ NULL MASK)
+# ===============================================================
+def _encode_text(values):
+    encoded, nulls = [], []
+    for v in values:
+        missing = v is None or (isinstance(v, float) and np.isnan(v))
+        nulls.append(missing)
+        encoded.append(b"" if missing else str(v).encode("utf-8"))
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets, np.array(nulls, dtype=bool)
+
+
+def _decode_text(blob, offsets, nulls, idx=None):
+    # Whole column: one copy of the blob; selected rows: only their bytes
+    if idx is None:
+        raw = np.asarray(blob).tobytes()
+        ends = np.asarray(offsets).tolist()
+        return [None if null else raw[a:b].decode("utf-8")
+                for a, b, null in zip(ends[:-1], ends[1:], np.asarray(nulls).tolist())]
+    out = []
+    for i in np.asarray(idx).tolist():
+        a, b = int(offsets[i]), int(offsets[i + 1])
+        out.append(None if nulls[i] else np.asarray(blob[a:b]).tobytes().decode("utf-8"))
+    return out
+
+
+# ===============================================================
+# COLUMN STORE (MEMORY-MAPPED .npy PER COLUMN)
+# ===============================================================
+class ColumnStore:
+
+    def __init__(self, prefix, meta, parts):
+        self.prefix = prefix
+        self.meta = meta
+        self.parts = parts
+        self.size = int(meta["rows"])
+        self.fingerprint = meta.get("fingerprint")
+        self.category_index = CategoryIndex(parts["category_codes"], meta["categories"],
+                                            meta["tags"], parts["tag_bits"], self.size)
+
+    def __len__(self):
+        return self.size
+
+    def array(self, name):
+        return self.parts[name]
+
+    def column(self, name, idx=None):
+        # One original column (all rows, or rows idx) as a list / array
+        spec = next((c for c in self.meta["columns"] if c["name"] == name), None)
+        if spec is None:
+            return None
+        part = spec["part"]
+        if spec["kind"] == "category":
+            codes = self.parts["category_codes"]
+            codes = codes if idx is None else codes[idx]
+            labels = self.meta["categories"]
+            return [labels[c] if labels[c] or not spec.get("nullable") else None for c in codes.tolist()]
+        if spec["kind"] == "text":
+            return _decode_text(self.parts[part + "_bytes"], self.parts[part + "_offsets"],
+                                self.parts[part + "_nulls"], idx)
+        values = self.parts[part]
+        return np.array(values if idx is None else values[idx])
+
+    def frame(self, idx=None):
+        # Original table (or rows idx, in that order) as a DataFrame
+        if idx is not None:
+            idx = np.asarray(idx, dtype=np.int64)
+        return pd.DataFrame({c["name"]: self.column(c["name"], idx) for c in self.meta["columns"]})
+
+    # -----------------------------------------------------------
+    # BUILD / LOAD
+    # -----------------------------------------------------------
+    @classmethod
+    def build(cls, catalogue, prefix, source_mtime_ns=None):
+        df = catalogue.df
+        parts = {name: getattr(catalogue, name) for name in PLANNER_ARRAYS}
+        index = catalogue.category_index
+        parts["category_codes"] = index.codes
+        parts["tag_bits"] = index.bits
+
+        columns = []
+        for k, name in enumerate(df.columns):
+            part = f"col{k}"
+            if name == CATEGORY_COLUMN:
+                columns.append({"name": name, "kind": "category", "part": "category_codes",
+                                "nullable": bool(df[name].isna().any())})
+            elif pd.api.types.is_numeric_dtype(df[name]):
+                parts[part] = df[name].to_numpy()
+                columns.append({"name": name, "kind": "number", "part": part})
+            else:
+                parts[part + "_bytes"], parts[part + "_offsets"], parts[part + "_nulls"] = \
+                    _encode_text(df[name].tolist())
+                columns.append({"name": name, "kind": "text", "part": part})
+
+        # Arrays first via temporary names, metadata last: a reader only
+        # trusts the parts once the matching .json is in place
+        for part, values in parts.items():
+            path = part_path(prefix, part)
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(values))
+            os.replace(path + ".tmp", path)
+
+        meta = {
+            "format": FORMAT_VERSION,
+            "rows": len(catalogue),
+            "fingerprint": catalogue.fingerprint,
+            "source_mtime_ns": source_mtime_ns,
+            "columns": columns,
+            "parts": sorted(parts),
+            "categories": index.categories,
+            "tags": index.tags,
+        }
+        with open(meta_path(prefix) + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path(prefix) + ".tmp", meta_path(prefix))
+        return cls.load(prefix)
+
+    @staticmethod
+    def read_meta(prefix):
+        try:
+            with open(meta_path(prefix)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get("format") == FORMAT_VERSION else None
+
+    @classmethod
+    def load(cls, prefix, meta=None):
+        # Returns None when the files are missing, incomplete or from
+        # another format version
+        meta = meta or cls.read_meta(prefix)
+        if meta is None:
+            return None
+        try:
+            parts = {part: np.load(part_path(prefix, part), mmap_mode="r") for part in meta["parts"]}
+        except (OSError, ValueError):
+            return None
+        if any(len(parts[name]) != meta["rows"] for name in PLANNER_ARRAYS):
+            return None
+        return cls(prefix, meta, parts)
+
+
+# ===============================================================
+# CLI: python catalogue_columns.py [places.csv] [output_prefix]
+# ===============================================================
+if __name__ == "__main__":
+    import argparse
+
+    from places_store import PlacesStore
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Compile the places CSV into memory-mapped columns.")
+    parser.add_argument("csv", nargs="?", default=os.path.join(here, "tirupati_places_final_updated.csv"))
+    parser.add_argument("prefix", nargs="?", help="output prefix (default: <csv>_columns)")
+    args = parser.parse_args()
+    prefix = args.prefix or default_columns_prefix(args.csv)
+
+    # Always compile from the CSV itself, never from an older compiled copy
+    catalogue = PlacesStore(args.csv, columns_prefix="", load_matrix=False).current()
+    if catalogue is None:
+        sys.exit(f"Places CSV not found: {args.csv}")
+
+    store = ColumnStore.build(catalogue, prefix, source_mtime_ns=os.stat(args.csv).st_mtime_ns)
+    print(f"Wrote {len(store)} places, {len(store.category_index.categories)} categories, "
+          f"{len(store.category_index.tags)} tags to {prefix}_*.npy")
@@ -0,0 +1,95 @@
+# day_scheduler.py
+import math
+
+import numpy as np
+
+from geo_utils import haversine_km
+from route_solver import DEFAULT_TIME_BUDGET_S, TripProblem, TripSolution, solve
+
+
+# ===============================================================
+# STOP -> DAY ASSIGNMENT (SWEEP SECTORS AROUND THE START POINT)
+# ===============================================================
+def _bearings(catalogue, idx, start_lat, start_lon):
+    # Planar angle of each place around the start, in [0, 2*pi)
+    dy = catalogue.lat[idx] - start_lat
+    dx = (catalogue.lon[idx] - start_lon) * math.cos(math.radians(start_lat))
+    return np.mod(np.arctan2(dx, dy), 2 * math.pi)
+
+
+def assign_days(catalogue, available, start_lat, start_lon, num_days, day_budget_min):
+    # Splits the plane around the start into num_days angular sectors that
+    # each hold about one day's worth of nearby visits, and returns one
+    # `available` mask per day. Every available place lands in exactly one
+    # sector, so a day can still reach farther out once its near places are
+    # used up, and no place is visited twice.
+    num_days = max(1, int(num_days))
+    idx = np.flatnonzero(available)
+    if num_days == 1 or len(idx) < 2:
+        return [available] + [np.zeros_like(available) for _ in range(num_days - 1)]
+
+    # Candidates: nearest places whose visit times could fill every day
+    # (travel is ignored, so this slightly over-supplies each sector)
+    dist = haversine_km(start_lat, start_lon, catalogue.lat[idx], catalogue.lon[idx])
+    near = np.argsort(dist, kind="stable")
+    spend = np.maximum(catalogue.spend_min[idx][near], 1.0)
+    n_cand = int(np.searchsorted(np.cumsum(spend), num_days * day_budget_min, side="right"))
+    cand = near[:max(n_cand, num_days)]
+
+    theta = _bearings(catalogue, idx, start_lat, start_lon)
+    cand_theta = np.sort(theta[cand])
+
+    # Start the sweep in the widest empty direction so no cluster is cut in two
+    gaps = np.diff(np.concatenate([cand_theta, cand_theta[:1] + 2 * math.pi]))
+    widest = int(np.argmax(gaps))
+    origin = cand_theta[widest] + gaps[widest] / 2.0
+    rot = np.mod(theta - origin, 2 * math.pi)
+
+    # Equal visit time per sector, measured over the candidates
+    sweep = cand[np.argsort(rot[cand], kind="stable")]
+    work = np.cumsum(np.maximum(catalogue.spend_min[idx][sweep], 1.0))
+    cuts = np.searchsorted(work, work[-1] * np.arange(1, num_days) / num_days, side="right")
+    cuts = np.clip(cuts, 1, len(sweep) - 1)
+    sweep_rot = rot[sweep]
+    bounds = (sweep_rot[cuts - 1] + sweep_rot[cuts]) / 2.0
+
+    day_of = np.searchsorted(bounds, rot, side="right")
+    masks = []
+    for d in range(num_days):
+        mask = np.zeros_like(available)
+        mask[idx[day_of == d]] = True
+        masks.append(mask)
+    return masks
+
+
+# ===============================================================
+# PER-DAY SOLVES
+# ===============================================================
+def schedule_days(catalogue, available, start_lat, start_lon, day_start_min, day_budget_min,
+                  num_days, strategy=None, time_budget_s=None, table=None, return_to_start=False,
+                  report=None):
+    # One TripSolution per day. Each day starts from the start point at
+    # day_start_min with its own day_budget_min; opening hours repeat daily.
+    # An optional `report` dict gets cost_fallback=True if any day had to
+    # drop the road table for straight-line costs.
+    # Days are solved one after another: the solvers are pure Python, so
+    # threads would gain little under the GIL, and a shared pool would not
+    # survive the fork into batch worker processes.
+    masks = assign_days(catalogue, available, start_lat, start_lon, num_days, day_budget_min)
+    fallback = []
+
+    def solve_day(mask):
+        if not mask.any():
+            return TripSolution([], [])
+        problem = TripProblem(catalogue, mask, start_lat, start_lon, day_start_min,
+                              day_budget_min, table=table, return_to_start=return_to_start)
+        solution = solve(problem, strategy=strategy,
+                         time_budget_s=time_budget_s or DEFAULT_TIME_BUDGET_S)
+        if problem.cost_fallback:
+            fallback.append(True)
+        return solution
+
+    days = [solve_day(mask) for mask in masks]
+    if report is not None and fallback:
+        report["cost_fallback"] = True
+    return days
@@ -0,0 +1,54 @@
+# geo_utils.py
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+MINUTES_PER_DAY = 24 * 60
+
+# Same speed rule the planner has always used: highway speed for long legs
+CITY_SPEED_KMH = 25
+HIGHWAY_SPEED_KMH = 70
+HIGHWAY_THRESHOLD_KM = 50
+
+
+# ===============================================================
+# VECTORIZED GREAT-CIRCLE DISTANCE
+# ===============================================================
+def haversine_km(lat1, lon1, lat2, lon2):
+    # Any argument may be a scalar or an array; NumPy broadcasting applies.
+    lat1 = np.radians(lat1)
+    lon1 = np.radians(lon1)
+    lat2 = np.radians(lat2)
+    lon2 = np.radians(lon2)
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def travel_minutes(km):
+    km = np.asarray(km, dtype=np.float64)
+    speed = np.where(km > HIGHWAY_THRESHOLD_KM, HIGHWAY_SPEED_KMH, CITY_SPEED_KMH)
+    return km / speed * 60.0
+
+
+# ===============================================================
+# VECTORIZED OPENING-HOURS OVERLAP
+# ===============================================================
+def open_during(open_min, close_min, window_start, window_end, missing=-1):
+    # True where the place's [open, close) interval overlaps the user window.
+    # Both intervals are minute-of-day; a close <= open means the place is open
+    # past midnight, and the window end may run past 1440 for overnight trips.
+    open_min = np.asarray(open_min, dtype=np.int64)
+    close_min = np.asarray(close_min, dtype=np.int64)
+
+    unknown = (open_min == missing) | (close_min == missing)
+    close_min = np.where(close_min <= open_min, close_min + MINUTES_PER_DAY, close_min)
+
+    mask = unknown.copy()
+    # The place's interval repeats every day, so also test yesterday's and
+    # tomorrow's occurrence against the window.
+    for shift in (-MINUTES_PER_DAY, 0, MINUTES_PER_DAY):
+        mask |= (np.maximum(window_start, open_min + shift)
+                 < np.minimum(window_end, close_min + shift))
+    return mask
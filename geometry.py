@@ -0,0 +1,149 @@
+# geometry.py
+import numpy as np
+
+from geo_utils import EARTH_RADIUS_KM
+
+# Web-mercator ground resolution at zoom 0 on the equator (256 px tiles)
+METRES_PER_PIXEL_Z0 = 2 * np.pi * EARTH_RADIUS_KM * 1000.0 / 256
+# Vertices that move the line by less than this on screen are dropped
+DEFAULT_TOLERANCE_PX = 1.0
+DEFAULT_SIMPLIFY_ZOOM = 16
+
+# Google encoded-polyline precision (5 decimals, ~1 m)
+POLYLINE_PRECISION = 5
+
+
+# ===============================================================
+# COMPACT ROUTE ARRAYS: float64 (N, 2) of (lat, lon)
+# ===============================================================
+def as_coords(points):
+    if points is None:
+        return np.empty((0, 2))
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+def lonlat_to_coords(lonlat):
+    # GeoJSON [[lon, lat], ...] -> (lat, lon) array
+    return np.ascontiguousarray(as_coords(lonlat)[:, ::-1])
+
+
+def join_legs(legs):
+    # One path from consecutive legs; a leg's first point repeats the
+    # previous leg's last point, so it is dropped. Missing legs are skipped.
+    parts = []
+    for leg in legs:
+        if leg is None or len(leg) == 0:
+            continue
+        leg = as_coords(leg)
+        parts.append(leg[1:] if parts else leg)
+    return np.concatenate(parts) if parts else np.empty((0, 2))
+
+
+# ===============================================================
+# DOUGLAS-PEUCKER SIMPLIFICATION
+# ===============================================================
+def tolerance_m(zoom, lat, tolerance_px=DEFAULT_TOLERANCE_PX):
+    # Ground distance covered by tolerance_px screen pixels at this zoom
+    return tolerance_px * METRES_PER_PIXEL_Z0 * np.cos(np.radians(lat)) / (2 ** zoom)
+
+
+def _project(coords):
+    # Local equirectangular metres; fine at city / regional scale
+    lat0 = np.radians(coords[:, 0].mean())
+    y = np.radians(coords[:, 0]) * EARTH_RADIUS_KM * 1000.0
+    x = np.radians(coords[:, 1]) * EARTH_RADIUS_KM * 1000.0 * np.cos(lat0)
+    return x, y
+
+
+def simplify(coords, tol_m):
+    # Iterative Douglas-Peucker; the distance from every point of a span to
+    # its chord is computed in one vectorized pass
+    coords = as_coords(coords)
+    n = len(coords)
+    if n < 3 or tol_m <= 0:
+        return coords
+
+    x, y = _project(coords)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    tol2 = tol_m * tol_m
+
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        px = x[first + 1:last] - x[first]
+        py = y[first + 1:last] - y[first]
+        dx = x[last] - x[first]
+        dy = y[last] - y[first]
+        seg2 = dx * dx + dy * dy
+        if seg2 > 0:
+            # Distance to the segment (not the infinite line), so loops
+            # that come back to their start are kept
+            t = np.clip((px * dx + py * dy) / seg2, 0.0, 1.0)
+            ex = px - t * dx
+            ey = py - t * dy
+        else:
+            ex, ey = px, py
+        d2 = ex * ex + ey * ey
+
+        i = int(np.argmax(d2))
+        if d2[i] > tol2:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return coords[keep]
+
+
+def simplify_for_zoom(coords, zoom, tolerance_px=DEFAULT_TOLERANCE_PX):
+    # zoom 0 / None keeps full resolution
+    coords = as_coords(coords)
+    if not zoom or len(coords) < 3:
+        return coords
+    return simplify(coords, tolerance_m(zoom, coords[:, 0].mean(), tolerance_px))
+
+
+# ===============================================================
+# ENCODED POLYLINE
+# ===============================================================
+def encode_polyline(coords, precision=POLYLINE_PRECISION):
+    # (lat, lon) coordinates -> compact ASCII string
+    coords = as_coords(coords)
+    if not len(coords):
+        return ""
+
+    ints = np.round(coords * (10 ** precision)).astype(np.int64)
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    zigzag = np.where(deltas < 0, ~(deltas << 1), deltas << 1).tolist()
+
+    out = []
+    for value in zigzag:
+        while value >= 0x20:
+            out.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        out.append(chr(value + 63))
+    return "".join(out)
+
+
+def decode_polyline(encoded, precision=POLYLINE_PRECISION):
+    values = []
+    index = 0
+    while index < len(encoded):
+        shift = result = 0
+        while True:
+            b = ord(encoded[index]) - 63
+            index += 1
+            result |= (b & 0x1f) << shift
+            shift += 5
+            if b < 0x20:
+                break
+        values.append(~(result >> 1) if result & 1 else result >> 1)
+
+    if not values:
+        return np.empty((0, 2))
+    deltas = np.asarray(values, dtype=np.int64).reshape(-1, 2)
+    return np.cumsum(deltas, axis=0) / float(10 ** precision)
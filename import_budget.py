@@ -0,0 +1,120 @@
+# import_budget.py
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+# Import-time budget for the web app (ms of module execution, measured by
+# python -X importtime in a fresh interpreter)
+DEFAULT_BUDGET_MS = 1000.0
+
+# Heavy rendering / geo libraries that must only load when a map or PDF
+# is actually produced
+LAZY_MODULES = ("folium", "branca", "reportlab", "geopandas", "geopy", "shapely")
+
+
+# ===============================================================
+# MEASURE: python -X importtime -c "import <module>"
+# ===============================================================
+def measure(module="app", env=None):
+    # Returns (per-module self time in us, modules in import order, wall s)
+    with tempfile.TemporaryDirectory(prefix="import-budget-") as workdir:
+        run_env = dict(os.environ)
+        # Importing the app creates caches and an artifact directory;
+        # keep them out of the project tree
+        run_env.setdefault("ARTIFACT_DIR", os.path.join(workdir, "artifacts"))
+        run_env.setdefault("ROUTE_CACHE_PATH", os.path.join(workdir, "route_cache.sqlite3"))
+        run_env.setdefault("LOG_LEVEL", "WARNING")
+        run_env.update(env or {})
+
+        here = os.path.dirname(os.path.abspath(__file__))
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                              cwd=here, env=run_env, capture_output=True, text=True)
+        wall = time.perf_counter() - t0
+
+    if proc.returncode != 0:
+        tail = "\n".join(l for l in proc.stderr.splitlines() if not l.startswith("import time:"))
+        raise RuntimeError(f"import {module} failed:\n{tail[-2000:]}")
+
+    self_us = {}
+    order = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        self_us[name] = int(parts[0])
+        order.append(name)
+    return self_us, order, wall
+
+
+def by_package(self_us):
+    # Top-level package -> total self time (us) of all its modules
+    totals = defaultdict(int)
+    for name, us in self_us.items():
+        totals[name.split(".")[0]] += us
+    return dict(totals)
+
+
+def report(module="app", budget_ms=DEFAULT_BUDGET_MS, lazy=LAZY_MODULES, top=20):
+    self_us, order, wall = measure(module)
+    packages = by_package(self_us)
+    total_ms = sum(self_us.values()) / 1000.0
+    eager = sorted({name for name in order
+                    if any(name == m or name.startswith(m + ".") for m in lazy)})
+    return {
+        "module": module,
+        "total_ms": round(total_ms, 1),
+        "wall_ms": round(wall * 1000.0, 1),
+        "budget_ms": budget_ms,
+        "modules": len(self_us),
+        "packages": [
+            {"package": name, "ms": round(us / 1000.0, 1),
+             "share": round(us / 1000.0 / total_ms, 3) if total_ms else 0.0}
+            for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]
+        ],
+        "eager_lazy_modules": eager,
+        "ok": total_ms <= budget_ms and not eager,
+    }
+
+
+# ===============================================================
+# CLI: python import_budget.py [module] [--budget-ms 1000] [--json]
+# ===============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report per-package import cost and check it against a budget.")
+    parser.add_argument("module", nargs="?", default="app", help="module to import (default: app)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="fail if total import time exceeds this many ms")
+    parser.add_argument("--lazy", default=",".join(LAZY_MODULES),
+                        help="comma-separated modules that must not load at import time")
+    parser.add_argument("--top", type=int, default=20, help="packages to list")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    lazy = tuple(m.strip() for m in args.lazy.split(",") if m.strip())
+    result = report(args.module, args.budget_ms, lazy, args.top)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import {result['module']}: {result['total_ms']:.1f} ms in {result['modules']} modules "
+              f"(process wall {result['wall_ms']:.1f} ms, budget {result['budget_ms']:.0f} ms)")
+        for row in result["packages"]:
+            print(f"  {row['package']:<28} {row['ms']:>8.1f} ms  {row['share'] * 100:5.1f}%")
+        if result["eager_lazy_modules"]:
+            print("Loaded at import but should be lazy: " + ", ".join(result["eager_lazy_modules"]))
+
+    if not result["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# jobs.py
+import contextvars
+import logging
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import log_event
+
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 32
+DEFAULT_RETAIN_S = 3600
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+# ===============================================================
+# JOB RECORD (UPDATED IN PLACE AS STAGES FINISH)
+# ===============================================================
+class Job:
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.created = time.time()
+        self.finished = None
+        self.error = None
+        self.result = {}
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            self.result.update(fields)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "error": self.error,
+                **self.result,
+            }
+
+
+# ===============================================================
+# JOB MANAGER: BOUNDED WORKER POOL + LOCAL QUEUE
+# ===============================================================
+class JobManager:
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING,
+                 retain_s=DEFAULT_RETAIN_S):
+        self.max_pending = max_pending
+        self.retain_s = retain_s
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plan-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._pending = 0
+
+    def submit(self, fn, *args, **kwargs):
+        # fn(job, *args, **kwargs) runs on a worker and fills job.result
+        with self._lock:
+            self._expire()
+            if self._pending >= self.max_pending:
+                raise QueueFull("too many planning jobs in progress")
+            job = Job()
+            self._jobs[job.id] = job
+            self._pending += 1
+
+        # The job keeps the submitting request's context (request ID for logs)
+        self._executor.submit(contextvars.copy_context().run, self._run, job, fn, args, kwargs)
+        return job
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        try:
+            fn(job, *args, **kwargs)
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e) or e.__class__.__name__
+            log_event("job_failed", logging.ERROR, job_id=job.id, error=job.error,
+                      traceback=traceback.format_exc())
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _expire(self):
+        cutoff = time.time() - self.retain_s
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job.finished is None or job.finished > cutoff:
+                break
+            self._jobs.popitem(last=False)
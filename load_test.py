@@ -0,0 +1,261 @@
+# load_test.py
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_URL = "http://localhost:5000"
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT_S = 60.0
+POLL_INTERVAL_S = 0.05
+
+# Start points are scattered around Tirupati (like benchmark.py), so plans
+# rarely repeat and the plan cache doesn't hide the planning cost
+CENTER = (13.6288, 79.4192)
+DEFAULT_SPREAD_KM = 8.0
+WINDOWS = (("09:00", "13:00"), ("09:00", "18:00"), ("06:00", "20:00"))
+STRATEGIES = ("greedy", "nn_2opt")
+
+
+# ===============================================================
+# RANDOM PLANNING REQUESTS
+# ===============================================================
+def random_params(rng, spread_km=DEFAULT_SPREAD_KM, max_days=3):
+    r = spread_km * math.sqrt(rng.random())
+    theta = 2 * math.pi * rng.random()
+    start_time, end_time = rng.choice(WINDOWS)
+    return {
+        "start_lat": round(CENTER[0] + r * math.sin(theta) / 111.32, 6),
+        "start_lon": round(CENTER[1] + r * math.cos(theta) / (111.32 * math.cos(math.radians(CENTER[0]))), 6),
+        "start_time": start_time,
+        "end_time": end_time,
+        "num_days": rng.randint(1, max_days),
+        "strategy": rng.choice(STRATEGIES),
+    }
+
+
+# ===============================================================
+# LATENCY / ERROR BOOKKEEPING
+# ===============================================================
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an ascending list
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(math.ceil(q / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+class Recorder:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(list)      # name -> [(seconds, ok, status)]
+
+    def add(self, name, seconds, ok, status):
+        with self._lock:
+            self._samples[name].append((seconds, ok, str(status)))
+
+    def summary(self, wall_s):
+        out = {}
+        with self._lock:
+            samples = dict(self._samples)
+        for name, rows in samples.items():
+            latencies = sorted(s for s, _, _ in rows)
+            errors = sum(1 for _, ok, _ in rows if not ok)
+            out[name] = {
+                "requests": len(rows),
+                "errors": errors,
+                "error_rate": round(errors / len(rows), 4),
+                "throughput_rps": round(len(rows) / wall_s, 2) if wall_s else None,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                "max_ms": round(latencies[-1] * 1000, 1),
+                "status": dict(Counter(status for _, _, status in rows)),
+            }
+        return out
+
+
+# ===============================================================
+# ONE USER SESSION: PLAN, THEN OPTIONALLY OPEN ITS ARTIFACTS
+# ===============================================================
+def _timed_request(recorder, name, fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    try:
+        r = fn(*args, **kwargs)
+    except requests.RequestException as e:
+        recorder.add(name, time.perf_counter() - t0, False, type(e).__name__)
+        return None
+    recorder.add(name, time.perf_counter() - t0, r.ok, r.status_code)
+    return r
+
+
+def run_session(session, base_url, params, recorder, mode="async", artifacts=(),
+                timeout_s=DEFAULT_TIMEOUT_S):
+    if mode == "sync":
+        _timed_request(recorder, "plan_trip", session.post, base_url + "/plan_trip",
+                       data=params, timeout=timeout_s)
+        return
+
+    # Async: submit, poll the job until it finishes, then fetch artifacts
+    t0 = time.perf_counter()
+    try:
+        r = session.post(base_url + "/plan_trip?async=1", data=params, timeout=timeout_s)
+        if r.status_code != 202:
+            recorder.add("plan_job", time.perf_counter() - t0, False, r.status_code)
+            return
+        status_url = base_url + r.json()["status_url"]
+        while True:
+            job = session.get(status_url, timeout=timeout_s).json()
+            if job["status"] in ("done", "failed"):
+                break
+            if time.perf_counter() - t0 > timeout_s:
+                recorder.add("plan_job", time.perf_counter() - t0, False, "timeout")
+                return
+            time.sleep(POLL_INTERVAL_S)
+    except (requests.RequestException, ValueError, KeyError) as e:
+        recorder.add("plan_job", time.perf_counter() - t0, False, type(e).__name__)
+        return
+    recorder.add("plan_job", time.perf_counter() - t0, job["status"] == "done", job["status"])
+
+    urls = {"map.json": job.get("map_data_url"), "map.html": job.get("map_url"),
+            "itinerary.pdf": job.get("pdf_url")}
+    for name in artifacts:
+        if urls.get(name):
+            _timed_request(recorder, name, session.get, base_url + urls[name], timeout=timeout_s)
+
+
+# ===============================================================
+# DRIVER
+# ===============================================================
+def run_load(base_url=DEFAULT_URL, total=DEFAULT_REQUESTS, concurrency=DEFAULT_CONCURRENCY,
+             duration_s=None, mode="async", artifacts=(), seed=0, spread_km=DEFAULT_SPREAD_KM,
+             timeout_s=DEFAULT_TIMEOUT_S, mock_url=None):
+    # `concurrency` users each run sessions back to back until `total`
+    # sessions have started, or until duration_s passes when it is set
+    base_url = base_url.rstrip("/")
+    recorder = Recorder()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    started = [0]
+    t_start = time.perf_counter()
+
+    def next_params():
+        with rng_lock:
+            if duration_s is not None:
+                if time.perf_counter() - t_start >= duration_s:
+                    return None
+            elif started[0] >= total:
+                return None
+            started[0] += 1
+            return random_params(rng, spread_km)
+
+    def user():
+        while True:
+            params = next_params()
+            if params is None:
+                return
+            run_session(session, base_url, params, recorder, mode, artifacts, timeout_s)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load-user") as pool:
+        for f in [pool.submit(user) for _ in range(concurrency)]:
+            f.result()
+    wall = time.perf_counter() - t_start
+
+    report = {
+        "url": base_url,
+        "mode": mode,
+        "concurrency": concurrency,
+        "sessions": started[0],
+        "wall_s": round(wall, 3),
+        "sessions_per_s": round(started[0] / wall, 2) if wall else None,
+        "endpoints": recorder.summary(wall),
+    }
+    if mock_url:
+        try:
+            report["mock_ors"] = session.get(mock_url.rstrip("/") + "/stats", timeout=5).json()
+        except (requests.RequestException, ValueError):
+            report["mock_ors"] = None
+    return report
+
+
+def check(report, max_error_rate=None, max_p95_ms=None):
+    # Threshold violations, one message each
+    failures = []
+    for name, row in report["endpoints"].items():
+        if max_error_rate is not None and row["error_rate"] > max_error_rate:
+            failures.append(f"{name}: error rate {row['error_rate']:.2%} > {max_error_rate:.2%}")
+        if max_p95_ms is not None and row["p95_ms"] > max_p95_ms:
+            failures.append(f"{name}: p95 {row['p95_ms']:.0f} ms > {max_p95_ms:.0f} ms")
+    return failures
+
+
+# ===============================================================
+# CLI: python load_test.py [--url http://localhost:5000] [-n 200] [-c 8] ...
+# ===============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fire concurrent planning requests at a running app.")
+    parser.add_argument("--url", default=DEFAULT_URL, help="app base URL")
+    parser.add_argument("-n", "--requests", type=int, default=DEFAULT_REQUESTS, help="planning sessions to run")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="simultaneous users")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of -n sessions")
+    parser.add_argument("--mode", choices=("async", "sync"), default="async",
+                        help="async: /plan_trip?async=1 and poll the job; sync: plain POST /plan_trip")
+    parser.add_argument("--artifacts", default="map.json",
+                        help="comma-separated artifacts to fetch after each async plan "
+                             "(map.json, map.html, itinerary.pdf; empty for none)")
+    parser.add_argument("--spread-km", type=float, default=DEFAULT_SPREAD_KM,
+                        help="radius around Tirupati for random start points")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_S, help="per-session timeout (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mock-url", help="mock ORS base URL, to include its request counts")
+    parser.add_argument("--max-error-rate", type=float, help="exit non-zero above this error rate")
+    parser.add_argument("--max-p95-ms", type=float, help="exit non-zero above this p95 latency")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    artifacts = tuple(a.strip() for a in args.artifacts.split(",") if a.strip())
+    report = run_load(args.url, args.requests, args.concurrency, args.duration, args.mode,
+                      artifacts if args.mode == "async" else (), args.seed, args.spread_km,
+                      args.timeout, args.mock_url)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['sessions']} sessions, {report['concurrency']} users, {report['wall_s']:.1f} s "
+              f"({report['sessions_per_s']} sessions/s)")
+        print(f"  {'endpoint':<14} {'req':>6} {'err%':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for name, row in report["endpoints"].items():
+            print(f"  {name:<14} {row['requests']:>6} {row['error_rate'] * 100:>6.1f}% "
+                  f"{row['throughput_rps']:>8.2f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+                  f"{row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+        if report.get("mock_ors"):
+            print("  mock ORS: " + ", ".join(f"{k}={v}" for k, v in report["mock_ors"].items()))
+
+    failures = check(report, args.max_error_rate, args.max_p95_ms)
+    for message in failures:
+        print("FAIL " + message, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# map_data.py
+import math
+
+from geometry import POLYLINE_PRECISION, decode_polyline, encode_polyline
+
+# Place fields shipped to the client map; everything else stays server-side
+MARKER_FIELDS = ("name of the place", "category", "visit_start", "visit_end",
+                 "spend_time_minutes", "distance_from_previous_km", "description",
+                 "day", "arrival_time", "departure_time")
+
+
+# ===============================================================
+# MAP PAYLOAD (WHAT THE STATIC MAP PAGE RENDERS)
+# ===============================================================
+def _clean(value):
+    # NaN / numpy scalars -> plain JSON values
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def build_map_data(selected_df, start_lat, start_lon, route_coords,
+                   precision=POLYLINE_PRECISION):
+    fields = [f for f in MARKER_FIELDS if f in selected_df]
+    columns = [selected_df[f].tolist() for f in fields]
+    lats = selected_df["latitude"].astype(float).tolist()
+    lons = selected_df["longitude"].astype(float).tolist()
+
+    places = []
+    for i in range(len(lats)):
+        place = {"lat": lats[i], "lon": lons[i]}
+        for name, column in zip(fields, columns):
+            place[name] = _clean(column[i])
+        places.append(place)
+
+    return {
+        "start": [float(start_lat), float(start_lon)],
+        "places": places,
+        "route": encode_polyline(route_coords, precision),
+        "precision": precision,
+    }
+
+
+def to_geojson(data):
+    # Same payload as a GeoJSON FeatureCollection (coordinates are lon, lat)
+    start_lat, start_lon = data["start"]
+    features = [{
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [start_lon, start_lat]},
+        "properties": {"kind": "start"},
+    }]
+
+    for order, place in enumerate(data["places"], start=1):
+        props = {k: v for k, v in place.items() if k not in ("lat", "lon")}
+        props.update(kind="place", order=order)
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [place["lon"], place["lat"]]},
+            "properties": props,
+        })
+
+    route = decode_polyline(data["route"], data.get("precision", POLYLINE_PRECISION))
+    if len(route):
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": route[:, ::-1].tolist()},
+            "properties": {"kind": "route"},
+        })
+
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,47 @@
+# map_markers.py
+# Imported lazily by build_trip_map (needs folium)
+from folium.elements import MacroElement
+from folium.template import Template
+
+
+# ===============================================================
+# ONE LAYER FOR ALL PLACE MARKERS
+# ===============================================================
+class MarkerLayer(MacroElement):
+    # Every stop as [lat, lon, popup html] in one JSON array, turned into
+    # Leaflet markers by a single loop in the page instead of one Marker,
+    # Icon and Popup element (and script block) per stop. The markers look
+    # and behave like folium.Marker with folium.Icon(color, icon).
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.featureGroup().addTo({{ this._parent.get_name() }});
+            (function() {
+                var places = {{ this.places|tojson }};
+                var icon = L.AwesomeMarkers.icon({{ this.icon_options|tojavascript }});
+                places.forEach(function(p) {
+                    var content = document.createElement("div");
+                    content.style.width = "100.0%";
+                    content.style.height = "100.0%";
+                    content.innerHTML = p[2];
+                    var popup = L.popup({{ this.popup_options|tojavascript }}).setContent(content);
+                    L.marker([p[0], p[1]], {icon: icon}).bindPopup(popup).addTo({{ this.get_name() }});
+                });
+            })();
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, places, color="pink", icon="info-sign", max_width="100%"):
+        super().__init__()
+        self._name = "MarkerLayer"
+        self.places = [[float(lat), float(lon), html] for lat, lon, html in places]
+        self.icon_options = {
+            "markerColor": color,
+            "iconColor": "white",
+            "icon": icon,
+            "prefix": "glyphicon",
+            "extraClasses": "fa-rotate-0",
+        }
+        self.popup_options = {"maxWidth": max_width}
@@ -0,0 +1,128 @@
+# marker_fragments.py
+import threading
+
+# Catalogues up to this size get every popup pre-rendered when they load
+# from the CSV; larger or compiled ones render a place's popup the first
+# time it is on a map
+PREBUILD_MAX_ROWS = 50000
+
+# Catalogue fields a popup shows; everything else in it is per plan
+POPUP_FIELDS = ("name of the place", "category", "visit_start", "visit_end",
+                "spend_time_minutes", "description")
+
+
+# ===============================================================
+# POPUP HTML (SAME DESIGN AS THE ORIGINAL PER-MARKER f-STRING)
+# ===============================================================
+def _head(name, cat, vst, ven):
+    return f"""
+            <div style='width:320px; font-family:"Segoe UI", sans-serif; padding:5px;'>
+                <div style='border-bottom: 2px solid #ec4899; margin-bottom: 10px; padding-bottom: 5px;'>
+                    <h3 style='margin:0; color:#831843; font-size:16px;'>{name}</h3>
+                </div>
+
+                <table style='width:100%; border-collapse:collapse; font-size:13px;'>
+                    <tr style='border-bottom: 1px solid #fce7f3;'>
+                        <td style='padding:6px 0; color:#9d174d; font-weight:600; vertical-align:top; width:90px;'>Category</td>
+                        <td style='padding:6px 0; color:#374151;'>{cat}</td>
+                    </tr>
+                    <tr style='border-bottom: 1px solid #fce7f3;'>
+                        <td style='padding:6px 0; color:#9d174d; font-weight:600; vertical-align:top;'>Visit</td>
+                        <td style='padding:6px 0; color:#374151;'>{vst} - {ven}</td>
+                    </tr>"""
+
+
+def _middle(spend):
+    return f"""
+                    <tr style='border-bottom: 1px solid #fce7f3;'>
+                        <td style='padding:6px 0; color:#9d174d; font-weight:600; vertical-align:top;'>Spend</td>
+                        <td style='padding:6px 0; color:#374151;'>{spend} mins</td>
+                    </tr>
+                    <tr style='border-bottom: 1px solid #fce7f3;'>
+                        <td style='padding:6px 0; color:#9d174d; font-weight:600; vertical-align:top;'>Distance</td>
+                        <td style='padding:6px 0; color:#374151;'>"""
+
+
+def _tail(desc):
+    return f""" km</td>
+                    </tr>
+                    <tr>
+                        <td style='padding:8px 0; color:#9d174d; font-weight:600; vertical-align:top;'>Description</td>
+                        <td style='padding:8px 0; color:#4b5563; line-height:1.4;'>{desc}</td>
+                    </tr>
+                </table>
+            </div>
+        """
+
+
+def schedule_row(row):
+    # Planned day / arrival / departure (present on scheduled plans)
+    if not row.get("arrival_time"):
+        return ""
+    return f"""
+                    <tr style='border-bottom: 1px solid #fce7f3;'>
+                        <td style='padding:6px 0; color:#9d174d; font-weight:600; vertical-align:top;'>Schedule</td>
+                        <td style='padding:6px 0; color:#374151;'>Day {row.get("day", 1)}: {row["arrival_time"]} - {row.get("departure_time", "")}</td>
+                    </tr>"""
+
+
+def place_key(values):
+    # Popup field values -> cache key (their printed form, as in the popup)
+    return tuple(f"{v}" for v in values)
+
+
+def popup_parts(key):
+    name, cat, vst, ven, spend, desc = key
+    return _head(name, cat, vst, ven), _middle(spend), _tail(desc)
+
+
+# ===============================================================
+# FRAGMENT CACHE: STATIC POPUP PARTS PER PLACE
+# ===============================================================
+class MarkerFragments:
+    # Keyed by the place's own field values, so a plan rendered after the
+    # catalogue changed still gets the popup of the data it was planned with
+
+    def __init__(self):
+        self._parts = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __len__(self):
+        return len(self._parts)
+
+    def prebuild(self, df):
+        columns = [df[f].tolist() if f in df else [""] * len(df) for f in POPUP_FIELDS]
+        parts = {}
+        for values in zip(*columns):
+            key = place_key(values)
+            if key not in parts:
+                parts[key] = popup_parts(key)
+        with self._lock:
+            self._parts.update(parts)
+        return self
+
+    def popup(self, row):
+        # Full popup HTML for one plan row (dict or Series); only the
+        # schedule and the distance from the previous stop are filled in here
+        key = place_key(row.get(f, "") for f in POPUP_FIELDS)
+        parts = self._parts.get(key)
+        with self._lock:
+            if parts is None:
+                parts = self._parts[key] = popup_parts(key)
+                self.stats["misses"] += 1
+            else:
+                self.stats["hits"] += 1
+        head, middle, tail = parts
+        dist_prev = row.get("distance_from_previous_km", 0.0)
+        return f"{head}{schedule_row(row)}{middle}{dist_prev:.2f}{tail}"
+
+
+def build_fragments(catalogue):
+    # Every popup of a catalogue that isn't too big to pre-render, if its
+    # table is already parsed. A catalogue loaded from compiled columns
+    # keeps its text undecoded: its popups are built per place on first use.
+    fragments = MarkerFragments()
+    if catalogue.df_loaded and len(catalogue) <= PREBUILD_MAX_ROWS:
+        fragments.prebuild(catalogue.df)
+    return fragments
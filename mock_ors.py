@@ -0,0 +1,243 @@
+# mock_ors.py
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8090
+
+# One vertex every ~50 m, so geometry size grows with distance like real roads
+VERTICES_PER_KM = 20
+# Average speeds used for the synthetic route summaries
+PROFILE_SPEED_KMH = {"driving-car": 40.0, "foot-walking": 5.0}
+DEFAULT_SPEED_KMH = 15.0
+
+# ORS error codes used in the synthetic error bodies
+ORS_INVALID_PARAMETER = 2003
+ORS_POINT_NOT_FOUND = 2010
+ORS_UNKNOWN_ERROR = 2099
+
+_DIRECTIONS_RE = re.compile(r"^/v2/directions/([\w-]+)(?:/geojson|/json)?/?$")
+
+
+# ===============================================================
+# SYNTHETIC GEOMETRY (DETERMINISTIC, NO ROAD DATA)
+# ===============================================================
+def synthetic_leg(a, b, vertices_per_km=VERTICES_PER_KM):
+    # [lon, lat] -> [lon, lat]: a wiggly line with a vertex every ~50 m
+    km = np.hypot(b[0] - a[0], b[1] - a[1]) * 111.32
+    t = np.linspace(0.0, 1.0, max(2, int(km * vertices_per_km) + 1))
+    wiggle = 2e-4 * np.sin(t * np.pi * 7) * np.sin(t * np.pi)
+    lon = a[0] + (b[0] - a[0]) * t + wiggle
+    lat = a[1] + (b[1] - a[1]) * t - wiggle
+    return np.column_stack([lon, lat]).round(6).tolist()
+
+
+def synthetic_route(coords, vertices_per_km=VERTICES_PER_KM, speed_kmh=DEFAULT_SPEED_KMH):
+    # ORS-shaped GeoJSON FeatureCollection through every coordinate
+    line, way_points, segments = [coords[0]], [0], []
+    for a, b in zip(coords, coords[1:]):
+        leg = synthetic_leg(a, b, vertices_per_km)
+        line.extend(leg[1:])
+        way_points.append(len(line) - 1)
+        metres = float(np.hypot(b[0] - a[0], b[1] - a[1]) * 111320.0)
+        segments.append({"distance": round(metres, 1), "duration": round(metres / 1000.0 / speed_kmh * 3600, 1)})
+
+    return {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": line},
+            "properties": {
+                "segments": segments,
+                "way_points": way_points,
+                "summary": {"distance": round(sum(s["distance"] for s in segments), 1),
+                            "duration": round(sum(s["duration"] for s in segments), 1)},
+            },
+        }],
+    }
+
+
+# ===============================================================
+# MOCK ORS: LATENCY, ERRORS AND UNROUTABLE POINTS
+# ===============================================================
+class MockOrs:
+    # latency_ms / jitter_ms: per-request delay (normal, clipped at 0)
+    # error_rate: share of requests answered with error_status
+    # unroutable_rate: share of points (chosen by a hash of the coordinate,
+    #   so the same point always fails) that unroutable_profiles can't reach
+    # api_key: when set, requests must send it as Authorization
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503,
+                 unroutable_rate=0.0, unroutable_profiles=("driving-car",), api_key="",
+                 vertices_per_km=VERTICES_PER_KM, seed=0):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self.error_status = int(error_status)
+        self.unroutable_rate = float(unroutable_rate)
+        self.unroutable_profiles = tuple(unroutable_profiles)
+        self.api_key = api_key
+        self.vertices_per_km = vertices_per_km
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "unroutable": 0, "rejected": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _random(self):
+        with self._lock:
+            return self._rng.random(), self._rng.gauss(0.0, 1.0)
+
+    def unroutable(self, lon, lat):
+        if self.unroutable_rate <= 0:
+            return False
+        digest = hashlib.sha1(f"{self.seed}:{lon:.5f},{lat:.5f}".encode()).digest()
+        return int.from_bytes(digest[:4], "big") / 2 ** 32 < self.unroutable_rate
+
+    def directions(self, profile, body, authorization=None):
+        # Returns (HTTP status, JSON body) like POST /v2/directions/{profile}/geojson
+        self._count("requests")
+        u, g = self._random()
+        delay_ms = max(0.0, self.latency_ms + self.jitter_ms * g)
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+
+        if self.api_key and authorization != self.api_key:
+            self._count("rejected")
+            return 403, {"error": "Access to this API has been disallowed"}
+
+        if u < self.error_rate:
+            self._count("errors")
+            return self.error_status, {"error": {"code": ORS_UNKNOWN_ERROR,
+                                                 "message": "Mock ORS: simulated upstream error."}}
+
+        coords = (body or {}).get("coordinates")
+        if not isinstance(coords, list) or len(coords) < 2:
+            self._count("rejected")
+            return 400, {"error": {"code": ORS_INVALID_PARAMETER,
+                                   "message": "Parameter 'coordinates' has incorrect value or format."}}
+
+        if profile in self.unroutable_profiles:
+            for i, (lon, lat) in enumerate(coords):
+                if self.unroutable(lon, lat):
+                    self._count("unroutable")
+                    # Same wording as ORS, which the client parses for the index
+                    return 404, {"error": {
+                        "code": ORS_POINT_NOT_FOUND,
+                        "message": f"Could not find routable point within a radius of 350.0 meters "
+                                   f"of specified coordinate {i}: {lon:.7f} {lat:.7f}.",
+                    }}
+
+        self._count("ok")
+        speed = PROFILE_SPEED_KMH.get(profile, DEFAULT_SPEED_KMH)
+        return 200, synthetic_route(coords, self.vertices_per_km, speed)
+
+
+# ===============================================================
+# HTTP SERVER
+# ===============================================================
+def make_server(mock, host=DEFAULT_HOST, port=DEFAULT_PORT, verbose=False):
+    class Handler(BaseHTTPRequestHandler):
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/v2/health":
+                return self._reply(200, {"status": "ready"})
+            if self.path.rstrip("/") == "/stats":
+                with mock._lock:
+                    return self._reply(200, dict(mock.stats))
+            self._reply(404, {"error": "Not found"})
+
+        def do_POST(self):
+            match = _DIRECTIONS_RE.match(self.path.split("?")[0])
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if match is None:
+                return self._reply(404, {"error": "Not found"})
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError:
+                return self._reply(400, {"error": {"code": ORS_INVALID_PARAMETER,
+                                                   "message": "Unable to parse JSON request."}})
+            status, payload = mock.directions(match.group(1), body, self.headers.get("Authorization"))
+            self._reply(status, payload)
+
+        def log_message(self, fmt, *args):
+            if verbose:
+                super().log_message(fmt, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_thread(mock, host=DEFAULT_HOST, port=0):
+    # Background server for scripts; port 0 picks a free port.
+    # Returns (server, base URL); call server.shutdown() to stop it.
+    server = make_server(mock, host, port)
+    threading.Thread(target=server.serve_forever, name="mock-ors", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# ===============================================================
+# CLI: python mock_ors.py [--port 8090] [--latency-ms 200] [--error-rate 0.05] ...
+# ===============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenRouteService stand-in with synthetic routes.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean delay per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="standard deviation of the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of requests that fail with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--unroutable-rate", type=float, default=0.0,
+                        help="share of points the --unroutable-profiles can't reach")
+    parser.add_argument("--unroutable-profiles", default="driving-car",
+                        help="comma-separated profiles affected by --unroutable-rate")
+    parser.add_argument("--api-key", default="", help="require this Authorization header")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    mock = MockOrs(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        unroutable_rate=args.unroutable_rate,
+        unroutable_profiles=tuple(p.strip() for p in args.unroutable_profiles.split(",") if p.strip()),
+        api_key=args.api_key,
+        seed=args.seed,
+    )
+    server = make_server(mock, args.host, args.port, verbose=args.verbose)
+    print(f"Mock ORS on http://{args.host}:{server.server_address[1]} "
+          f"(set ORS_BASE_URL to this address)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# ors_client.py
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from geometry import lonlat_to_coords
+from metrics import REGISTRY, log_event, submit_in_context
+from route_cache import MISS
+
+ORS_BASE_URL = "https://api.openrouteservice.org"
+
+# ORS answers these when no route exists for the profile (e.g. code 2009/2010)
+ORS_UNROUTABLE_STATUS = (400, 404)
+
+# Profiles tried in order for each leg of the map route
+LEG_PROFILES = ("driving-car", "foot-walking")
+
+# Marks a cached leg whose driving route is known to fail
+LEG_FALLBACK = object()
+
+# Multi-stop requests made per route before giving up and routing leg by leg
+MAX_MULTISTOP_ATTEMPTS = 3
+
+# ORS names the offending waypoint in "no routable point" errors
+_BAD_COORD_RE = re.compile(r"coordinate (\d+)")
+
+ORS_REQUEST_SECONDS = REGISTRY.histogram(
+    "travelplan_ors_request_duration_seconds",
+    "ORS directions request latency", ("profile", "status"))
+ORS_REQUESTS = REGISTRY.counter(
+    "travelplan_ors_requests_total", "ORS directions requests", ("profile", "status"))
+ORS_FALLBACKS = REGISTRY.counter(
+    "travelplan_ors_fallbacks_total", "Legs retried with the next routing profile", ("profile",))
+UNROUTABLE_LEGS = REGISTRY.counter(
+    "travelplan_unroutable_legs_total", "Legs no profile could route")
+ORS_IN_FLIGHT = REGISTRY.gauge(
+    "travelplan_ors_requests_in_flight", "ORS requests currently waiting for a reply")
+
+
+# ===============================================================
+# PER-HOST TOKEN BUCKET
+# ===============================================================
+class RateLimiter:
+
+    def __init__(self, rate_per_s, burst):
+        self.rate = float(rate_per_s)
+        self.burst = float(burst)
+        self._lock = threading.Lock()
+        self._buckets = {}      # host -> (tokens, last_refill)
+
+    def acquire(self, host, deadline=None):
+        # Blocks until a token is available; False if the deadline passes first
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens, last = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - last) * self.rate)
+                if tokens >= 1.0:
+                    self._buckets[host] = (tokens - 1.0, now)
+                    return True
+                self._buckets[host] = (tokens, now)
+                wait_s = (1.0 - tokens) / self.rate
+
+            if deadline is not None and time.monotonic() + wait_s > deadline:
+                return False
+            time.sleep(wait_s)
+
+
+# ===============================================================
+# OPENROUTESERVICE CLIENT (POOLED SESSION + SEGMENT CACHE)
+# ===============================================================
+class OrsClient:
+
+    def __init__(self, api_key, base_url=ORS_BASE_URL, cache=None, timeout=20,
+                 max_workers=6, rate_per_s=5.0, burst=10):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate_per_s, burst)
+        self._host = urlparse(self.base_url).netloc
+
+        # One keep-alive session shared by every request and worker thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ors")
+
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "multistop_requests": 0,
+            "multistop_ok": 0,
+            "multistop_failed": 0,
+            "legs_from_multistop": 0,
+            "legs_from_cache": 0,
+            "legs_fallback": 0,
+        }
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self.stats[name] += n
+
+    def _post(self, profile, coords, deadline=None):
+        # Returns (status, json or None, error message); status None means
+        # a transport error or an expired deadline
+        timeout = self.timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                return None, None, "deadline"
+        if not self.limiter.acquire(self._host, deadline):
+            return None, None, "deadline"
+
+        url = f"{self.base_url}/v2/directions/{profile}/geojson"
+        body = {"coordinates": coords, "instructions": False}
+        t0 = time.perf_counter()
+        try:
+            with ORS_IN_FLIGHT.track_inflight():
+                r = self.session.post(url, json=body, headers={"Authorization": self.api_key},
+                                      timeout=timeout)
+        except requests.RequestException as e:
+            self._observe(profile, "error", len(coords), t0, str(e))
+            return None, None, str(e)
+
+        try:
+            data = r.json()
+        except ValueError:
+            data = None
+
+        if not r.ok:
+            error = (data or {}).get("error") if isinstance(data, dict) else None
+            message = error.get("message", "") if isinstance(error, dict) else str(error or "")
+            self._observe(profile, r.status_code, len(coords), t0, message)
+            return r.status_code, None, message
+        self._observe(profile, r.status_code, len(coords), t0)
+        return r.status_code, data, ""
+
+    def _observe(self, profile, status, n_points, t0, error=None):
+        elapsed = time.perf_counter() - t0
+        ORS_REQUEST_SECONDS.observe(elapsed, profile=profile, status=status)
+        ORS_REQUESTS.inc(profile=profile, status=status)
+        log_event("ors_request", logging.WARNING if error is not None else logging.DEBUG,
+                  profile=profile, status=status, points=n_points,
+                  ms=round(elapsed * 1000, 1), error=error)
+
+    # -----------------------------------------------------------
+    # SINGLE SEGMENT
+    # -----------------------------------------------------------
+    def segment(self, start, end, profile="driving-car", deadline=None):
+        if self.cache is not None:
+            cached = self.cache.get(profile, start, end)
+            if cached is not MISS:
+                return cached
+
+        coords = [[start["lng"], start["lat"]], [end["lng"], end["lat"]]]
+        status, data, _ = self._post(profile, coords, deadline)
+
+        if status in ORS_UNROUTABLE_STATUS:
+            # ORS answered "no route" for this profile: remember it.
+            # Timeouts, auth and server errors are not cached.
+            if self.cache is not None:
+                self.cache.put(profile, start, end, None)
+            return None
+        if not data or not data.get("features"):
+            return None
+
+        if self.cache is not None:
+            self.cache.put(profile, start, end, data)
+        return data
+
+    # -----------------------------------------------------------
+    # WHOLE ROUTE: ALL LEGS CONCURRENTLY, REASSEMBLED IN ORDER
+    # -----------------------------------------------------------
+    def route_leg(self, src, dst, deadline=None):
+        # (lat, lon) array for one leg, trying each profile in turn
+        for n, profile in enumerate(LEG_PROFILES):
+            seg = self.segment(src, dst, profile=profile, deadline=deadline)
+            if seg and "features" in seg:
+                return lonlat_to_coords(seg["features"][0]["geometry"]["coordinates"])
+            if n + 1 < len(LEG_PROFILES):
+                ORS_FALLBACKS.inc(profile=LEG_PROFILES[n + 1])
+                log_event("ors_fallback", logging.INFO, failed=profile,
+                          profile=LEG_PROFILES[n + 1], dst=dst)
+
+        UNROUTABLE_LEGS.inc()
+        log_event("unroutable_leg", logging.WARNING, src=src, dst=dst)
+        return None
+
+    # -----------------------------------------------------------
+    # WHOLE ROUTE: MULTI-STOP FIRST, LEG FALLBACK ONLY WHERE NEEDED
+    # -----------------------------------------------------------
+    def _cached_leg(self, src, dst):
+        # Coordinates, None (known unroutable), MISS (driving not cached) or
+        # LEG_FALLBACK (driving known to fail, walking not cached yet)
+        if self.cache is None:
+            return MISS
+        for n, profile in enumerate(LEG_PROFILES):
+            seg = self.cache.get(profile, src, dst)
+            if seg is MISS:
+                return MISS if n == 0 else LEG_FALLBACK
+            if seg and "features" in seg:
+                return lonlat_to_coords(seg["features"][0]["geometry"]["coordinates"])
+        return None
+
+    def _multistop_run(self, points, deadline):
+        # Driving route through all points in one request, split per leg.
+        # Returns (legs, None) or (None, index of the unroutable point or None)
+        self._count("multistop_requests")
+        coords = [[p["lng"], p["lat"]] for p in points]
+        status, data, error = self._post(LEG_PROFILES[0], coords, deadline)
+
+        try:
+            feature = data["features"][0]
+            line = feature["geometry"]["coordinates"]
+            way_points = feature["properties"]["way_points"]
+        except (TypeError, KeyError, IndexError):
+            self._count("multistop_failed")
+            match = _BAD_COORD_RE.search(error or "")
+            bad = int(match.group(1)) if match and status in ORS_UNROUTABLE_STATUS else None
+            return None, bad
+
+        if len(way_points) != len(points):
+            self._count("multistop_failed")
+            return None, None
+
+        self._count("multistop_ok")
+        legs = []
+        for i in range(len(points) - 1):
+            part = line[way_points[i]:way_points[i + 1] + 1]
+            legs.append(lonlat_to_coords(part))
+            if self.cache is not None and len(part) > 1:
+                self.cache.put(LEG_PROFILES[0], points[i], points[i + 1], {
+                    "features": [{"geometry": {"type": "LineString", "coordinates": part},
+                                  "properties": {}}]
+                })
+        return legs, None
+
+    def route_path(self, points, deadline_s=None):
+        # One entry per consecutive pair of points: coordinates or None.
+        # Cached legs are reused, each run of uncached legs is fetched with a
+        # single multi-stop request, and only legs that multi-stop can't
+        # route go through route_leg's per-profile fallback.
+        deadline = time.monotonic() + deadline_s if deadline_s else None
+        n_legs = len(points) - 1
+        if n_legs <= 0:
+            return []
+
+        legs = [None] * n_legs
+        fallback = []
+        runs = []               # (first_leg, last_leg) of uncached legs
+        for i in range(n_legs):
+            cached = self._cached_leg(points[i], points[i + 1])
+            if cached is MISS:
+                if runs and runs[-1][1] == i - 1:
+                    runs[-1] = (runs[-1][0], i)
+                else:
+                    runs.append((i, i))
+            elif cached is LEG_FALLBACK:
+                fallback.append(i)
+            else:
+                legs[i] = cached
+                if cached is not None:
+                    self._count("legs_from_cache")
+
+        attempts = 0
+        while runs:
+            first, last = runs.pop(0)
+            if first == last or attempts >= MAX_MULTISTOP_ATTEMPTS:
+                fallback.extend(range(first, last + 1))
+                continue
+
+            attempts += 1
+            run_legs, bad = self._multistop_run(points[first:last + 2], deadline)
+            if run_legs is not None:
+                legs[first:last + 1] = run_legs
+                self._count("legs_from_multistop", len(run_legs))
+                continue
+
+            if bad is None:
+                fallback.extend(range(first, last + 1))
+                continue
+
+            # Route around the bad waypoint: the legs touching it fall back,
+            # the stretches before and after it get their own multi-stop try
+            bad_point = first + bad
+            around = [i for i in (bad_point - 1, bad_point) if first <= i <= last]
+            fallback.extend(around)
+            if first <= bad_point - 2:
+                runs.append((first, bad_point - 2))
+            if bad_point + 1 <= last:
+                runs.append((bad_point + 1, last))
+
+        if fallback:
+            fallback.sort()
+            self._count("legs_fallback", len(fallback))
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0.001)
+            fetched = self.route_legs_for(points, fallback, remaining)
+            for i, coords in zip(fallback, fetched):
+                legs[i] = coords
+
+        return legs
+
+    def route_legs_for(self, points, leg_indices, deadline_s=None):
+        deadline = time.monotonic() + deadline_s if deadline_s else None
+        futures = [
+            submit_in_context(self._executor, self.route_leg, points[i], points[i + 1], deadline)
+            for i in leg_indices
+        ]
+        if not futures:
+            return []
+
+        wait(futures, timeout=deadline_s)
+        out = []
+        for f in futures:
+            if f.done() and f.exception() is None:
+                out.append(f.result())
+            else:
+                f.cancel()
+                out.append(None)
+        return out
@@ -0,0 +1,232 @@
+# places_store.py
+import hashlib
+import io
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from catalogue_columns import CATEGORY_COLUMN, CategoryIndex, ColumnStore, default_columns_prefix
+from metrics import log_event, stage_timer
+from spatial_index import GridIndex
+from travel_matrix import TravelMatrix, default_prefix
+
+# Opening hours that can't be parsed are stored as -1 and treated as "always open"
+NO_TIME = -1
+DEFAULT_SPEND_MINUTES = 30.0
+NAME_COLUMN = "name of the place"
+
+
+# ===============================================================
+# HH:MM PARSING (VECTORIZED, DONE ONCE PER LOAD)
+# ===============================================================
+def hhmm_to_minutes(values):
+    s = pd.Series(values, dtype="object").astype(str).str.strip()
+    parts = s.str.extract(r"^(\d{1,2}):(\d{1,2})$")
+    hours = pd.to_numeric(parts[0], errors="coerce")
+    mins = pd.to_numeric(parts[1], errors="coerce")
+
+    valid = hours.notna() & mins.notna() & (hours < 24) & (mins < 60)
+    out = np.full(len(s), NO_TIME, dtype=np.int32)
+    out[valid.to_numpy()] = (hours[valid] * 60 + mins[valid]).to_numpy(dtype=np.int32)
+    return out
+
+
+# ===============================================================
+# PRE-PARSED CATALOGUE SNAPSHOT
+# ===============================================================
+class Catalogue:
+    # Immutable view of the places table: the original DataFrame plus the
+    # columns the planner needs as plain NumPy arrays. Built from the CSV,
+    # or from compiled columns (see from_columns) without a DataFrame.
+
+    def __init__(self, df, mtime=None, version=0, fingerprint=None):
+        self._df = df.reset_index(drop=True)
+        self._columns = None
+        self.mtime = mtime
+        self.version = version
+        # Stable across processes (unlike version), used to key cached plans
+        self.fingerprint = fingerprint or hashlib.sha1(
+            pd.util.hash_pandas_object(self._df, index=False).to_numpy().tobytes()
+        ).hexdigest()[:16]
+
+        df = self._df
+        self.lat = pd.to_numeric(df.get("latitude"), errors="coerce").to_numpy(dtype=np.float64)
+        self.lon = pd.to_numeric(df.get("longitude"), errors="coerce").to_numpy(dtype=np.float64)
+
+        self.open_min = hhmm_to_minutes(df.get("visit_start", pd.Series([None] * len(df))))
+        self.close_min = hhmm_to_minutes(df.get("visit_end", pd.Series([None] * len(df))))
+
+        if "spend_time_minutes" in df:
+            spend = pd.to_numeric(df["spend_time_minutes"], errors="coerce")
+            self.spend_min = spend.fillna(DEFAULT_SPEND_MINUTES).to_numpy(dtype=np.float64)
+        else:
+            self.spend_min = np.full(len(df), DEFAULT_SPEND_MINUTES)
+
+        self.category_index = CategoryIndex.build(
+            df[CATEGORY_COLUMN].tolist() if CATEGORY_COLUMN in df else [None] * len(df))
+        self._init_caches()
+
+    @classmethod
+    def from_columns(cls, store, mtime=None, version=0):
+        # Planner arrays and category bitmaps straight from the memory-mapped
+        # store; text columns are only decoded for the rows a plan returns
+        cat = cls.__new__(cls)
+        cat._df = None
+        cat._columns = store
+        cat.mtime = mtime
+        cat.version = version
+        cat.fingerprint = store.fingerprint
+        cat.lat = store.array("lat")
+        cat.lon = store.array("lon")
+        cat.open_min = store.array("open_min")
+        cat.close_min = store.array("close_min")
+        cat.spend_min = store.array("spend_min")
+        cat.category_index = store.category_index
+        cat._init_caches()
+        return cat
+
+    def _init_caches(self):
+        self._spatial_index = None
+        self._row_of_name = None
+        # Precomputed POI x POI legs, attached by PlacesStore when a matrix
+        # built for exactly these coordinates is on disk
+        self.travel_matrix = None
+        # Pre-rendered map popups (marker_fragments.py), attached by the app
+        self.marker_fragments = None
+
+    @property
+    def df(self):
+        # Whole table; from compiled columns this decodes every row once
+        if self._df is None:
+            self._df = self._columns.frame()
+        return self._df
+
+    @property
+    def df_loaded(self):
+        # False while a compiled catalogue's columns are still undecoded
+        return self._df is not None
+
+    def rows(self, idx):
+        # Original columns of rows idx, in that order
+        if self._df is None:
+            return self._columns.frame(idx)
+        return self._df.iloc[idx].copy()
+
+    def category_mask(self, include=(), exclude=()):
+        return self.category_index.mask(include, exclude)
+
+    @property
+    def signature(self):
+        # Identifies the coordinate set, so a stale travel matrix is never used
+        h = hashlib.sha1()
+        h.update(np.ascontiguousarray(self.lat).tobytes())
+        h.update(np.ascontiguousarray(self.lon).tobytes())
+        return h.hexdigest()[:16]
+
+    @property
+    def spatial_index(self):
+        # Built on first use and kept for the lifetime of this snapshot
+        if self._spatial_index is None:
+            self._spatial_index = GridIndex(self.lat, self.lon)
+        return self._spatial_index
+
+    def row_of(self, name):
+        # Catalogue row of a place name (first match), or None
+        if self._row_of_name is None:
+            if self._df is None:
+                names = self._columns.column(NAME_COLUMN) or []
+            else:
+                names = self._df.get(NAME_COLUMN, pd.Series([], dtype=object)).tolist()
+            self._row_of_name = {}
+            for i, n in enumerate(names):
+                self._row_of_name.setdefault(n, i)
+        return self._row_of_name.get(name)
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+
+# ===============================================================
+# PLACES STORE (LOAD ONCE, RELOAD WHEN THE CSV OR COMPILED COLUMNS CHANGE)
+# ===============================================================
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class PlacesStore:
+    # Prefers the compiled columns (python catalogue_columns.py) when they
+    # were built from the current CSV, or when there is no CSV at all;
+    # otherwise parses the CSV. columns_prefix="" disables the columns.
+    # on_load(catalogue) runs once for every newly loaded snapshot, before
+    # it is handed out.
+
+    def __init__(self, csv_path, matrix_prefix=None, load_matrix=True, columns_prefix=None,
+                 on_load=None):
+        self.csv_path = csv_path
+        self.matrix_prefix = matrix_prefix or default_prefix(csv_path)
+        self.columns_prefix = default_columns_prefix(csv_path) if columns_prefix is None else columns_prefix
+        self.load_matrix = load_matrix
+        self.on_load = on_load
+        self._lock = threading.Lock()
+        self._catalogue = None
+        self._version = 0
+
+    def current(self):
+        # Returns the loaded Catalogue, or None if neither source exists.
+        csv_mtime = _mtime(self.csv_path)
+        columns_mtime = _mtime(self.columns_prefix + ".json") if self.columns_prefix else None
+        mtime = (csv_mtime, columns_mtime)
+        if mtime == (None, None):
+            return self._catalogue
+
+        cat = self._catalogue
+        if cat is not None and cat.mtime == mtime:
+            return cat
+
+        with self._lock:
+            cat = self._catalogue
+            if cat is None or cat.mtime != mtime:
+                with stage_timer("catalogue_load"):
+                    self._version += 1
+                    cat = self._load_columns(mtime) if columns_mtime is not None else None
+                    source = "columns" if cat is not None else "csv"
+                    if cat is None:
+                        if csv_mtime is None:
+                            return self._catalogue
+                        with open(self.csv_path, "rb") as f:
+                            raw = f.read()
+                        df = pd.read_csv(io.BytesIO(raw))
+                        cat = Catalogue(df, mtime=mtime, version=self._version,
+                                        fingerprint=hashlib.sha1(raw).hexdigest()[:16])
+                    if self.load_matrix:
+                        cat.travel_matrix = TravelMatrix.load(self.matrix_prefix, cat.signature)
+                    if self.on_load is not None:
+                        self.on_load(cat)
+                self._catalogue = cat
+                log_event("catalogue_loaded", rows=len(cat), version=cat.version, source=source,
+                          fingerprint=cat.fingerprint, matrix=cat.travel_matrix is not None)
+        return cat
+
+    def _load_columns(self, mtime):
+        # Compiled columns, unless they predate the CSV they were built from
+        meta = ColumnStore.read_meta(self.columns_prefix)
+        if meta is None:
+            return None
+        csv_mtime = mtime[0]
+        if csv_mtime is not None and meta.get("source_mtime_ns") != csv_mtime:
+            log_event("catalogue_columns_stale", logging.WARNING, prefix=self.columns_prefix)
+            return None
+        store = ColumnStore.load(self.columns_prefix, meta)
+        if store is None:
+            return None
+        return Catalogue.from_columns(store, mtime=mtime, version=self._version)
@@ -0,0 +1,68 @@
+# plan_cache.py
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 512
+# ~100 m: users starting from the same hub share one cached plan
+PLAN_KEY_PRECISION = 3
+
+
+# ===============================================================
+# CACHED PLAN (ITINERARY + ROUTE, ARTIFACTS LIVE IN THE ARTIFACT STORE)
+# ===============================================================
+class CachedPlan:
+
+    def __init__(self, selected_df, total_trip_hours, hours_per_day, route_coords=None):
+        self.selected_df = selected_df
+        self.total_trip_hours = total_trip_hours
+        self.hours_per_day = hours_per_day
+        # Filled in the first time the map is rendered
+        self.route_coords = route_coords
+        self.route_legs = None
+
+
+# ===============================================================
+# LRU PLAN CACHE, INVALIDATED WHEN THE CATALOGUE CHANGES
+# ===============================================================
+class PlanCache:
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._fingerprint = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _check_catalogue(self, fingerprint):
+        if fingerprint != self._fingerprint:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._fingerprint = fingerprint
+
+    def get(self, key, fingerprint):
+        with self._lock:
+            self._check_catalogue(fingerprint)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key, fingerprint, entry):
+        with self._lock:
+            self._check_catalogue(fingerprint)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
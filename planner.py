@@ -0,0 +1,347 @@
+# planner.py
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from day_scheduler import schedule_days
+from geo_utils import haversine_km, open_during
+from metrics import stage_timer
+from places_store import Catalogue, NO_TIME
+from route_solver import DEFAULT_STRATEGY, SOLVERS, TripProblem, repair_tour
+
+# Longest trip a single request may plan (same limit as the form)
+MAX_TRIP_DAYS = 30
+
+
+# ===============================================================
+# TRIP PLANNING LOGIC
+# ===============================================================
+def _clock(minutes):
+    # Absolute minutes -> "HH:MM" on a 24 h clock
+    m = int(round(minutes))
+    return f"{m // 60 % 24:02d}:{m % 60:02d}"
+
+
+def _day_window(start_time, end_time):
+    # "HH:MM" pair -> (start minute, hours per day), or None if unparseable.
+    # An end at or before the start runs past midnight.
+    try:
+        user_start = datetime.strptime(start_time, "%H:%M")
+        user_end = datetime.strptime(end_time, "%H:%M")
+    except:
+        return None
+
+    if user_end <= user_start:
+        user_end += timedelta(days=1)
+
+    hours_per_day = (user_end - user_start).total_seconds() / 3600.0
+    return user_start.hour * 60 + user_start.minute, hours_per_day
+
+
+def _open_mask(catalogue, start_min, end_min, categories=None, exclude_categories=None):
+    # FILTER BY OPEN HOURS (one interval-overlap mask over the whole catalogue)
+    # and by category tags (bitmap unions, no string matching)
+    with stage_timer("filter"):
+        available = open_during(catalogue.open_min, catalogue.close_min,
+                                start_min, end_min, missing=NO_TIME)
+        available &= np.isfinite(catalogue.lat) & np.isfinite(catalogue.lon)
+        if categories or exclude_categories:
+            available &= catalogue.category_mask(categories, exclude_categories)
+    return available
+
+
+def _plan_frame(catalogue, days, start_lat, start_lon):
+    # One TripSolution per day -> selected places in visit order
+    selected, day_no, legs, arrive, depart = [], [], [], [], []
+    for d, solution in enumerate(days, start=1):
+        for k, i in enumerate(solution.order):
+            start = solution.starts[k]
+            selected.append(i)
+            day_no.append(d)
+            legs.append(solution.leg_km[k])
+            arrive.append(_clock(solution.arrivals[k]))
+            depart.append(_clock(start + float(catalogue.spend_min[i])))
+
+    if not selected:
+        return pd.DataFrame()
+
+    df_sel = catalogue.rows(selected)
+    df_sel["approx_dist"] = haversine_km(start_lat, start_lon,
+                                         catalogue.lat[selected], catalogue.lon[selected])
+    df_sel["distance_from_previous_km"] = np.round(legs, 2)
+    df_sel["day"] = day_no
+    df_sel["arrival_time"] = arrive
+    df_sel["departure_time"] = depart
+    df_sel.reset_index(drop=True, inplace=True)
+    return df_sel
+
+
+def calculate_trip_plan(df, start_lat, start_lon, start_time, end_time, num_days,
+                        strategy=None, time_budget_s=None, table=None, return_to_start=False,
+                        categories=None, exclude_categories=None, report=None):
+    # Accepts a pre-parsed Catalogue (normal path) or a raw places DataFrame.
+    # `table` optionally supplies road (km, minutes) costs, e.g. from a
+    # routing backend; straight-line estimates are used otherwise. If it
+    # fails, the optional `report` dict gets cost_fallback=True.
+    # Every day runs from start_time to end_time starting at the start point
+    # (and, with return_to_start, ends back there); stops come back in
+    # visit order with their day and arrival / departure times.
+    # categories / exclude_categories narrow the candidates by category tag.
+    catalogue = df if isinstance(df, Catalogue) else Catalogue(df)
+
+    window = _day_window(start_time, end_time)
+    if window is None:
+        return pd.DataFrame(), 0, 0, []
+
+    user_start_min, hours_per_day = window
+    total_trip_hours = hours_per_day * max(1, int(num_days))
+
+    if hours_per_day < 0.5:
+        return pd.DataFrame(), total_trip_hours, hours_per_day, []
+
+    available = _open_mask(catalogue, user_start_min, user_start_min + int(hours_per_day * 60),
+                           categories, exclude_categories)
+    if not available.any():
+        return pd.DataFrame(), total_trip_hours, hours_per_day, []
+
+    with stage_timer("solve"):
+        days = schedule_days(catalogue, available, start_lat, start_lon,
+                             day_start_min=user_start_min, day_budget_min=hours_per_day * 60,
+                             num_days=max(1, int(num_days)), strategy=strategy,
+                             time_budget_s=time_budget_s, table=table,
+                             return_to_start=return_to_start, report=report)
+
+    df_sel = _plan_frame(catalogue, days, start_lat, start_lon)
+    if df_sel.empty:
+        return df_sel, total_trip_hours, hours_per_day, []
+
+    geoms = [None] * len(df_sel)
+    return df_sel, total_trip_hours, hours_per_day, geoms
+
+
+# ===============================================================
+# RE-PLANNING: EDIT AN EXISTING PLAN WITH LOCAL REPAIR
+# ===============================================================
+def replan_trip(catalogue, selected_df, params, remove=(), pin=(), end_time=None,
+                time_budget_s=None, table=None):
+    # Applies edits to a stored plan without planning it again: removed
+    # stops leave their day, pinned places go into the nearest day that can
+    # fit them, and a new end time re-checks every day. Only the days that
+    # changed are repaired and refilled; the rest keep their order.
+    # Returns (result dict, None) or (None, error message).
+    end_time = end_time or params["end_time"]
+    window = _day_window(params["start_time"], end_time)
+    if window is None:
+        return None, "Invalid end time."
+    start_min, hours_per_day = window
+    if hours_per_day < 0.5:
+        return None, "Trip window is too short."
+
+    num_days = max(1, int(params["num_days"]))
+    start_lat, start_lon = params["start_lat"], params["start_lon"]
+
+    names = selected_df["name of the place"].tolist() if len(selected_df) else []
+    rows = [catalogue.row_of(n) for n in names]
+    if any(r is None for r in rows):
+        return None, "The places list changed since this plan was made. Plan the trip again."
+    days = selected_df["day"].astype(int).tolist() if "day" in selected_df else [1] * len(rows)
+    tours = {d: [] for d in range(1, max([num_days] + days) + 1)}
+    for r, d in zip(rows, days):
+        tours[d].append(r)
+
+    remove_rows = set()
+    for name in remove:
+        r = catalogue.row_of(name)
+        if r is None or r not in rows:
+            return None, f"{name} is not in this plan."
+        remove_rows.add(r)
+
+    # Earlier pins stay pinned unless the place is removed now
+    pin_names = [n for n in dict.fromkeys(list(params.get("pinned") or []) + list(pin))
+                 if catalogue.row_of(n) not in remove_rows]
+    pin_rows = []
+    for name in pin_names:
+        r = catalogue.row_of(name)
+        if r is None:
+            return None, f"Unknown place: {name}"
+        pin_rows.append(r)
+    for name in pin:
+        if catalogue.row_of(name) in remove_rows:
+            return None, f"{name} can't be both removed and pinned."
+
+    # Places removed now or by an earlier edit stay out unless pinned again
+    excluded = [n for n in dict.fromkeys(list(params.get("removed") or []) + list(remove))
+                if n not in pin]
+    open_mask = _open_mask(catalogue, start_min, start_min + int(hours_per_day * 60),
+                           params.get("categories"), params.get("exclude_categories"))
+    for name in excluded:
+        r = catalogue.row_of(name)
+        if r is not None:
+            open_mask[r] = False
+    available = open_mask.copy()
+    available[rows] = False
+
+    changed = {d for d, tour in tours.items() if remove_rows.intersection(tour)}
+    if end_time != params["end_time"]:
+        changed = set(tours)
+    pinned = {d: [r for r in tour if r in pin_rows] for d, tour in tours.items()}
+    tours = {d: [r for r in tour if r not in remove_rows] for d, tour in tours.items()}
+
+    def problem(d):
+        return TripProblem(catalogue, available, start_lat, start_lon, start_min,
+                           hours_per_day * 60, table=table,
+                           return_to_start=params.get("return_to_start", False))
+
+    def apply(d, solution):
+        # Stops the repair dropped can be picked up by another day
+        for r in set(tours[d]) - set(solution.order):
+            available[r] = open_mask[r]
+        available[solution.order] = False
+        tours[d] = solution.order
+
+    not_pinned = []
+    with stage_timer("repair"):
+        for name, r in zip(pin_names, pin_rows):
+            if any(r in p for p in pinned.values()):
+                continue
+
+            # Days whose nearest stop (or the start) is closest come first
+            def gap(d):
+                lat = np.append(catalogue.lat[tours[d]], start_lat)
+                lon = np.append(catalogue.lon[tours[d]], start_lon)
+                return float(haversine_km(catalogue.lat[r], catalogue.lon[r], lat, lon).min())
+
+            for d in sorted(tours, key=gap):
+                solution = repair_tour(problem(d), tours[d], pinned[d] + [r], fill=False)
+                if solution is not None:
+                    apply(d, solution)
+                    pinned[d].append(r)
+                    changed.add(d)
+                    break
+            else:
+                not_pinned.append(name)
+
+        solutions = []
+        for d in sorted(tours):
+            solution = repair_tour(problem(d), tours[d], pinned[d], fill=d in changed,
+                                   time_budget_s=time_budget_s)
+            if solution is None:
+                solution = repair_tour(problem(d), tours[d], (), fill=False)
+            apply(d, solution)
+            solutions.append(solution)
+
+    # A day that can't keep its pins is repaired without them: report
+    # those pins as not kept rather than carry them over
+    kept = {r for solution in solutions for r in solution.order}
+    not_pinned += [n for n, r in zip(pin_names, pin_rows) if r not in kept and n not in not_pinned]
+
+    df_sel = _plan_frame(catalogue, solutions, start_lat, start_lon)
+    new_names = df_sel["name of the place"].tolist() if len(df_sel) else []
+    removed = [n for n in names if catalogue.row_of(n) in remove_rows]
+    return {
+        "selected_df": df_sel,
+        "end_time": end_time,
+        "hours_per_day": hours_per_day,
+        "total_trip_hours": hours_per_day * num_days,
+        "pinned": [n for n in pin_names if n not in not_pinned],
+        "removed": excluded,
+        "changes": {
+            "removed": removed,
+            "not_pinned": not_pinned,
+            "added": [n for n in new_names if n not in names],
+            "dropped": [n for n in names if n not in new_names and n not in removed],
+            "changed_days": sorted(changed),
+        },
+    }, None
+
+
+# ===============================================================
+# REQUEST PARAMETERS
+# ===============================================================
+def form_list(form, key):
+    # JSON list, comma-separated string, or repeated form field. Only a
+    # single string is split on commas: list items and repeated fields are
+    # whole values, so names with commas in them still work.
+    # Raises ValueError for anything that isn't text.
+    if hasattr(form, "getlist"):
+        values = form.getlist(key)
+        if len(values) == 1:
+            values = values[0]
+    else:
+        values = form.get(key) or []
+    if isinstance(values, str):
+        values = values.split(",")
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        raise ValueError(f"'{key}' must be a string or a list of strings.")
+    return [v.strip() for v in values if v.strip()]
+
+
+def unknown_categories(catalogue, params):
+    # Filter values that match no category tag in this catalogue
+    values = list(params.get("categories") or []) + list(params.get("exclude_categories") or [])
+    return catalogue.category_index.unknown(values)
+
+
+def parse_plan_params(form):
+    # Form fields (or any dict with the same keys) -> (params, None),
+    # or (None, error message)
+    try:
+        start_lat = float(form.get('start_lat', 0.0))
+        start_lon = float(form.get('start_lon', 0.0))
+    except:
+        return None, "Invalid location data. Check GPS or manual location."
+
+    start_time = form.get('start_time', '')
+    end_time = form.get('end_time', '')
+    if not start_time or not end_time:
+        return None, "Start & End times required."
+
+    try:
+        num_days = max(1, int(form.get('num_days', 1)))
+    except:
+        num_days = 1
+    if num_days > MAX_TRIP_DAYS:
+        return None, f"Trips can be at most {MAX_TRIP_DAYS} days."
+
+    # Named explicitly so "greedy" and "" share one cache key / plan id
+    strategy = str(form.get('strategy', '') or DEFAULT_STRATEGY).strip()
+    if strategy not in SOLVERS:
+        return None, f"Unknown strategy: {strategy} (expected {' or '.join(SOLVERS)})."
+
+    try:
+        categories = form_list(form, 'categories')
+        exclude_categories = form_list(form, 'exclude_categories')
+    except ValueError as e:
+        return None, str(e)
+
+    return {
+        "start_lat": start_lat,
+        "start_lon": start_lon,
+        "start_time": start_time,
+        "end_time": end_time,
+        "num_days": num_days,
+        "trip_date": form.get('trip_date', ''),
+        "strategy": strategy,
+        "return_to_start": str(form.get('return_to_start', '')).lower() in ("1", "true", "yes", "on"),
+        "categories": categories,
+        "exclude_categories": exclude_categories,
+    }, None
+
+
+def route_points(selected_df, start_lat, start_lon, return_to_start=False):
+    # Stops as {"lat", "lng"} points for the routing backends. Each new day
+    # sets out from the start point again (the traveller stays there
+    # overnight), and with return_to_start the trip ends there too.
+    start = {"lat": float(start_lat), "lng": float(start_lon)}
+    points = [start]
+    days = selected_df["day"].tolist() if "day" in selected_df else [1] * len(selected_df)
+    prev_day = days[0] if days else 1
+    for day, lat, lon in zip(days, selected_df["latitude"], selected_df["longitude"]):
+        if day != prev_day:
+            points.append(start)
+            prev_day = day
+        points.append({"lat": float(lat), "lng": float(lon)})
+    if return_to_start and len(points) > 1:
+        points.append(start)
+    return points
@@ -0,0 +1,304 @@
+# road_graph.py
+import argparse
+import heapq
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from geo_utils import CITY_SPEED_KMH, haversine_km
+from spatial_index import GridIndex
+
+# Free-flow speeds per OSM highway class; anything else uses the planner's
+# city speed. Footways, cycleways etc. are not part of the driving graph.
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 90, "motorway_link": 50,
+    "trunk": 70, "trunk_link": 40,
+    "primary": 50, "primary_link": 35,
+    "secondary": 40, "secondary_link": 30,
+    "tertiary": 35, "tertiary_link": 25,
+    "unclassified": 25, "road": 25,
+    "residential": 20, "living_street": 10,
+    "service": 15, "track": 15,
+}
+
+# Snapping a point to the graph never uses a node farther away than this
+MAX_SNAP_KM = 5.0
+
+
+# ===============================================================
+# ROAD GRAPH (CSR ADJACENCY, EDGE COST IN MINUTES)
+# ===============================================================
+class RoadGraph:
+    # Nodes are road junctions / shape points; edge i of node u is
+    # indices[indptr[u] + i] with length km[...] and travel time minutes[...]
+
+    def __init__(self, lat, lon, indptr, indices, km, minutes):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.km = np.asarray(km, dtype=np.float32)
+        self.minutes = np.asarray(minutes, dtype=np.float32)
+
+        # Fastest edge, for an admissible A* heuristic (straight line at top speed)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speeds = self.km / (self.minutes / 60.0)
+        speeds = speeds[np.isfinite(speeds)]
+        self.max_speed_kmh = float(speeds.max()) if len(speeds) else float(CITY_SPEED_KMH)
+
+        self._index = None
+        self._adj = None
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def n_edges(self):
+        return len(self.indices)
+
+    # -----------------------------------------------------------
+    # BUILD / SAVE / LOAD
+    # -----------------------------------------------------------
+    @classmethod
+    def from_edges(cls, lat, lon, src, dst, speed_kmh=None, oneway=None):
+        # Edges are (src[i], dst[i]); two-way unless oneway[i] is set
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if speed_kmh is None:
+            speed_kmh = np.full(len(src), float(CITY_SPEED_KMH))
+        speed_kmh = np.asarray(speed_kmh, dtype=np.float64)
+        if oneway is None:
+            oneway = np.zeros(len(src), dtype=bool)
+        oneway = np.asarray(oneway, dtype=bool)
+
+        back = ~oneway
+        u = np.concatenate([src, dst[back]])
+        v = np.concatenate([dst, src[back]])
+        speed = np.concatenate([speed_kmh, speed_kmh[back]])
+
+        km = haversine_km(lat[u], lon[u], lat[v], lon[v])
+        minutes = km / speed * 60.0
+
+        order = np.argsort(u, kind="stable")
+        u, v, km, minutes = u[order], v[order], km[order], minutes[order]
+        indptr = np.zeros(len(lat) + 1, dtype=np.int64)
+        np.add.at(indptr, u + 1, 1)
+        np.cumsum(indptr, out=indptr)
+        return cls(lat, lon, indptr, v, km, minutes)
+
+    def save(self, path):
+        np.savez(path, lat=self.lat, lon=self.lon, indptr=self.indptr,
+                 indices=self.indices, km=self.km, minutes=self.minutes)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["lat"], data["lon"], data["indptr"], data["indices"],
+                       data["km"], data["minutes"])
+
+    # -----------------------------------------------------------
+    # SNAPPING
+    # -----------------------------------------------------------
+    @property
+    def spatial_index(self):
+        if self._index is None:
+            self._index = GridIndex(self.lat, self.lon, cell_km=0.5)
+        return self._index
+
+    def nearest_node(self, lat, lon):
+        # (node, km) or (None, None) when no node is within MAX_SNAP_KM
+        idx, km = self.spatial_index.nearest(lat, lon, k=1)
+        if not len(idx) or km[0] > MAX_SNAP_KM:
+            return None, None
+        return int(idx[0]), float(km[0])
+
+    # -----------------------------------------------------------
+    # SHORTEST PATHS
+    # -----------------------------------------------------------
+    def _adjacency(self):
+        # Plain lists: much faster than NumPy scalars inside the heap loop
+        if self._adj is None:
+            self._adj = (self.indptr.tolist(), self.indices.tolist(),
+                         self.minutes.tolist(), self.km.tolist())
+        return self._adj
+
+    def shortest_path(self, src, dst):
+        # A* on travel time; returns (nodes, km, minutes) or None
+        if src == dst:
+            return [src], 0.0, 0.0
+        indptr, indices, minutes, km = self._adjacency()
+        goal_lat, goal_lon = self.lat[dst], self.lon[dst]
+        to_min = 60.0 / self.max_speed_kmh
+        heuristic = (haversine_km(self.lat, self.lon, goal_lat, goal_lon) * to_min).tolist()
+
+        best = {src: 0.0}
+        dist_km = {src: 0.0}
+        parent = {src: -1}
+        heap = [(heuristic[src], 0.0, src)]
+        done = set()
+        while heap:
+            _, g, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            if u == dst:
+                path = [u]
+                while parent[path[-1]] != -1:
+                    path.append(parent[path[-1]])
+                return path[::-1], dist_km[dst], g
+            done.add(u)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                ng = g + minutes[e]
+                if ng < best.get(v, float("inf")):
+                    best[v] = ng
+                    dist_km[v] = dist_km[u] + km[e]
+                    parent[v] = u
+                    heapq.heappush(heap, (ng + heuristic[v], ng, v))
+        return None
+
+    def one_to_many(self, src, targets):
+        # Dijkstra from src until every target node is settled;
+        # returns (km, minutes) arrays aligned with targets (inf if unreachable)
+        indptr, indices, minutes, km = self._adjacency()
+        remaining = set(targets)
+        settled_min, settled_km = {}, {}
+        best = {src: 0.0}
+        heap = [(0.0, 0.0, src)]
+        while heap and remaining:
+            g, d, u = heapq.heappop(heap)
+            if u in settled_min:
+                continue
+            settled_min[u], settled_km[u] = g, d
+            remaining.discard(u)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                ng = g + minutes[e]
+                if ng < best.get(v, float("inf")):
+                    best[v] = ng
+                    heapq.heappush(heap, (ng, d + km[e], v))
+
+        inf = float("inf")
+        return (np.array([settled_km.get(t, inf) for t in targets]),
+                np.array([settled_min.get(t, inf) for t in targets]))
+
+    # -----------------------------------------------------------
+    # POINT-TO-POINT QUERIES (SNAP, ROUTE, ADD ACCESS LEGS)
+    # -----------------------------------------------------------
+    def _access_minutes(self, km):
+        # Getting on / off the graph is costed at city speed
+        return km / CITY_SPEED_KMH * 60.0
+
+    def route(self, lat1, lon1, lat2, lon2):
+        # ((lat, lon) array, km, minutes) or None if either end can't snap
+        # or no path exists
+        a, a_km = self.nearest_node(lat1, lon1)
+        b, b_km = self.nearest_node(lat2, lon2)
+        if a is None or b is None:
+            return None
+        found = self.shortest_path(a, b)
+        if found is None:
+            return None
+
+        nodes, km, minutes = found
+        coords = np.column_stack([self.lat[nodes], self.lon[nodes]])
+        coords = np.vstack([[lat1, lon1], coords, [lat2, lon2]])
+        access = a_km + b_km
+        return coords, km + access, minutes + self._access_minutes(access)
+
+    def table(self, src_lat, src_lon, dst_lat, dst_lon):
+        # Road (km, minutes) matrices of shape (len(src), len(dst)); same
+        # contract as travel_matrix.haversine_table
+        src_lat, src_lon = np.atleast_1d(src_lat), np.atleast_1d(src_lon)
+        dst_lat, dst_lon = np.atleast_1d(dst_lat), np.atleast_1d(dst_lon)
+        km = np.full((len(src_lat), len(dst_lat)), np.inf)
+        minutes = np.full_like(km, np.inf)
+
+        dst_nodes, dst_access = [], []
+        for lat, lon in zip(dst_lat.tolist(), dst_lon.tolist()):
+            node, access = self.nearest_node(lat, lon)
+            dst_nodes.append(node)
+            dst_access.append(access)
+        cols = [j for j, node in enumerate(dst_nodes) if node is not None]
+        if not cols:
+            return km, minutes
+        targets = [dst_nodes[j] for j in cols]
+        egress = np.array([dst_access[j] for j in cols])
+
+        for i, (lat, lon) in enumerate(zip(src_lat.tolist(), src_lon.tolist())):
+            node, access = self.nearest_node(lat, lon)
+            if node is None:
+                continue
+            road_km, road_min = self.one_to_many(node, targets)
+            km[i, cols] = road_km + access + egress
+            minutes[i, cols] = road_min + self._access_minutes(access + egress)
+        return km, minutes
+
+
+# ===============================================================
+# OSM XML EXTRACT -> ROAD GRAPH
+# ===============================================================
+def graph_from_osm(path, speeds=HIGHWAY_SPEEDS_KMH):
+    # Streams an .osm (XML) extract; only drivable highway ways are kept
+    node_pos = {}
+    ways = []
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            node_pos[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in elem.findall("tag")}
+            highway = tags.get("highway")
+            if highway in speeds:
+                refs = [int(nd.get("ref")) for nd in elem.findall("nd")]
+                oneway = tags.get("oneway", "no")
+                if oneway == "-1":
+                    refs.reverse()
+                is_oneway = oneway in ("yes", "true", "1", "-1") or highway.startswith("motorway")
+                speed = speeds[highway]
+                maxspeed = tags.get("maxspeed", "").split(" ")[0]
+                if maxspeed.isdigit() and int(maxspeed) > 0:
+                    speed = min(speed, int(maxspeed))
+                ways.append((refs, speed, is_oneway))
+            elem.clear()
+
+    # Keep only nodes used by a road, renumbered 0..n-1
+    used = {}
+    src, dst, speed_kmh, oneway = [], [], [], []
+    for refs, speed, is_oneway in ways:
+        refs = [r for r in refs if r in node_pos]
+        for a, b in zip(refs, refs[1:]):
+            if a == b:
+                continue
+            src.append(used.setdefault(a, len(used)))
+            dst.append(used.setdefault(b, len(used)))
+            speed_kmh.append(speed)
+            oneway.append(is_oneway)
+
+    lat = np.empty(len(used))
+    lon = np.empty(len(used))
+    for osm_id, n in used.items():
+        lat[n], lon[n] = node_pos[osm_id]
+    return RoadGraph.from_edges(lat, lon, src, dst, speed_kmh, oneway)
+
+
+# ===============================================================
+# CLI: python road_graph.py region.osm -o tirupati_graph.npz
+# ===============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert an OSM XML extract into a routing graph.")
+    parser.add_argument("osm", help="OpenStreetMap .osm (XML) extract of the region")
+    parser.add_argument("-o", "--output", default="tirupati_graph.npz", help="output .npz graph")
+    args = parser.parse_args(argv)
+
+    graph = graph_from_osm(args.osm)
+    if not len(graph):
+        sys.exit("No drivable roads found in " + args.osm)
+    graph.save(args.output)
+    print(f"Wrote {len(graph)} nodes / {graph.n_edges} edges to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# route_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by get() when nothing is cached; a cached None means "unroutable"
+MISS = object()
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL_S = 7 * 24 * 3600
+DEFAULT_NEGATIVE_TTL_S = 24 * 3600
+# Memory charged for a negative ("unroutable") entry, which has no payload;
+# roughly its key, so millions of them can't grow the LRU past max_bytes
+NEGATIVE_ENTRY_BYTES = 64
+# 4 decimals is ~11 m, close enough that the same road route applies
+DEFAULT_PRECISION = 4
+
+
+def segment_key(profile, start, end, precision=DEFAULT_PRECISION):
+    return "{}:{:.{p}f},{:.{p}f}:{:.{p}f},{:.{p}f}".format(
+        profile, float(start["lat"]), float(start["lng"]),
+        float(end["lat"]), float(end["lng"]), p=precision)
+
+
+def entry_size(payload):
+    return NEGATIVE_ENTRY_BYTES if payload is None else len(payload)
+
+
+def compact_route(geojson):
+    # Keep only what the map needs from an ORS directions response
+    feature = geojson["features"][0]
+    return {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "geometry": feature["geometry"],
+            "properties": {"summary": feature.get("properties", {}).get("summary", {})},
+        }],
+    }
+
+
+# ===============================================================
+# TWO-TIER SEGMENT CACHE: IN-MEMORY LRU + SQLITE WITH TTL
+# ===============================================================
+class SegmentCache:
+
+    def __init__(self, db_path=None, max_bytes=DEFAULT_MAX_BYTES, ttl_s=DEFAULT_TTL_S,
+                 negative_ttl_s=DEFAULT_NEGATIVE_TTL_S, precision=DEFAULT_PRECISION):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.precision = precision
+
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()       # key -> (payload_text or None, expires_at)
+        self._bytes = 0
+        self._db = None
+        self._puts = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "negative_hits": 0}
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS segments ("
+                " key TEXT PRIMARY KEY, payload TEXT, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    # -----------------------------------------------------------
+    # MEMORY TIER
+    # -----------------------------------------------------------
+    def _remember(self, key, payload, expires_at):
+        old = self._lru.pop(key, None)
+        if old is not None:
+            self._bytes -= entry_size(old[0])
+        self._lru[key] = (payload, expires_at)
+        self._bytes += entry_size(payload)
+
+        while self._bytes > self.max_bytes and len(self._lru) > 1:
+            _, (evicted, _) = self._lru.popitem(last=False)
+            self._bytes -= entry_size(evicted)
+
+    # -----------------------------------------------------------
+    # PUBLIC API
+    # -----------------------------------------------------------
+    def get(self, profile, start, end):
+        key = segment_key(profile, start, end, self.precision)
+        now = time.time()
+
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if expires_at > now:
+                    self._lru.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return self._decode(payload)
+                self._bytes -= entry_size(payload)
+                del self._lru[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT payload, expires_at FROM segments WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                    return self._decode(row[0])
+
+            self.stats["misses"] += 1
+            return MISS
+
+    def put(self, profile, start, end, route):
+        # route=None records a definitive "no route for this profile"
+        key = segment_key(profile, start, end, self.precision)
+        if route is None:
+            payload = None
+            expires_at = time.time() + self.negative_ttl_s
+        else:
+            payload = json.dumps(compact_route(route), separators=(",", ":"))
+            expires_at = time.time() + self.ttl_s
+
+        with self._lock:
+            self._remember(key, payload, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO segments (key, payload, expires_at) VALUES (?, ?, ?)",
+                    (key, payload, expires_at),
+                )
+                self._puts += 1
+                if self._puts % 500 == 0:
+                    self._db.execute("DELETE FROM segments WHERE expires_at <= ?", (time.time(),))
+                self._db.commit()
+
+    def _decode(self, payload):
+        if payload is None:
+            self.stats["negative_hits"] += 1
+            return None
+        return json.loads(payload)
@@ -0,0 +1,514 @@
+# route_solver.py
+import logging
+import time
+
+import numpy as np
+
+from geo_utils import (MINUTES_PER_DAY, HIGHWAY_SPEED_KMH, HIGHWAY_THRESHOLD_KM, haversine_km,
+                       travel_minutes)
+from metrics import log_event
+from places_store import NO_TIME
+from travel_matrix import CostTableError, TravelMatrix, haversine_table
+
+DEFAULT_STRATEGY = "greedy"
+DEFAULT_TIME_BUDGET_S = 0.2
+# Local search only looks at this many places around the start point
+MAX_CANDIDATES = 150
+# Greedy skips a nearer place if it would mean waiting longer than this
+# for it to open
+MAX_GREEDY_WAIT_MIN = 60
+# Greedy asks for the costs of this many nearest candidates at a time
+# (one source + 50 targets fits OSRM's default table size)
+GREEDY_BATCH = 50
+# Leg cost (km / minutes) used for pairs a road table can't connect
+UNREACHABLE_COST = 1e9
+# No road leg is faster than this over its straight-line distance
+MAX_ROAD_SPEED_KMH = 130
+# Nearest-first order comes from a flat projection; allow for its error
+PROJECTION_MARGIN = 1.05
+
+
+# ===============================================================
+# PROBLEM DEFINITION
+# ===============================================================
+class TripProblem:
+    # One planning request: where we start, when, how long, and which
+    # catalogue rows are allowed. Times are absolute minutes from midnight
+    # of the first day, so day_start_min + budget_min may run past 1440.
+    # With return_to_start the drive back must also fit in the budget.
+    # All legs of one problem come from one cost source: the road table if
+    # given, else the precomputed matrix, else straight-line distances.
+
+    def __init__(self, catalogue, available, start_lat, start_lon,
+                 day_start_min, budget_min, table=None, return_to_start=False):
+        self.catalogue = catalogue
+        self.available = available
+        self.start_lat = float(start_lat)
+        self.start_lon = float(start_lon)
+        self.day_start_min = float(day_start_min)
+        self.budget_min = float(budget_min)
+        # Optional road cost function (e.g. a routing backend's table);
+        # same contract as travel_matrix.haversine_table
+        self.table = table
+        self.return_to_start = bool(return_to_start)
+        # Set when the road table failed and the rest of the problem was
+        # solved on straight-line costs
+        self.cost_fallback = False
+        self._return_legs = {}
+
+    @property
+    def end_min(self):
+        return self.day_start_min + self.budget_min
+
+    @property
+    def matrix(self):
+        if self.table is not None:
+            return None
+        return getattr(self.catalogue, "travel_matrix", None)
+
+    def _table(self, src_lat, src_lon, dst_lat, dst_lon):
+        # Road table costs, or haversine once the road table has failed
+        if self.table is not None:
+            try:
+                return self.table(src_lat, src_lon, dst_lat, dst_lon)
+            except CostTableError as e:
+                log_event("cost_table_fallback", logging.WARNING, error=str(e))
+                self.table = None
+                self.cost_fallback = True
+                self._return_legs.clear()
+        return haversine_table(src_lat, src_lon, dst_lat, dst_lon)
+
+    @property
+    def road_costs(self):
+        matrix = self.matrix
+        return self.table is not None or (matrix is not None and matrix.source != "haversine")
+
+    def min_leg_minutes(self, approx_km):
+        # Lower bound on the minutes to any place at least approx_km away
+        # in a straight line. The planner's speed rule jumps to highway speed
+        # past HIGHWAY_THRESHOLD_KM, so a farther place can be quicker to reach.
+        km = approx_km / PROJECTION_MARGIN
+        if self.road_costs:
+            return km / MAX_ROAD_SPEED_KMH * 60.0
+        return min(float(travel_minutes(km)), max(km, HIGHWAY_THRESHOLD_KM) / HIGHWAY_SPEED_KMH * 60.0)
+
+    def legs(self, prev, rows, approx_km):
+        # (km, minutes) arrays for the legs from prev (None for the start
+        # point) to each catalogue row: one road table call for all rows,
+        # else the precomputed matrix, else the straight-line distances
+        # the caller already has.
+        rows = np.asarray(rows, dtype=np.int64)
+        cat = self.catalogue
+        if self.table is not None:
+            if prev is None:
+                src_lat, src_lon = self.start_lat, self.start_lon
+            else:
+                src_lat, src_lon = cat.lat[prev], cat.lon[prev]
+            km, minutes = self._table(np.array([src_lat]), np.array([src_lon]),
+                                      cat.lat[rows], cat.lon[rows])
+            return km[0], minutes[0]
+        matrix = self.matrix
+        if prev is not None and matrix is not None:
+            return (np.asarray(matrix.km[prev, rows], dtype=np.float64),
+                    np.asarray(matrix.minutes[prev, rows], dtype=np.float64))
+        approx_km = np.asarray(approx_km, dtype=np.float64)
+        return approx_km, travel_minutes(approx_km)
+
+    def return_legs(self, rows):
+        # [(km, minutes)] from each catalogue row back to the start point;
+        # rows not seen before cost one table call between them
+        missing = [i for i in dict.fromkeys(rows) if i not in self._return_legs]
+        if missing:
+            cat = self.catalogue
+            idx = np.asarray(missing, dtype=np.int64)
+            if self.table is not None:
+                km, minutes = self._table(cat.lat[idx], cat.lon[idx],
+                                          np.array([self.start_lat]), np.array([self.start_lon]))
+                km, minutes = km[:, 0], minutes[:, 0]
+            else:
+                km = haversine_km(cat.lat[idx], cat.lon[idx], self.start_lat, self.start_lon)
+                minutes = travel_minutes(km)
+            for i, k, m in zip(missing, np.atleast_1d(km).tolist(), np.atleast_1d(minutes).tolist()):
+                self._return_legs[i] = (k, m) if np.isfinite(m) else (UNREACHABLE_COST, UNREACHABLE_COST)
+        return [self._return_legs[i] for i in rows]
+
+    def return_leg(self, i):
+        return self.return_legs([i])[0]
+
+    def pool_costs(self, pool):
+        # Dense (km, minutes) over [start] + pool, start as node 0
+        cat = self.catalogue
+        pool = np.asarray(pool, dtype=np.int64)
+        n = len(pool) + 1
+        km = np.zeros((n, n))
+        minutes = np.zeros((n, n))
+
+        start_km, start_min = TravelMatrix.start_row(cat, self.start_lat, self.start_lon, pool,
+                                                     self._table)
+        matrix = self.matrix
+        if matrix is not None:
+            km[1:, 1:], minutes[1:, 1:] = matrix.submatrix(pool)
+        else:
+            fell_back = self.cost_fallback
+            km[1:, 1:], minutes[1:, 1:] = self._table(cat.lat[pool], cat.lon[pool],
+                                                      cat.lat[pool], cat.lon[pool])
+            if self.cost_fallback and not fell_back:
+                # The table failed after the start row came from it
+                start_km, start_min = TravelMatrix.start_row(cat, self.start_lat, self.start_lon,
+                                                             pool, haversine_table)
+        km[0, 1:], minutes[0, 1:] = start_km, start_min
+        km[1:, 0], minutes[1:, 0] = start_km, start_min
+
+        # Road tables report unreachable pairs as inf; a huge finite cost
+        # keeps them infeasible without breaking the day arithmetic
+        unreachable = ~np.isfinite(minutes)
+        if unreachable.any():
+            km[unreachable] = UNREACHABLE_COST
+            minutes[unreachable] = UNREACHABLE_COST
+        return km, minutes
+
+
+class TripSolution:
+
+    def __init__(self, order, leg_km, arrivals=None, starts=None, return_km=None):
+        self.order = list(order)          # catalogue row indices, in visit order
+        self.leg_km = list(leg_km)        # km from the previous stop (or start)
+        self.arrivals = arrivals          # minute the traveller gets to each stop
+        self.starts = starts              # minute each visit starts (after any wait)
+        self.return_km = return_km        # last stop -> start, when it is part of the plan
+
+    def __len__(self):
+        return len(self.order)
+
+
+# ===============================================================
+# TIME WINDOWS
+# ===============================================================
+def service_start(arrival, open_min, close_min, spend):
+    # Earliest minute >= arrival at which the whole visit fits inside one of
+    # the place's daily opening windows, or None if it fits in none of the
+    # next two days. Unknown hours never constrain the visit.
+    if open_min == NO_TIME or close_min == NO_TIME:
+        return arrival
+
+    length = close_min - open_min
+    if length <= 0:
+        length += MINUTES_PER_DAY
+
+    day = int(arrival // MINUTES_PER_DAY)
+    for d in (day - 1, day, day + 1):
+        o = open_min + d * MINUTES_PER_DAY
+        start = max(arrival, o)
+        if start + spend <= o + length:
+            return start
+    return None
+
+
+# ===============================================================
+# BASELINE: SINGLE-PASS GREEDY (NEAREST FROM CURRENT STOP)
+# ===============================================================
+def _nearest_batches(problem, lat, lon, available, t):
+    # Candidates as [(row, approx_km)] lists of up to GREEDY_BATCH, nearest
+    # first. Stops at the first place that even the fastest trip from
+    # (lat, lon) at minute t reaches after the day ends: every later one
+    # is at least as far.
+    batch = []
+    for i, approx_km in problem.catalogue.spatial_index.iter_nearest(lat, lon, allowed=available):
+        if t + problem.min_leg_minutes(approx_km) > problem.end_min:
+            break
+        batch.append((i, approx_km))
+        if len(batch) == GREEDY_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def solve_greedy(problem, time_budget_s=None):
+    # Takes the nearest place whose visit fits its opening hours at the
+    # actual arrival time and still ends (back at the start, if asked)
+    # before the day does. Leg costs come a batch of candidates at a time,
+    # so a road table is asked once per batch rather than once per place.
+    cat = problem.catalogue
+    available = problem.available.copy()
+
+    t = problem.day_start_min
+    end = problem.end_min
+    cur_lat, cur_lon = problem.start_lat, problem.start_lon
+    prev = None
+    order, legs, arrivals, starts = [], [], [], []
+
+    while True:
+        chosen = None
+        for batch in _nearest_batches(problem, cur_lat, cur_lon, available, t):
+            rows = [i for i, _ in batch]
+            km, minutes = problem.legs(prev, rows, [k for _, k in batch])
+
+            fits = []
+            for k, i in enumerate(rows):
+                arrival = t + float(minutes[k])
+                spend = float(cat.spend_min[i])
+                if arrival + spend > end:
+                    continue
+                start = service_start(arrival, float(cat.open_min[i]), float(cat.close_min[i]), spend)
+                if start is None or start - arrival > MAX_GREEDY_WAIT_MIN or start + spend > end:
+                    continue
+                fits.append((i, float(km[k]), arrival, start))
+
+            if problem.return_to_start and fits:
+                back = problem.return_legs([f[0] for f in fits])
+                fits = [f for f, (_, m) in zip(fits, back)
+                        if f[3] + float(cat.spend_min[f[0]]) + m <= end]
+            if fits:
+                chosen = fits[0]
+                break
+
+        if chosen is None:
+            break
+
+        i, km, arrival, start = chosen
+        order.append(i)
+        legs.append(km)
+        arrivals.append(arrival)
+        starts.append(start)
+        available[i] = False
+        t = start + float(cat.spend_min[i])
+        prev = i
+        cur_lat, cur_lon = float(cat.lat[i]), float(cat.lon[i])
+
+    return_km = problem.return_leg(prev)[0] if problem.return_to_start and order else None
+    return TripSolution(order, legs, arrivals, starts, return_km)
+
+
+# ===============================================================
+# NEAREST NEIGHBOUR + 2-OPT / OR-OPT WITH TIME WINDOWS
+# ===============================================================
+class _TourModel:
+    # Dense cost model over a small candidate pool. Node 0 is the start
+    # point, nodes 1..n are catalogue rows `pool[k-1]`.
+
+    def __init__(self, problem, pool):
+        cat = problem.catalogue
+        self.pool = np.asarray(pool, dtype=np.int64)
+        self.km, self.minutes = problem.pool_costs(self.pool)
+
+        self.open = np.concatenate([[NO_TIME], cat.open_min[self.pool]]).tolist()
+        self.close = np.concatenate([[NO_TIME], cat.close_min[self.pool]]).tolist()
+        self.spend = np.concatenate([[0.0], cat.spend_min[self.pool]]).tolist()
+        self.t0 = problem.day_start_min
+        self.t_end = problem.end_min
+        self.return_to_start = problem.return_to_start
+
+    def schedule(self, tour):
+        # Returns (travel_minutes, service starts) or None if infeasible
+        t = self.t0
+        prev = 0
+        travel = 0.0
+        starts = []
+        for node in tour:
+            leg = self.minutes[prev, node]
+            travel += leg
+            s = service_start(t + leg, self.open[node], self.close[node], self.spend[node])
+            if s is None:
+                return None
+            t = s + self.spend[node]
+            if t > self.t_end:
+                return None
+            starts.append(s)
+            prev = node
+        if self.return_to_start and tour:
+            travel += self.minutes[prev, 0]
+            if t + self.minutes[prev, 0] > self.t_end:
+                return None
+        return travel, starts
+
+    def travel(self, tour):
+        prev, total = 0, 0.0
+        for node in tour:
+            total += self.minutes[prev, node]
+            prev = node
+        if self.return_to_start and tour:
+            total += self.minutes[prev, 0]
+        return total
+
+    def arrivals(self, tour, starts):
+        # Arrival minute at each stop: previous departure plus the leg
+        out, t, prev = [], self.t0, 0
+        for node, s in zip(tour, starts):
+            out.append(t + self.minutes[prev, node])
+            t = s + self.spend[node]
+            prev = node
+        return out
+
+
+def _nearest_neighbour(model):
+    n = len(model.pool)
+    unvisited = set(range(1, n + 1))
+    tour = []
+    while unvisited:
+        prev = tour[-1] if tour else 0
+        best = None
+        for node in sorted(unvisited, key=lambda j: model.minutes[prev, j]):
+            if model.schedule(tour + [node]) is not None:
+                best = node
+                break
+        if best is None:
+            break
+        tour.append(best)
+        unvisited.discard(best)
+    return tour
+
+
+def _two_opt(model, tour, deadline):
+    improved = True
+    best_cost = model.travel(tour)
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(len(tour) - 1):
+            for j in range(i + 1, len(tour)):
+                cand = tour[:i] + tour[i:j + 1][::-1] + tour[j + 1:]
+                cost = model.travel(cand)
+                if cost + 1e-9 < best_cost and model.schedule(cand) is not None:
+                    tour, best_cost, improved = cand, cost, True
+            if time.perf_counter() >= deadline:
+                break
+    return tour
+
+
+def _or_opt(model, tour, deadline):
+    improved = True
+    best_cost = model.travel(tour)
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for seg_len in (1, 2, 3):
+            for i in range(len(tour) - seg_len + 1):
+                seg = tour[i:i + seg_len]
+                rest = tour[:i] + tour[i + seg_len:]
+                for k in range(len(rest) + 1):
+                    if k == i:
+                        continue
+                    cand = rest[:k] + seg + rest[k:]
+                    cost = model.travel(cand)
+                    if cost + 1e-9 < best_cost and model.schedule(cand) is not None:
+                        tour, best_cost, improved = cand, cost, True
+                        break
+                if improved or time.perf_counter() >= deadline:
+                    break
+            if improved:
+                break
+    return tour
+
+
+def _insert_unvisited(model, tour, deadline):
+    # Use time freed by the improvement moves to add more places,
+    # cheapest feasible insertion first.
+    visited = set(tour)
+    for node in sorted(set(range(1, len(model.pool) + 1)) - visited,
+                       key=lambda j: model.minutes[0, j]):
+        if time.perf_counter() >= deadline:
+            break
+        best, best_cost = None, None
+        for k in range(len(tour) + 1):
+            cand = tour[:k] + [node] + tour[k:]
+            cost = model.travel(cand)
+            if (best_cost is None or cost < best_cost) and model.schedule(cand) is not None:
+                best, best_cost = cand, cost
+        if best is not None:
+            tour = best
+    return tour
+
+
+def solve_local_search(problem, time_budget_s=DEFAULT_TIME_BUDGET_S):
+    deadline = time.perf_counter() + (time_budget_s or DEFAULT_TIME_BUDGET_S)
+    cat = problem.catalogue
+
+    # Candidate pool: nearest open places that could be reached at all
+    reach_km = problem.budget_min / 60.0 * HIGHWAY_SPEED_KMH
+    pool, _ = cat.spatial_index.within(problem.start_lat, problem.start_lon,
+                                       reach_km, allowed=problem.available)
+    pool = pool[:MAX_CANDIDATES]
+    if len(pool) == 0:
+        return TripSolution([], [])
+
+    model = _TourModel(problem, pool)
+    tour = _nearest_neighbour(model)
+
+    while time.perf_counter() < deadline:
+        before = (len(tour), model.travel(tour))
+        tour = _two_opt(model, tour, deadline)
+        tour = _or_opt(model, tour, deadline)
+        tour = _insert_unvisited(model, tour, deadline)
+        if (len(tour), model.travel(tour)) == before:
+            break
+
+    return _tour_solution(problem, model, tour)
+
+
+def _tour_solution(problem, model, tour):
+    _, starts = model.schedule(tour)
+    prev, legs = 0, []
+    for node in tour:
+        legs.append(float(model.km[prev, node]))
+        prev = node
+    return_km = float(model.km[prev, 0]) if problem.return_to_start and tour else None
+    return TripSolution([int(model.pool[node - 1]) for node in tour], legs,
+                        model.arrivals(tour, starts), starts, return_km)
+
+
+# ===============================================================
+# LOCAL REPAIR OF AN EXISTING TOUR (RE-PLANNING AFTER EDITS)
+# ===============================================================
+def repair_tour(problem, order, pinned=(), fill=True, time_budget_s=DEFAULT_TIME_BUDGET_S):
+    # Keeps the visit order of `order` (catalogue rows), puts any `pinned`
+    # row that is missing in at its cheapest position, then drops the
+    # unpinned stops whose removal saves the most travel until the day fits
+    # its window again. With fill, freed time goes to nearby available
+    # places by cheapest insertion. Returns None if the pinned stops alone
+    # can't be scheduled.
+    deadline = time.perf_counter() + (time_budget_s or DEFAULT_TIME_BUDGET_S)
+    cat = problem.catalogue
+
+    pool = list(order) + [r for r in pinned if r not in order]
+    if fill:
+        reach_km = problem.budget_min / 60.0 * HIGHWAY_SPEED_KMH
+        near, _ = cat.spatial_index.within(problem.start_lat, problem.start_lon,
+                                           reach_km, allowed=problem.available)
+        pool += [int(r) for r in near[:MAX_CANDIDATES]]
+    pool = list(dict.fromkeys(int(r) for r in pool))
+    if not pool:
+        return TripSolution([], [])
+
+    model = _TourModel(problem, pool)
+    node_of = {row: k + 1 for k, row in enumerate(pool)}
+    tour = [node_of[int(r)] for r in order]
+    keep = {node_of[int(r)] for r in pinned}
+
+    for node in sorted(keep - set(tour)):
+        cands = [tour[:k] + [node] + tour[k:] for k in range(len(tour) + 1)]
+        feasible = [c for c in cands if model.schedule(c) is not None]
+        tour = min(feasible or cands, key=model.travel)
+
+    while model.schedule(tour) is None:
+        droppable = [k for k, node in enumerate(tour) if node not in keep]
+        if not droppable:
+            return None
+        k = min(droppable, key=lambda k: model.travel(tour[:k] + tour[k + 1:]))
+        tour = tour[:k] + tour[k + 1:]
+
+    if fill:
+        tour = _insert_unvisited(model, tour, deadline)
+    return _tour_solution(problem, model, tour)
+
+
+# ===============================================================
+# STRATEGY REGISTRY
+# ===============================================================
+SOLVERS = {
+    "greedy": solve_greedy,
+    "nn_2opt": solve_local_search,
+}
+
+
+def solve(problem, strategy=DEFAULT_STRATEGY, time_budget_s=DEFAULT_TIME_BUDGET_S):
+    solver = SOLVERS.get(strategy or DEFAULT_STRATEGY, SOLVERS[DEFAULT_STRATEGY])
+    return solver(problem, time_budget_s=time_budget_s)
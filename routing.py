@@ -0,0 +1,198 @@
+# routing.py
+import logging
+import time
+
+import numpy as np
+import requests
+
+from geometry import lonlat_to_coords
+from metrics import REGISTRY, log_event
+from road_graph import RoadGraph
+from travel_matrix import CostTableError
+
+BACKENDS = ("ors", "osrm", "graph")
+DEFAULT_BACKEND = "ors"
+DEFAULT_OSRM_URL = "http://localhost:5000"
+
+# OSRM's default --max-table-size is 100 coordinates per table request
+OSRM_MAX_TABLE_COORDS = 100
+# After a failed table request, further ones fail fast for this long, so a
+# hanging server costs one timeout rather than one per day of every plan
+OSRM_TABLE_RETRY_S = 60
+
+ROUTING_SECONDS = REGISTRY.histogram(
+    "travelplan_routing_query_duration_seconds",
+    "Route / table queries answered by the local or OSRM backends", ("backend", "query"))
+
+
+# ===============================================================
+# BACKEND INTERFACE
+# ===============================================================
+class RoutingBackend:
+    # route_path(points) -> one (lat, lon) array or None per consecutive pair
+    # of {"lat", "lng"} points (same contract as OrsClient.route_path).
+    # table(...) -> (km, minutes) matrices like travel_matrix.haversine_table,
+    # only on backends with has_table; raises CostTableError when it can't answer.
+    name = "base"
+    has_table = False
+
+    def route_path(self, points, deadline_s=None):
+        raise NotImplementedError
+
+    def table(self, src_lat, src_lon, dst_lat, dst_lon):
+        raise NotImplementedError(f"{self.name} backend has no distance table")
+
+    def describe(self):
+        return {"backend": self.name, "table": self.has_table}
+
+
+class OrsBackend(RoutingBackend):
+    # Remote OpenRouteService: map geometry only; the planner keeps its
+    # straight-line / travel-matrix costs
+    name = "ors"
+
+    def __init__(self, client):
+        self.client = client
+
+    def route_path(self, points, deadline_s=None):
+        return self.client.route_path(points, deadline_s=deadline_s)
+
+
+# ===============================================================
+# OSRM HTTP (SELF-HOSTED osrm-routed)
+# ===============================================================
+class OsrmBackend(RoutingBackend):
+    name = "osrm"
+    has_table = True
+
+    def __init__(self, base_url=DEFAULT_OSRM_URL, profile="driving", timeout=20, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.profile = profile
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self._table_down_until = 0.0
+
+    def _get(self, service, coords, params, deadline=None):
+        timeout = self.timeout
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                return None
+        path = ";".join(f"{lon:.6f},{lat:.6f}" for lat, lon in coords)
+        url = f"{self.base_url}/{service}/v1/{self.profile}/{path}"
+        t0 = time.perf_counter()
+        try:
+            r = self.session.get(url, params=params, timeout=timeout)
+            data = r.json()
+        except (requests.RequestException, ValueError) as e:
+            log_event("osrm_error", logging.WARNING, service=service, error=str(e))
+            return None
+        finally:
+            ROUTING_SECONDS.observe(time.perf_counter() - t0, backend=self.name, query=service)
+
+        if data.get("code") != "Ok":
+            log_event("osrm_error", logging.WARNING, service=service,
+                      status=r.status_code, code=data.get("code"), error=data.get("message"))
+            return None
+        return data
+
+    def _route(self, coords, deadline=None):
+        # Per-leg geometries of one OSRM route through coords, or None
+        data = self._get("route", coords, {"overview": "false", "steps": "true",
+                                           "geometries": "geojson"}, deadline)
+        if data is None:
+            return None
+        legs = []
+        for leg in data["routes"][0]["legs"]:
+            parts = [lonlat_to_coords(step["geometry"]["coordinates"]) for step in leg["steps"]]
+            parts = [p for p in parts if len(p)]
+            legs.append(np.concatenate(parts) if parts else None)
+        return legs
+
+    def route_path(self, points, deadline_s=None):
+        deadline = time.monotonic() + deadline_s if deadline_s else None
+        coords = [(p["lat"], p["lng"]) for p in points]
+        if len(coords) < 2:
+            return []
+
+        legs = self._route(coords, deadline)
+        if legs is not None and len(legs) == len(coords) - 1:
+            return legs
+
+        # One unroutable point fails the whole request: route legs singly
+        out = []
+        for a, b in zip(coords, coords[1:]):
+            leg = self._route([a, b], deadline)
+            out.append(leg[0] if leg else None)
+        return out
+
+    def table(self, src_lat, src_lon, dst_lat, dst_lon):
+        if time.monotonic() < self._table_down_until:
+            raise CostTableError("OSRM table unavailable (recent failure)")
+        src = list(zip(np.atleast_1d(src_lat).tolist(), np.atleast_1d(src_lon).tolist()))
+        dst = list(zip(np.atleast_1d(dst_lat).tolist(), np.atleast_1d(dst_lon).tolist()))
+        km = np.full((len(src), len(dst)), np.inf)
+        minutes = np.full_like(km, np.inf)
+
+        # Split into blocks that fit OSRM's table size limit
+        block = max(1, OSRM_MAX_TABLE_COORDS // 2)
+        for s0 in range(0, len(src), block):
+            for d0 in range(0, len(dst), block):
+                s_part, d_part = src[s0:s0 + block], dst[d0:d0 + block]
+                params = {
+                    "sources": ";".join(map(str, range(len(s_part)))),
+                    "destinations": ";".join(str(len(s_part) + j) for j in range(len(d_part))),
+                    "annotations": "duration,distance",
+                }
+                data = self._get("table", s_part + d_part, params)
+                if data is None:
+                    # A missing block would read as "unreachable"; let the
+                    # planner switch to straight-line costs instead
+                    self._table_down_until = time.monotonic() + OSRM_TABLE_RETRY_S
+                    raise CostTableError("OSRM table request failed")
+                dist = np.array(data["distances"], dtype=np.float64)
+                dur = np.array(data["durations"], dtype=np.float64)
+                km[s0:s0 + len(s_part), d0:d0 + len(d_part)] = np.where(np.isnan(dist), np.inf, dist / 1000.0)
+                minutes[s0:s0 + len(s_part), d0:d0 + len(d_part)] = np.where(np.isnan(dur), np.inf, dur / 60.0)
+        return km, minutes
+
+
+# ===============================================================
+# IN-PROCESS ROAD GRAPH (NO NETWORK, NO QUOTA)
+# ===============================================================
+class GraphBackend(RoutingBackend):
+    name = "graph"
+    has_table = True
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def route_path(self, points, deadline_s=None):
+        t0 = time.perf_counter()
+        out = []
+        for a, b in zip(points, points[1:]):
+            found = self.graph.route(a["lat"], a["lng"], b["lat"], b["lng"])
+            out.append(found[0] if found is not None else None)
+        ROUTING_SECONDS.observe(time.perf_counter() - t0, backend=self.name, query="route")
+        return out
+
+    def table(self, src_lat, src_lon, dst_lat, dst_lon):
+        t0 = time.perf_counter()
+        result = self.graph.table(src_lat, src_lon, dst_lat, dst_lon)
+        ROUTING_SECONDS.observe(time.perf_counter() - t0, backend=self.name, query="table")
+        return result
+
+    def describe(self):
+        return dict(super().describe(), nodes=len(self.graph), edges=self.graph.n_edges)
+
+
+def make_backend(name, ors_client=None, osrm_url=DEFAULT_OSRM_URL, osrm_profile="driving",
+                 graph_path=None):
+    name = (name or DEFAULT_BACKEND).lower()
+    if name == "osrm":
+        return OsrmBackend(osrm_url, profile=osrm_profile)
+    if name == "graph":
+        return GraphBackend(RoadGraph.load(graph_path))
+    if name == "ors":
+        return OrsBackend(ors_client)
+    raise ValueError(f"unknown routing backend {name!r} (expected one of {', '.join(BACKENDS)})")
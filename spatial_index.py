@@ -0,0 +1,147 @@
+# spatial_index.py
+import heapq
+import math
+
+import numpy as np
+
+from geo_utils import EARTH_RADIUS_KM, haversine_km
+
+
+# ===============================================================
+# GRID BUCKET INDEX ON PROJECTED COORDINATES
+# ===============================================================
+class GridIndex:
+    # Points are projected to a local equirectangular plane (km) and hashed
+    # into square cells. Queries only look at the cells around the query
+    # point, so cost depends on local density rather than catalogue size.
+
+    def __init__(self, lat, lon, cell_km=2.0):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.cell_km = float(cell_km)
+
+        finite = np.isfinite(self.lat) & np.isfinite(self.lon)
+        self.ref_lat = float(np.mean(self.lat[finite])) if finite.any() else 0.0
+        self._kx = EARTH_RADIUS_KM * math.cos(math.radians(self.ref_lat)) * math.pi / 180.0
+        self._ky = EARTH_RADIUS_KM * math.pi / 180.0
+
+        self.x, self.y = self._project(self.lat, self.lon)
+
+        self.cells = {}
+        idx = np.flatnonzero(finite)
+        if len(idx):
+            cx = np.floor(self.x[idx] / self.cell_km).astype(np.int64)
+            cy = np.floor(self.y[idx] / self.cell_km).astype(np.int64)
+            order = np.lexsort((cy, cx))
+            idx, cx, cy = idx[order], cx[order], cy[order]
+            breaks = np.flatnonzero((np.diff(cx) != 0) | (np.diff(cy) != 0)) + 1
+            for chunk in np.split(np.arange(len(idx)), breaks):
+                self.cells[(int(cx[chunk[0]]), int(cy[chunk[0]]))] = idx[chunk]
+
+            keys = np.array(list(self.cells.keys()))
+            self._min_cell = keys.min(axis=0)
+            self._max_cell = keys.max(axis=0)
+
+    def _project(self, lat, lon):
+        return np.asarray(lon) * self._kx, np.asarray(lat) * self._ky
+
+    def _cell_of(self, lat, lon):
+        x, y = self._project(lat, lon)
+        return int(math.floor(x / self.cell_km)), int(math.floor(y / self.cell_km)), float(x), float(y)
+
+    def _ring(self, cx, cy, r):
+        # Cells at Chebyshev distance exactly r from (cx, cy), clipped to the
+        # occupied bounding box so far-away queries don't walk empty space
+        if not self.cells:
+            return []
+        if r == 0:
+            bucket = self.cells.get((cx, cy))
+            return [bucket] if bucket is not None else []
+
+        x0, y0 = self._min_cell
+        x1, y1 = self._max_cell
+        out = []
+        for dy in (-r, r):
+            if y0 <= cy + dy <= y1:
+                for x in range(max(cx - r, x0), min(cx + r, x1) + 1):
+                    bucket = self.cells.get((x, cy + dy))
+                    if bucket is not None:
+                        out.append(bucket)
+        for dx in (-r, r):
+            if x0 <= cx + dx <= x1:
+                for y in range(max(cy - r + 1, y0), min(cy + r - 1, y1) + 1):
+                    bucket = self.cells.get((cx + dx, y))
+                    if bucket is not None:
+                        out.append(bucket)
+        return out
+
+    def _ring_span(self, cx, cy):
+        # First and last ring that can touch an occupied cell
+        if not self.cells:
+            return 0, -1
+        x0, y0 = self._min_cell
+        x1, y1 = self._max_cell
+        first = int(max(x0 - cx, cx - x1, y0 - cy, cy - y1, 0))
+        last = int(max(abs(cx - x0), abs(cx - x1), abs(cy - y0), abs(cy - y1)))
+        return first, last
+
+    # -----------------------------------------------------------
+    # QUERIES
+    # -----------------------------------------------------------
+    def iter_nearest(self, lat, lon, allowed=None):
+        # Yields (index, km) in increasing distance from (lat, lon).
+        # `allowed` is an optional boolean mask over the catalogue.
+        cx, cy, qx, qy = self._cell_of(lat, lon)
+        first, last = self._ring_span(cx, cy)
+        heap = []
+
+        for r in range(first, last + 1):
+            for bucket in self._ring(cx, cy, r):
+                if allowed is not None:
+                    bucket = bucket[allowed[bucket]]
+                if len(bucket) == 0:
+                    continue
+                d = np.hypot(self.x[bucket] - qx, self.y[bucket] - qy)
+                for i, di in zip(bucket.tolist(), d.tolist()):
+                    heapq.heappush(heap, (di, i))
+
+            # Everything outside rings 0..r is at least r cells away
+            safe = r * self.cell_km
+            while heap and heap[0][0] <= safe:
+                _, i = heapq.heappop(heap)
+                yield i, float(haversine_km(lat, lon, self.lat[i], self.lon[i]))
+
+        while heap:
+            _, i = heapq.heappop(heap)
+            yield i, float(haversine_km(lat, lon, self.lat[i], self.lon[i]))
+
+    def nearest(self, lat, lon, k=1, allowed=None):
+        out_idx, out_km = [], []
+        for i, km in self.iter_nearest(lat, lon, allowed=allowed):
+            out_idx.append(i)
+            out_km.append(km)
+            if len(out_idx) >= k:
+                break
+        return np.array(out_idx, dtype=np.int64), np.array(out_km, dtype=np.float64)
+
+    def within(self, lat, lon, radius_km, allowed=None):
+        # All points within radius_km (haversine), sorted by distance
+        cx, cy, _, _ = self._cell_of(lat, lon)
+        first, last = self._ring_span(cx, cy)
+        # Small margin for projection error away from the reference latitude
+        rings = min(int(math.ceil(radius_km * 1.05 / self.cell_km)) + 1, last)
+
+        buckets = []
+        for r in range(first, rings + 1):
+            buckets.extend(self._ring(cx, cy, r))
+        if not buckets:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        idx = np.concatenate(buckets)
+        if allowed is not None:
+            idx = idx[allowed[idx]]
+        km = haversine_km(lat, lon, self.lat[idx], self.lon[idx])
+        keep = km <= radius_km
+        idx, km = idx[keep], km[keep]
+        order = np.argsort(km, kind="stable")
+        return idx[order], km[order]
@@ -0,0 +1,158 @@
+# travel_matrix.py
+import json
+import os
+import sys
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from geo_utils import haversine_km, travel_minutes
+
+# Rows computed per block while building, keeps peak memory at BLOCK_ROWS x N
+BLOCK_ROWS = 512
+
+
+# ===============================================================
+# FILE LAYOUT
+# ===============================================================
+def matrix_paths(prefix):
+    return {
+        "km": prefix + "_km.npy",
+        "minutes": prefix + "_min.npy",
+        "meta": prefix + ".json",
+    }
+
+
+def default_prefix(csv_path):
+    return os.path.splitext(csv_path)[0] + "_matrix"
+
+
+# ===============================================================
+# DEFAULT LEG COST: GREAT-CIRCLE KM + PLANNER SPEED RULE
+# ===============================================================
+class CostTableError(RuntimeError):
+    # Raised by a road cost table that couldn't answer (e.g. OSRM is down);
+    # callers fall back to haversine_table
+    pass
+
+
+def haversine_table(src_lat, src_lon, dst_lat, dst_lon):
+    # Returns (km, minutes) blocks of shape (len(src), len(dst))
+    km = haversine_km(np.asarray(src_lat)[:, None], np.asarray(src_lon)[:, None],
+                      np.asarray(dst_lat)[None, :], np.asarray(dst_lon)[None, :])
+    return km, travel_minutes(km)
+
+
+# ===============================================================
+# TRAVEL MATRIX (MEMORY-MAPPED float32 POI x POI)
+# ===============================================================
+class TravelMatrix:
+
+    def __init__(self, km, minutes, signature, source="haversine"):
+        self.km = km
+        self.minutes = minutes
+        self.signature = signature
+        self.source = source
+
+    def __len__(self):
+        return self.km.shape[0]
+
+    def leg(self, i, j):
+        return float(self.km[i, j]), float(self.minutes[i, j])
+
+    def submatrix(self, idx):
+        idx = np.asarray(idx, dtype=np.int64)
+        return (np.asarray(self.km[np.ix_(idx, idx)], dtype=np.float64),
+                np.asarray(self.minutes[np.ix_(idx, idx)], dtype=np.float64))
+
+    @staticmethod
+    def start_row(catalogue, lat, lon, idx=None, table=haversine_table):
+        # Legs from an arbitrary point to catalogue rows, one vectorized call
+        if idx is None:
+            dst_lat, dst_lon = catalogue.lat, catalogue.lon
+        else:
+            dst_lat, dst_lon = catalogue.lat[idx], catalogue.lon[idx]
+        km, minutes = table(np.array([lat]), np.array([lon]), dst_lat, dst_lon)
+        return km[0], minutes[0]
+
+    # -----------------------------------------------------------
+    # BUILD / LOAD
+    # -----------------------------------------------------------
+    @classmethod
+    def build(cls, catalogue, prefix, table=haversine_table, source="haversine"):
+        paths = matrix_paths(prefix)
+        n = len(catalogue)
+        lat, lon = catalogue.lat, catalogue.lon
+
+        # Write to temporary files and rename, so a running app never maps
+        # a half-written matrix
+        km = open_memmap(paths["km"] + ".tmp", mode="w+", dtype=np.float32, shape=(n, n))
+        minutes = open_memmap(paths["minutes"] + ".tmp", mode="w+", dtype=np.float32, shape=(n, n))
+        for r0 in range(0, n, BLOCK_ROWS):
+            r1 = min(r0 + BLOCK_ROWS, n)
+            block_km, block_min = table(lat[r0:r1], lon[r0:r1], lat, lon)
+            km[r0:r1] = block_km
+            minutes[r0:r1] = block_min
+        km.flush()
+        minutes.flush()
+        del km, minutes
+
+        os.replace(paths["km"] + ".tmp", paths["km"])
+        os.replace(paths["minutes"] + ".tmp", paths["minutes"])
+        with open(paths["meta"], "w") as f:
+            json.dump({"signature": catalogue.signature, "size": n, "source": source}, f)
+
+        return cls.load(prefix, catalogue.signature)
+
+    @classmethod
+    def load(cls, prefix, signature=None):
+        # Returns None when the files are missing or were built for a
+        # different catalogue
+        paths = matrix_paths(prefix)
+        try:
+            with open(paths["meta"]) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if signature is not None and meta.get("signature") != signature:
+            return None
+
+        try:
+            km = np.load(paths["km"], mmap_mode="r")
+            minutes = np.load(paths["minutes"], mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+
+        if km.shape != minutes.shape or km.shape[0] != meta.get("size"):
+            return None
+        return cls(km, minutes, meta.get("signature"), meta.get("source", "haversine"))
+
+
+# ===============================================================
+# CLI: python travel_matrix.py [places.csv] [output_prefix] [--graph road.npz]
+# ===============================================================
+if __name__ == "__main__":
+    import argparse
+
+    from places_store import PlacesStore
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Precompute the place-to-place travel matrix.")
+    parser.add_argument("csv", nargs="?", default=os.path.join(here, "tirupati_places_final_updated.csv"))
+    parser.add_argument("prefix", nargs="?", help="output prefix (default: <csv>_matrix)")
+    parser.add_argument("--graph", help="road graph (.npz from road_graph.py) for road distances")
+    args = parser.parse_args()
+    prefix = args.prefix or default_prefix(args.csv)
+
+    catalogue = PlacesStore(args.csv, load_matrix=False).current()
+    if catalogue is None:
+        sys.exit(f"Places CSV not found: {args.csv}")
+
+    if args.graph:
+        from road_graph import RoadGraph
+        matrix = TravelMatrix.build(catalogue, prefix, table=RoadGraph.load(args.graph).table,
+                                    source="road-graph")
+    else:
+        matrix = TravelMatrix.build(catalogue, prefix)
+    print(f"Wrote {len(matrix)}x{len(matrix)} {matrix.source} travel matrix to {prefix}_*.npy")
@@ -0,0 +1,190 @@
+# trip_pdf.py
+import io
+import os
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# Above this many stops the itinerary is one compact table that splits
+# across pages (header repeated) instead of a detail block per place
+COMPACT_THRESHOLD = 15
+
+
+# ===============================================================
+# STYLES (BUILT ONCE AT IMPORT, SHARED BY EVERY PDF)
+# ===============================================================
+_styles = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle', parent=_styles['Heading1'],
+    fontSize=24, textColor=colors.HexColor('#4c1d95'),
+    alignment=1, spaceAfter=20
+)
+
+SUBTITLE_STYLE = ParagraphStyle(
+    'Subtitle', parent=_styles['Heading2'],
+    fontSize=14, textColor=colors.HexColor('#6b21a8'),
+    alignment=1, spaceAfter=16
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'SectionHeading', parent=_styles['Heading2'],
+    fontSize=16, textColor=colors.HexColor('#1d4ed8'),
+    spaceBefore=12, spaceAfter=8
+)
+
+PLACE_TITLE_STYLE = ParagraphStyle(
+    'PlaceTitle', parent=_styles['Heading3'],
+    fontSize=13, textColor=colors.HexColor('#7c2d12')
+)
+
+CELL_STYLE = ParagraphStyle(
+    'CompactCell', parent=_styles['BodyText'],
+    fontSize=8, leading=10
+)
+
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e5e7eb')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#111827')),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('BOX', (0, 0), (-1, -1), 0.8, colors.HexColor('#4b5563')),
+])
+
+PLACE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#fee2e2')),
+    ('BACKGROUND', (1, 0), (1, -1), colors.HexColor('#f9fafb')),
+    ('BOX', (0, 0), (-1, -1), 0.8, colors.HexColor('#f97316')),
+])
+
+COMPACT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#fee2e2')),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
+    ('BOX', (0, 0), (-1, -1), 0.8, colors.HexColor('#f97316')),
+    ('LINEBELOW', (0, 0), (-1, 0), 0.8, colors.HexColor('#f97316')),
+])
+
+
+# ===============================================================
+# COLUMN EXTRACTION (ONCE PER PDF, NO iterrows)
+# ===============================================================
+def _column(df, name, default):
+    if name not in df:
+        return [default] * len(df)
+    return [default if v is None or (isinstance(v, float) and np.isnan(v)) else v
+            for v in df[name].tolist()]
+
+
+def _itinerary_columns(selected_df):
+    names = [str(v) for v in _column(selected_df, 'name of the place', 'Unknown')]
+    categories = [str(v) for v in _column(selected_df, 'category', 'N/A')]
+    vstart = _column(selected_df, 'visit_start', '')
+    vend = _column(selected_df, 'visit_end', '')
+    times = [f"{s} - {e}" if s and e else "N/A" for s, e in zip(vstart, vend)]
+    spend = [str(v) for v in _column(selected_df, 'spend_time_minutes', "N/A")]
+
+    if 'distance_from_previous_km' in selected_df:
+        dist = pd.to_numeric(selected_df['distance_from_previous_km'], errors="coerce").fillna(0.0).tolist()
+    else:
+        dist = [0.0] * len(selected_df)
+
+    desc = [str(v).replace('\n', ' ') for v in _column(selected_df, 'description', 'No description')]
+
+    # Day and planned arrival - departure, when the plan was scheduled
+    days = [int(v) for v in _column(selected_df, 'day', 1)]
+    arrive = _column(selected_df, 'arrival_time', '')
+    depart = _column(selected_df, 'departure_time', '')
+    schedule = [f"{a} - {d}" if a else "" for a, d in zip(arrive, depart)]
+    return names, categories, times, spend, dist, desc, days, schedule
+
+
+# ===============================================================
+# PDF GENERATION
+# ===============================================================
+def generate_trip_pdf(selected_df, total_trip_days, total_trip_hours, trip_date, output_path):
+    # output_path may be a filename or any writable binary file object
+    if isinstance(output_path, str) and os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    doc = SimpleDocTemplate(output_path, pagesize=A4)
+    elements = []
+
+    elements.append(Paragraph("Trip Itinerary", TITLE_STYLE))
+    elements.append(Paragraph("Powered by Geo Intel Lab", SUBTITLE_STYLE))
+    elements.append(Spacer(1, 0.2 * inch))
+
+    summary_data = [
+        ["Total Days", str(total_trip_days)],
+        ["Total Hour", f"{total_trip_hours:.2f}"],
+        ["Trip Start Date", trip_date or "Not provided"],
+        ["Total Places", str(len(selected_df))]
+    ]
+
+    summary_table = Table(summary_data, colWidths=[2 * inch, 4 * inch])
+    summary_table.setStyle(SUMMARY_TABLE_STYLE)
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.3 * inch))
+
+    elements.append(Paragraph("Selected Places", HEADING_STYLE))
+
+    names, categories, times, spend, dist, desc, days, schedule = _itinerary_columns(selected_df)
+    multi_day = len(set(days)) > 1
+
+    if len(names) > COMPACT_THRESHOLD:
+        # One table for the whole itinerary; platypus splits it across
+        # pages and repeats the header row on each
+        rows = [["#", "Day", "Name", "Category", "Time", "Schedule", "Spend", "Km"]]
+        for i in range(len(names)):
+            rows.append([
+                str(i + 1),
+                str(days[i]),
+                Paragraph(escape(names[i]), CELL_STYLE),
+                Paragraph(escape(categories[i]), CELL_STYLE),
+                times[i],
+                schedule[i],
+                f"{spend[i]} min",
+                f"{dist[i]:.2f}",
+            ])
+        table = Table(rows, colWidths=[0.3 * inch, 0.35 * inch, 1.8 * inch, 1.2 * inch, 0.95 * inch,
+                                       0.85 * inch, 0.55 * inch, 0.5 * inch], repeatRows=1)
+        table.setStyle(COMPACT_TABLE_STYLE)
+        elements.append(table)
+    else:
+        for i in range(len(names)):
+            if multi_day and (i == 0 or days[i] != days[i - 1]):
+                elements.append(Paragraph(f"Day {days[i]}", HEADING_STYLE))
+            elements.append(Paragraph(f"{i + 1}. {escape(names[i])}", PLACE_TITLE_STYLE))
+
+            rows = [
+                ["Name", names[i]],
+                ["Category", categories[i]],
+                ["Time", times[i]],
+            ]
+            if schedule[i]:
+                rows.append(["Schedule", schedule[i]])
+            rows += [
+                ["Spend", f"{spend[i]} minutes"],
+                ["Distance", f"{dist[i]:.2f} km"],
+                ["Description", desc[i]],
+            ]
+            place_table = Table(rows, colWidths=[2.5 * inch, 3.8 * inch])
+            place_table.setStyle(PLACE_TABLE_STYLE)
+
+            elements.append(place_table)
+            elements.append(Spacer(1, 0.18 * inch))
+
+    doc.build(elements)
+
+
+def trip_pdf_bytes(selected_df, total_trip_days, total_trip_hours, trip_date):
+    # Renders straight into memory, e.g. to send as an HTTP response body
+    buf = io.BytesIO()
+    generate_trip_pdf(selected_df, total_trip_days, total_trip_hours, trip_date, buf)
+    return buf.getvalue()